@@ -1,16 +1,30 @@
-from flask import Flask, request
+import os
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, jsonify, make_response, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
+from .ratelimit import limiter
+from .passwords import HashingBusy
+from . import sqlite_profile
+from . import replica
+from . import instrumentation
+from . import metrics
+from . import slow_queries
+from . import profiler
 
 # Optional CSRF support (Flask-WTF). We import lazily so tests/dev without the
 # dependency continue to run. If Flask-WTF is installed, CSRFProtect will be
 # initialized and a `csrf_token` template global (generate_csrf) will be exposed.
 csrf = None
 
-db = SQLAlchemy()
+# RoutingSession sends eligible reads to the optional read replica (see replica.py)
+db = SQLAlchemy(session_options={'class_': replica.RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'main.login'
@@ -25,9 +39,29 @@ def create_app(test_config=None):
     if test_config is not None:
         app.config.update(test_config)
 
+    # Client address/scheme from trusted reverse proxies (rate limiting keys anonymous clients on it)
+    if app.config.get('TRUSTED_PROXY_COUNT'):
+        proxies = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    # WAL, pragmas and pool settings for SQLite file databases (see sqlite_profile.py)
+    sqlite_profile.apply_engine_options(app.config)
+    replica.configure_binds(app.config)
     db.init_app(app)
+    sqlite_profile.init_app(app, db)
+    replica.init_app(app, db)
+    # query counts/time per request, Server-Timing header, N+1 warnings
+    instrumentation.init_app(app, db)
+    # statements over SLOW_QUERY_MS -> instance/slow_queries.jsonl with their plans
+    slow_queries.init_app(app, db)
+    # /metrics (Prometheus), summed across worker processes (see metrics.py);
+    # registered before the rate limiter so rejected requests are counted too
+    metrics.init_app(app)
+    # cProfile for admin requests sent with X-Profile / ?_profile=1 (see profiler.py)
+    profiler.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    limiter.init_app(app)
     
     # Security headers middleware
     @app.after_request
@@ -44,6 +78,18 @@ def create_app(test_config=None):
         response.headers['X-XSS-Protection'] = app.config['X_XSS_PROTECTION']
         return response
 
+    # A saturated password-hashing pool (app/passwords.py) is temporary: ask the client to retry
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        message = 'The server is busy hashing other passwords. Please try again in a moment.'
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message})
+        else:
+            response = make_response(message)
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
     # Try to enable CSRFProtect if Flask-WTF is available.
     try:
         from flask_wtf import CSRFProtect
@@ -74,24 +120,121 @@ def create_app(test_config=None):
         csrf.exempt(api_blueprint)
 
     from . import models
+    # Keeps the Account rollup columns in step with contact/opportunity writes
+    from . import rollups
+    # Flask-Login user loader and bearer-token request loader
+    from . import auth
+    # Batched write-back of API token usage counts
+    from .tokens import flush_token_usage_after, sweep_tokens
+    app.after_request(flush_token_usage_after)
 
     # Add CLI command to create/reset admin user
     @app.cli.command('reset-admin')
     def reset_admin():
         """Create or reset the admin user with a default password."""
         from app.models import User, db
+        from app.auth import invalidate_user
         email = 'admin@test.com'
         password = 'password123'
         with app.app_context():
             user = User.query.filter_by(email=email).first()
-            if not user:
-                # Create the owner account so repository owner has full access
-                user = User(email=email, first_name='Test', last_name='Admin', role='owner')
-                user.set_password(password)
-                db.session.add(user)
-            else:
-                user.set_password(password)
+            try:
+                if not user:
+                    # Create the owner account so repository owner has full access
+                    user = User(email=email, first_name='Test', last_name='Admin', role='owner')
+                    user.set_password(password)
+                    db.session.add(user)
+                else:
+                    user.set_password(password)
+            except HashingBusy:
+                raise click.ClickException('Password hashing pool is busy; try again')
             db.session.commit()
+            invalidate_user(user.id)
             print(f"Admin user reset: {email} / {password} (role=owner)")
 
+    @app.cli.command('sweep-tokens')
+    @click.option('--archive', is_flag=True, help='Append removed tokens to instance/token_archive.jsonl first.')
+    @click.option('--chunk-size', default=500, show_default=True, help='Tokens deleted per transaction.')
+    def sweep_tokens_command(archive, chunk_size):
+        """Delete revoked and expired API tokens."""
+        if archive:
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, 'token_archive.jsonl')
+            with open(path, 'a', encoding='utf-8') as f:
+                removed = sweep_tokens(chunk_size=chunk_size, archive=f)
+            print(f"Removed {removed} tokens (archived to {path})")
+        else:
+            removed = sweep_tokens(chunk_size=chunk_size)
+            print(f"Removed {removed} tokens")
+
+    @app.cli.command('archive-opportunities')
+    @click.option('--older-than', default=180, show_default=True,
+                  help='Archive closed deals whose close date is more than this many days ago.')
+    @click.option('--chunk-size', default=500, show_default=True, help='Opportunities moved per transaction.')
+    @click.option('--dry-run', is_flag=True, help='Only report how many would be moved.')
+    def archive_opportunities_command(older_than, chunk_size, dry_run):
+        """Move old Closed-Won/Closed-Lost opportunities to opportunity_archive."""
+        from .archive import archive_opportunities, count_archivable
+        cutoff = datetime.utcnow() - timedelta(days=older_than)
+        if dry_run:
+            print(f"{count_archivable(cutoff)} opportunities closed before {cutoff:%Y-%m-%d} would be archived")
+            return
+        moved = archive_opportunities(cutoff, chunk_size=chunk_size)
+        print(f"Archived {moved} opportunities closed before {cutoff:%Y-%m-%d}")
+
+    @app.cli.command('repair-rollups')
+    @click.option('--chunk-size', default=rollups.REPAIR_CHUNK_SIZE, show_default=True,
+                  help='Accounts recomputed per transaction.')
+    def repair_rollups_command(chunk_size):
+        """Recompute every account's contact/open-deal rollup columns."""
+        fixed = rollups.repair_rollups(db.engine, chunk_size=chunk_size)
+        print(f"Repaired rollups of {fixed} accounts")
+
+    @app.cli.command('purge-accounts')
+    @click.option('--chunk-size', default=None, type=int,
+                  help='Rows deleted per transaction (default ACCOUNT_PURGE_CHUNK_SIZE).')
+    def purge_accounts_command(chunk_size):
+        """Finish account deletions left incomplete by a restart."""
+        from .purge import resume_purges
+        resumed = resume_purges(db.engine, chunk_size or app.config.get('ACCOUNT_PURGE_CHUNK_SIZE', 1000))
+        print(f"Purged {resumed} accounts")
+
+    @app.cli.command('find-duplicate-contacts')
+    @click.option('--threshold', default=0.7, show_default=True, help='Minimum score (0-1) to suggest a pair.')
+    @click.option('--max-bucket', default=50, show_default=True,
+                  help='Skip blocking buckets with more contacts than this (shared inboxes, placeholder numbers).')
+    def find_duplicate_contacts_command(threshold, max_bucket):
+        """Suggest duplicate contacts for review at /admin/duplicates."""
+        from .duplicates import find_duplicate_contacts
+        found = find_duplicate_contacts(threshold=threshold, max_bucket=max_bucket)
+        print(f"Scored {found['candidates']} candidate pairs, suggested {found['suggested']} duplicates")
+
+    @app.cli.group('slow-queries')
+    def slow_queries_group():
+        """Inspect the slow-query log."""
+
+    @slow_queries_group.command('top')
+    @click.option('--limit', default=10, show_default=True, help='Number of fingerprints to show.')
+    @click.option('--by', 'sort_by', type=click.Choice(slow_queries.SORT_KEYS), default='total',
+                  show_default=True, help='Rank by total, max, mean duration or count.')
+    @click.option('--hours', type=float, help='Only consider queries logged in the last N hours.')
+    @click.option('--plans/--no-plans', default=True, help='Show the latest query plan for each.')
+    def slow_queries_top(limit, sort_by, hours, plans):
+        """Show the worst slow queries, grouped by fingerprint."""
+        path = slow_queries.log_path(app)
+        since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+        top = slow_queries.top_queries(slow_queries.read_log(path, since), by=sort_by, limit=limit)
+        if not top:
+            print(f"No slow queries logged in {path}")
+            return
+        for rank, group in enumerate(top, start=1):
+            print(f"{rank}. [{group['fingerprint']}] count={group['count']} total={group['total']:.1f}ms "
+                  f"mean={group['mean']:.1f}ms max={group['max']:.1f}ms last={group['last_seen']}")
+            print(f"   {group['sql'][:500]}")
+            if group['endpoints']:
+                print(f"   endpoints: {', '.join(group['endpoints'])}")
+            if plans and group['plan']:
+                for line in group['plan']:
+                    print(f"   | {line}")
+
     return app
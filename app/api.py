@@ -1,20 +1,38 @@
-from flask import Blueprint, jsonify, request, abort, make_response
+from flask import Blueprint, jsonify, request, abort, make_response, current_app
 from flask_login import current_user, login_required, login_user, logout_user
 from flask import Response
-from .models import Account, Contact, Opportunity, User, Token
+from .models import Account, Contact, Opportunity, User, Token, bump_data_versions
 from . import db
+from .importer import clean, normalize_email, normalize_name_key, normalize_phone, parse_int
+from .ratelimit import limiter, config_limit
+from .auth import issue_access_token
+from .replica import route_reads_to_replica
+from .metrics import count_import_rows
+from . import purge
+from .archive import opportunity_rows
+from .rollups import account_listing, refresh_rollups
 from flask import g
+import base64
+import json
 import secrets
 from datetime import datetime, timedelta
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, or_, select, update
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
+
+@api.before_request
+def _route_reads():
+    # GET handlers only read, so they can be served from the read replica
+    if request.method == 'GET':
+        route_reads_to_replica()
+
 # ===========================
 # AUTH ENDPOINTS
 # ===========================
 
 @api.route('/auth/login', methods=['POST', 'OPTIONS'])
+@limiter.limit(config_limit('RATELIMIT_LOGIN'), methods=['POST'])
 def login():
     """Login with email and password. Returns user data and sets session."""
     if request.method == 'OPTIONS':
@@ -78,6 +96,23 @@ def logout():
     logout_user()
     return jsonify({'message': 'Logged out successfully'}), 200
 
+@api.route('/auth/token', methods=['POST'])
+def exchange_token():
+    """Trade a long-lived API token (Authorization: Bearer) for a short-lived signed access token."""
+    kind, token_id = g.get('api_token', (None, None)) if current_user.is_authenticated else (None, None)
+    if kind != 'token':
+        return jsonify({'error': 'An API token is required'}), 401
+    token = db.session.get(Token, token_id)
+    if token is None or not token.is_active:
+        return jsonify({'error': 'Unauthorized'}), 401
+    access_token, expires_in = issue_access_token(token.id, current_user, token.scopes, token.expires_at)
+    return jsonify({
+        'access_token': access_token,
+        'token_type': 'Bearer',
+        'expires_in': expires_in,
+        'scopes': token.scopes,
+    }), 200
+
 @api.route('/auth/me', methods=['GET'])
 @api_login_required
 def get_current_user():
@@ -99,11 +134,12 @@ def get_current_user():
 @api.route('/dashboard/stats', methods=['GET'])
 @api_login_required
 def dashboard_stats():
-    """Get dashboard statistics."""
+    """Get dashboard statistics (``?include_archived=1`` counts archived deals too)."""
     accounts_count = Account.query.count()
     contacts_count = Contact.query.count()
-    opportunities_count = Opportunity.query.count()
-    total_opportunity_value = db.session.query(func.sum(Opportunity.value)).scalar() or 0
+    opps = opportunity_rows(include_archived=_include_archived())
+    opportunities_count, total_opportunity_value = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(opps.c.value), 0)).select_from(opps)).one()
     
     return jsonify({
         'accounts': accounts_count,
@@ -116,10 +152,22 @@ def dashboard_stats():
 # ACCOUNTS ENDPOINTS
 # ===========================
 
+def _account_rollups(account) -> dict:
+    return {
+        'contact_count': account.contact_count,
+        'open_opportunity_count': account.open_opportunity_count,
+        'open_pipeline_value': account.open_pipeline_value,
+        'last_activity_at': account.last_activity_at.isoformat() if account.last_activity_at else None,
+    }
+
 @api.route('/accounts', methods=['GET'])
 @api_login_required
 def list_accounts():
-    """List all accounts with pagination and search."""
+    """List all accounts with pagination and search.
+
+    ``sort``/``order`` and ``min_<counter>`` sort and filter on the rollup
+    columns (see ``app.rollups.account_listing``).
+    """
     q = request.args.get('q', '', type=str)
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -129,7 +177,8 @@ def list_accounts():
         pattern = f"%{q}%"
         query = query.filter(Account.name.ilike(pattern))
     
-    pagination = query.order_by(Account.name.asc()).paginate(page=page, per_page=per_page, error_out=False)
+    query = account_listing(query, request.args, Account.name.asc())
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     items = pagination.items
     
     data = [{
@@ -138,7 +187,8 @@ def list_accounts():
         'industry': a.industry,
         'phone': a.phone,
         'website': a.website,
-        'owner_id': a.owner_id
+        'owner_id': a.owner_id,
+        **_account_rollups(a)
     } for a in items]
     
     return jsonify({
@@ -155,10 +205,11 @@ def create_account():
     data = request.get_json() or {}
     name = data.get('name', '').strip()
     
-    if not name:
+    # a name of only punctuation/spaces normalizes to an empty key
+    if not normalize_name_key(name):
         return jsonify({'error': 'Account name required'}), 400
     
-    if Account.query.filter_by(name=name).first():
+    if Account.by_name(name):
         return jsonify({'error': 'Account already exists'}), 409
     
     account = Account(
@@ -191,7 +242,8 @@ def get_account(account_id):
         'phone': account.phone,
         'website': account.website,
         'owner_id': account.owner_id,
-        'created_at': account.created_at.isoformat() if account.created_at else None
+        'created_at': account.created_at.isoformat() if account.created_at else None,
+        **_account_rollups(account)
     }), 200
 
 @api.route('/accounts/<int:account_id>', methods=['PUT'])
@@ -203,8 +255,15 @@ def update_account(account_id):
         abort(403)
     
     data = request.get_json() or {}
-    if 'name' in data:
-        account.name = data['name'].strip()
+    # an unchanged name is left alone: legacy duplicates keep their " #<id>" key
+    if 'name' in data and data['name'] != account.name:
+        name = data['name'].strip()
+        if not normalize_name_key(name):
+            return jsonify({'error': 'Account name required'}), 400
+        existing = Account.by_name(name)
+        if existing and existing.id != account.id:
+            return jsonify({'error': 'Account already exists'}), 409
+        account.name = name
     if 'industry' in data:
         account.industry = data['industry']
     if 'phone' in data:
@@ -223,10 +282,173 @@ def delete_account(account_id):
     if account.owner_id != current_user.id and current_user.role not in ['admin', 'owner']:
         abort(403)
     
-    db.session.delete(account)
-    db.session.commit()
+    if not purge.delete_account(account_id):
+        return jsonify({'message': 'Account deletion scheduled'}), 202
     return jsonify({'message': 'Account deleted'}), 200
 
+# ===========================
+# ACCOUNT OVERVIEW
+# ===========================
+# The account page in one request: the account with its rollups, per-stage
+# totals, and the first page of contacts and opportunities. The related
+# lists use keyset cursors (opaque tokens holding the last row's sort key)
+# so later pages cost the same as the first however big the account is.
+
+OVERVIEW_MAX_LIMIT = 100
+
+
+def _encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+
+
+def _page_limit() -> int:
+    return max(1, min(request.args.get('limit', 20, type=int), OVERVIEW_MAX_LIMIT))
+
+
+def _contact_page(account_id: int, limit: int, cursor=None):
+    """Contacts newest first; ``cursor`` is the last id seen."""
+    query = Contact.query.filter(Contact.account_id == account_id)
+    if cursor is not None:
+        query = query.filter(Contact.id < int(cursor[0]))
+    rows = query.order_by(Contact.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor([rows[limit - 1].id]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _opportunity_page(account_id: int, limit: int, cursor=None):
+    """Opportunities by close date (undated first), then id; ``cursor`` is the last ``[close_date, id]``."""
+    query = _visible_opportunities(Opportunity.query.filter(Opportunity.account_id == account_id))
+    if cursor is not None:
+        close_date = datetime.fromisoformat(cursor[0]) if cursor[0] else None
+        if close_date is None:
+            query = query.filter(or_(and_(Opportunity.close_date.is_(None), Opportunity.id > cursor[1]),
+                                     Opportunity.close_date.is_not(None)))
+        else:
+            query = query.filter(or_(Opportunity.close_date > close_date,
+                                     and_(Opportunity.close_date == close_date, Opportunity.id > cursor[1])))
+    rows = query.order_by(Opportunity.close_date.asc().nulls_first(), Opportunity.id.asc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor([last.close_date.isoformat() if last.close_date else None, last.id])
+    return rows[:limit], next_cursor
+
+
+def _cursor_arg():
+    """The decoded ``?cursor=`` as ``(value, error_response)``."""
+    raw = request.args.get('cursor')
+    if not raw:
+        return None, None
+    cursor = _decode_cursor(raw)
+    if not isinstance(cursor, list) or not cursor:
+        return None, (jsonify({'error': 'Invalid cursor'}), 400)
+    return cursor, None
+
+
+def _contact_json(c) -> dict:
+    return {
+        'id': c.id,
+        'first_name': c.first_name,
+        'last_name': c.last_name,
+        'email': c.email,
+        'phone_number': c.phone_number,
+        'role_title': c.role_title,
+    }
+
+
+def _opportunity_json(o) -> dict:
+    return {
+        'id': o.id,
+        'name': o.name,
+        'stage': o.stage,
+        'value': o.value,
+        'close_date': o.close_date.isoformat() if o.close_date else None,
+        'owner_id': o.owner_id,
+        'created_at': o.created_at.isoformat() if o.created_at else None,
+    }
+
+
+def _owners(ids) -> dict:
+    """``{id: {...}}`` for the given user ids, in one query."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    users = db.session.query(User.id, User.first_name, User.last_name, User.email).filter(User.id.in_(ids))
+    return {str(uid): {'id': uid, 'name': f'{first} {last or ""}'.strip(), 'email': email}
+            for uid, first, last, email in users}
+
+
+@api.route('/accounts/<int:account_id>/overview', methods=['GET'])
+@api_login_required
+def account_overview(account_id):
+    """Account, summary and the first ``limit`` contacts and opportunities, in a fixed five queries."""
+    account = Account.query.get_or_404(account_id)
+    limit = _page_limit()
+    stages = _visible_opportunities(
+        db.session.query(Opportunity.stage, func.count(), func.coalesce(func.sum(Opportunity.value), 0))
+        .filter(Opportunity.account_id == account_id)).group_by(Opportunity.stage).order_by(Opportunity.stage)
+    contacts, contacts_next = _contact_page(account_id, limit)
+    opportunities, opportunities_next = _opportunity_page(account_id, limit)
+    return jsonify({
+        'account': {
+            'id': account.id,
+            'name': account.name,
+            'industry': account.industry,
+            'phone': account.phone,
+            'website': account.website,
+            'owner_id': account.owner_id,
+            'created_at': account.created_at.isoformat() if account.created_at else None,
+        },
+        'summary': {
+            **_account_rollups(account),
+            'stages': [{'stage': stage, 'count': count, 'total_value': total} for stage, count, total in stages],
+        },
+        'contacts': {'items': [_contact_json(c) for c in contacts], 'next_cursor': contacts_next},
+        'opportunities': {'items': [_opportunity_json(o) for o in opportunities], 'next_cursor': opportunities_next},
+        'owners': _owners([account.owner_id] + [o.owner_id for o in opportunities]),
+    }), 200
+
+
+@api.route('/accounts/<int:account_id>/contacts', methods=['GET'])
+@api_login_required
+def account_contacts(account_id):
+    """Further pages of an account's contacts (``?cursor=`` from the overview or a previous page)."""
+    Account.query.get_or_404(account_id)
+    cursor, error = _cursor_arg()
+    if error:
+        return error
+    try:
+        contacts, next_cursor = _contact_page(account_id, _page_limit(), cursor)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({'items': [_contact_json(c) for c in contacts], 'next_cursor': next_cursor}), 200
+
+
+@api.route('/accounts/<int:account_id>/opportunities', methods=['GET'])
+@api_login_required
+def account_opportunities(account_id):
+    """Further pages of an account's opportunities, with their owners."""
+    Account.query.get_or_404(account_id)
+    cursor, error = _cursor_arg()
+    if error:
+        return error
+    try:
+        opportunities, next_cursor = _opportunity_page(account_id, _page_limit(), cursor)
+    except (ValueError, TypeError, IndexError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'items': [_opportunity_json(o) for o in opportunities],
+        'next_cursor': next_cursor,
+        'owners': _owners(o.owner_id for o in opportunities),
+    }), 200
+
 # ===========================
 # CONTACTS ENDPOINTS
 # ===========================
@@ -356,10 +578,12 @@ def delete_contact(contact_id):
 @api.route('/opportunities', methods=['GET'])
 @api_login_required
 def list_opportunities():
-    """List all opportunities with pagination and search."""
+    """List all opportunities with pagination and search (``?include_archived=1`` adds archived deals)."""
     q = request.args.get('q', '', type=str)
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    if _include_archived():
+        return _list_opportunities_with_archive(q, page, per_page)
     
     query = Opportunity.query.join(Account)
     
@@ -396,6 +620,44 @@ def list_opportunities():
         'pages': pagination.pages
     }), 200
 
+def _include_archived() -> bool:
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def _list_opportunities_with_archive(q, page, per_page):
+    """``list_opportunities`` over a UNION ALL of the hot and archive tables."""
+    page, per_page = max(page, 1), max(per_page, 1)
+    rows = opportunity_rows(include_archived=True)
+    query = select(rows, Account.name.label('account_name')).join(Account, rows.c.account_id == Account.id)
+    if current_user.role not in ['admin', 'owner']:
+        query = query.where(rows.c.owner_id == current_user.id)
+    if q:
+        pattern = f"%{q}%"
+        query = query.where(rows.c.name.ilike(pattern) | Account.name.ilike(pattern))
+
+    total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+    items = db.session.execute(query.order_by(rows.c.close_date.asc(), rows.c.id)
+                               .limit(per_page).offset((page - 1) * per_page)).all()
+    data = [{
+        'id': o.id,
+        'name': o.name,
+        'stage': o.stage,
+        'value': o.value,
+        'close_date': o.close_date.isoformat() if o.close_date else None,
+        'account_id': o.account_id,
+        'account_name': o.account_name,
+        'owner_id': o.owner_id,
+        'created_at': o.created_at.isoformat() if o.created_at else None,
+        'archived': bool(o.archived)
+    } for o in items]
+
+    return jsonify({
+        'items': data,
+        'page': page,
+        'total': total,
+        'pages': -(-total // per_page)
+    }), 200
+
 @api.route('/opportunities', methods=['POST'])
 @api_login_required
 def create_opportunity():
@@ -487,6 +749,403 @@ def delete_opportunity(opportunity_id):
     db.session.commit()
     return jsonify({'message': 'Opportunity deleted'}), 200
 
+# ===========================
+# BULK ENDPOINTS
+# ===========================
+# POST /api/<entity>/bulk accepts a JSON array (or {"items": [...]}) or an
+# NDJSON body (Content-Type: application/x-ndjson). Items are validated as a
+# batch with set-based existence checks, inserted in chunked transactions and
+# reported back per item as {"index": i, "id": ...} or {"index": i, "error": ...}.
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _read_bulk_items():
+    """Return ``(items, None)`` or ``(None, error_response)`` for a bulk request body."""
+    max_items = current_app.config.get('API_BULK_MAX_ITEMS', 50000)
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for lineno, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if len(items) >= max_items:
+                return None, (jsonify({'error': f'Too many items (max {max_items})'}), 413)
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                return None, (jsonify({'error': f'Invalid JSON on line {lineno}'}), 400)
+        return items, None
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('items')
+    if not isinstance(data, list):
+        return None, (jsonify({'error': 'Expected a JSON array or an NDJSON body'}), 400)
+    if len(data) > max_items:
+        return None, (jsonify({'error': f'Too many items (max {max_items})'}), 413)
+    return data, None
+
+
+def _existing_values(column, values) -> set:
+    """Return the subset of ``values`` present in ``column``, using chunked IN queries."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), 500):
+        chunk = values[start:start + 500]
+        found.update(v for (v,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+
+def _bulk_commit(pending, results) -> int:
+    """Insert ``(index, obj)`` pairs in chunked transactions and record per-item results.
+
+    If a chunk fails, its items are retried one per transaction so only the
+    offending items are reported as failed.
+    """
+    chunk_size = current_app.config.get('API_BULK_CHUNK_SIZE', 1000)
+    created = 0
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        db.session.add_all([obj for _, obj in chunk])
+        try:
+            db.session.flush()
+            ids = [(idx, obj.id) for idx, obj in chunk]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.warning('Bulk insert of %d items failed; retrying them one by one', len(chunk),
+                                       exc_info=True)
+            created += sum(_bulk_commit_one(idx, obj, results) for idx, obj in chunk)
+            continue
+        for idx, obj_id in ids:
+            results[idx] = {'index': idx, 'id': obj_id}
+        created += len(ids)
+    return created
+
+
+def _bulk_commit_one(idx, obj, results) -> int:
+    obj.id = None  # may hold an id assigned by the rolled-back flush
+    db.session.add(obj)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Bulk insert of item %d failed', idx)
+        results[idx] = {'index': idx, 'error': 'Could not be saved'}
+        return 0
+    results[idx] = {'index': idx, 'id': obj.id}
+    return 1
+
+
+def _bulk_response(entity, items, results, pending):
+    created = _bulk_commit(pending, results)
+    count_import_rows(entity, created, len(items) - created)
+    return jsonify({
+        'created': created,
+        'failed': len(items) - created,
+        'results': [results[idx] for idx in range(len(items))]
+    }), 200
+
+
+def _parse_account_ids(items, results) -> dict:
+    """Validate ``account_id`` on each item; returns index -> account_id for items that pass."""
+    account_ids = {}
+    for idx, item in enumerate(items):
+        if idx in results:
+            continue
+        try:
+            account_ids[idx] = int(item.get('account_id'))
+        except (TypeError, ValueError):
+            results[idx] = {'index': idx, 'error': 'account_id required'}
+    existing = _existing_values(Account.id, set(account_ids.values()))
+    for idx, account_id in list(account_ids.items()):
+        if account_id not in existing:
+            results[idx] = {'index': idx, 'error': 'Account not found'}
+            del account_ids[idx]
+    return account_ids
+
+
+def _check_objects(items, results):
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[idx] = {'index': idx, 'error': 'Item must be a JSON object'}
+
+
+@api.route('/accounts/bulk', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
+@api_login_required
+def bulk_create_accounts():
+    """Create many accounts in one request."""
+    items, error = _read_bulk_items()
+    if error:
+        return error
+    results = {}
+    _check_objects(items, results)
+
+    names = {}
+    seen = set()
+    for idx, item in enumerate(items):
+        if idx in results:
+            continue
+        name = clean(item.get('name'))
+        key = normalize_name_key(name)
+        if not key:
+            results[idx] = {'index': idx, 'error': 'Account name required'}
+        elif key in seen:
+            results[idx] = {'index': idx, 'error': 'Duplicate account name in request'}
+        else:
+            seen.add(key)
+            names[idx] = name
+
+    existing = _existing_values(Account.name_key, seen)
+    pending = []
+    for idx, name in names.items():
+        if normalize_name_key(name) in existing:
+            results[idx] = {'index': idx, 'error': 'Account already exists'}
+            continue
+        item = items[idx]
+        pending.append((idx, Account(
+            name=name,
+            industry=clean(item.get('industry')),
+            phone=normalize_phone(item.get('phone')),
+            website=clean(item.get('website')),
+            owner_id=current_user.id
+        )))
+    return _bulk_response('accounts', items, results, pending)
+
+
+@api.route('/contacts/bulk', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
+@api_login_required
+def bulk_create_contacts():
+    """Create many contacts in one request."""
+    items, error = _read_bulk_items()
+    if error:
+        return error
+    results = {}
+    _check_objects(items, results)
+    for idx, item in enumerate(items):
+        if idx not in results and not clean(item.get('first_name')):
+            results[idx] = {'index': idx, 'error': 'first_name and account_id required'}
+
+    pending = []
+    for idx, account_id in _parse_account_ids(items, results).items():
+        item = items[idx]
+        pending.append((idx, Contact(
+            first_name=clean(item.get('first_name')),
+            last_name=clean(item.get('last_name')),
+            email=normalize_email(item.get('email')),
+            phone_number=normalize_phone(item.get('phone_number')),
+            role_title=clean(item.get('role_title')),
+            account_id=account_id
+        )))
+    return _bulk_response('contacts', items, results, pending)
+
+
+def _parse_close_date(value):
+    value = clean(value)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'invalid close_date "{value}"')
+
+
+@api.route('/opportunities/bulk', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
+@api_login_required
+def bulk_create_opportunities():
+    """Create many opportunities in one request."""
+    items, error = _read_bulk_items()
+    if error:
+        return error
+    results = {}
+    _check_objects(items, results)
+    for idx, item in enumerate(items):
+        if idx not in results and not clean(item.get('name')):
+            results[idx] = {'index': idx, 'error': 'name and account_id required'}
+
+    pending = []
+    for idx, account_id in _parse_account_ids(items, results).items():
+        item = items[idx]
+        try:
+            value = parse_int(item.get('value'))
+            close_date = _parse_close_date(item.get('close_date'))
+        except ValueError as e:
+            results[idx] = {'index': idx, 'error': str(e)}
+            continue
+        pending.append((idx, Opportunity(
+            name=clean(item.get('name')),
+            stage=clean(item.get('stage')) or 'Prospecting',
+            value=value if value is not None else 0,
+            close_date=close_date,
+            account_id=account_id,
+            owner_id=current_user.id
+        )))
+    return _bulk_response('opportunities', items, results, pending)
+
+# ===========================
+# PIPELINE BOARD
+# ===========================
+# Cards within a stage are ordered by ``position`` (set by dragging), then by
+# close date for cards that were never moved. Non-admins see and reorder only
+# their own opportunities.
+
+PIPELINE_MAX_MOVES = 500
+
+
+def _pipeline_stages(found) -> list:
+    """Configured stages first (even when empty), then any other stage in use."""
+    configured = [s.strip() for s in current_app.config.get('PIPELINE_STAGES', '').split(',') if s.strip()]
+    return configured + sorted((s for s in found if s not in configured), key=lambda s: (s is None, s or ''))
+
+
+def _board_order():
+    return (Opportunity.position.is_(None), Opportunity.position,
+            Opportunity.close_date.is_(None), Opportunity.close_date, Opportunity.id)
+
+
+def _visible_opportunities(query):
+    if current_user.role not in ['admin', 'owner']:
+        query = query.filter(Opportunity.owner_id == current_user.id)
+    return query
+
+
+@api.route('/pipeline/board', methods=['GET'])
+@api_login_required
+def pipeline_board():
+    """Top ``limit`` opportunities per stage plus per-stage counts and value totals, in one query."""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    partition = {'partition_by': Opportunity.stage}
+    ranked = _visible_opportunities(db.session.query(
+        Opportunity.id,
+        Opportunity.name,
+        Opportunity.stage,
+        Opportunity.value,
+        Opportunity.close_date,
+        Opportunity.position,
+        Opportunity.account_id,
+        Account.name.label('account_name'),
+        Opportunity.owner_id,
+        func.row_number().over(order_by=_board_order(), **partition).label('board_rank'),
+        func.count().over(**partition).label('stage_count'),
+        func.sum(Opportunity.value).over(**partition).label('stage_value'),
+    ).join(Account, Opportunity.account_id == Account.id)).subquery()
+    rows = db.session.query(ranked).filter(ranked.c.board_rank <= limit).order_by(ranked.c.stage, ranked.c.board_rank)
+
+    columns = {}
+    for r in rows:
+        column = columns.setdefault(r.stage, {'stage': r.stage, 'count': r.stage_count,
+                                              'total_value': r.stage_value or 0, 'items': []})
+        column['items'].append({
+            'id': r.id,
+            'name': r.name,
+            'value': r.value,
+            'close_date': r.close_date.isoformat() if r.close_date else None,
+            'position': r.position,
+            'account_id': r.account_id,
+            'account_name': r.account_name,
+            'owner_id': r.owner_id,
+        })
+    stages = [columns.get(stage) or {'stage': stage, 'count': 0, 'total_value': 0, 'items': []}
+              for stage in _pipeline_stages(columns)]
+    return jsonify({'stages': stages, 'limit': limit}), 200
+
+
+def _parse_moves(data):
+    """Return ``(moves, None)`` or ``(None, error_response)``; moves are ``(id, stage, position)``."""
+    if isinstance(data, dict):
+        data = data.get('moves')
+    if not isinstance(data, list) or not data:
+        return None, (jsonify({'error': 'Expected a non-empty list of moves'}), 400)
+    if len(data) > PIPELINE_MAX_MOVES:
+        return None, (jsonify({'error': f'Too many moves (max {PIPELINE_MAX_MOVES})'}), 413)
+    moves = []
+    for idx, item in enumerate(data):
+        try:
+            opp_id, position = int(item['id']), int(item['position'])
+            stage = clean(item['stage'])
+        except (KeyError, TypeError, ValueError):
+            return None, (jsonify({'error': f'Move {idx}: id, stage and position required'}), 400)
+        if not stage or len(stage) > 50 or position < 0:
+            return None, (jsonify({'error': f'Move {idx}: invalid stage or position'}), 400)
+        moves.append((opp_id, stage, position))
+    return moves, None
+
+
+@api.route('/pipeline/moves', methods=['PATCH'])
+@api_login_required
+def pipeline_moves():
+    """Apply a batch of drag-and-drop moves in one transaction.
+
+    Body: ``[{"id": 7, "stage": "Proposal", "position": 0}, ...]`` (or
+    ``{"moves": [...]}``), applied in order; ``position`` is the card's index
+    in the target column. Either every move is applied or none is.
+    """
+    moves, error = _parse_moves(request.get_json(silent=True))
+    if error:
+        return error
+    ids = {opp_id for opp_id, _, _ in moves}
+    found = _visible_opportunities(db.session.query(Opportunity.id, Opportunity.stage, Opportunity.account_id)
+                                   .filter(Opportunity.id.in_(ids))).all()
+    current = {opp_id: stage for opp_id, stage, _ in found}
+    missing = sorted(ids - set(current))
+    if missing:
+        # unknown and not-yours look the same, as with GET /api/opportunities/<id> for a stranger's deal
+        return jsonify({'error': 'Opportunities not found', 'ids': missing}), 404
+
+    # current order of every affected column, then replay the moves on it. ``position`` is shared by
+    # every card in a column, so the whole column is renumbered, not just the cards this user can see
+    affected = set(current.values()) | {stage for _, stage, _ in moves}
+    order = {stage: [] for stage in affected}
+    in_affected = Opportunity.stage.in_(affected - {None})
+    if None in affected:
+        in_affected = or_(in_affected, Opportunity.stage.is_(None))
+    rows = (db.session.query(Opportunity.id, Opportunity.stage, Opportunity.position, Opportunity.owner_id)
+            .filter(in_affected).order_by(*_board_order()))
+    sees_all = current_user.role in ['admin', 'owner']
+    old_positions = {}
+    visible = set()
+    for opp_id, stage, position, owner_id in rows:
+        order[stage].append(opp_id)
+        old_positions[opp_id] = position
+        if sees_all or owner_id == current_user.id:
+            visible.add(opp_id)
+    stage_of = dict(current)
+    for opp_id, stage, position in moves:
+        order[stage_of[opp_id]].remove(opp_id)
+        column = order[stage]
+        # ``position`` indexes the column as this user sees it: land before the card shown there,
+        # or just after the last card they can see
+        shown = [i for i in column if i in visible]
+        if position < len(shown):
+            column.insert(column.index(shown[position]), opp_id)
+        elif shown:
+            column.insert(column.index(shown[-1]) + 1, opp_id)
+        else:
+            column.append(opp_id)
+        stage_of[opp_id] = stage
+
+    updates = [{'id': opp_id, 'stage': stage, 'position': pos}
+               for stage, column in order.items()
+               for pos, opp_id in enumerate(column)
+               if old_positions.get(opp_id) != pos or current.get(opp_id, stage) != stage]
+    if updates:
+        # executemany UPDATE by primary key; a Core-style write, so bump the export version
+        # and recount the accounts' open deals (a card may have moved in or out of Closed) by hand
+        db.session.execute(update(Opportunity), updates)
+        bump_data_versions(db.session.connection(), ['opportunity'])
+        if any(current[opp_id] != stage for opp_id, stage, _ in moves):
+            refresh_rollups(db.session.connection(), {account_id for _, _, account_id in found})
+    db.session.commit()
+    return jsonify({
+        'moved': len(moves),
+        'updated': len(updates),
+        'stages': {stage: [i for i in column if i in visible] for stage, column in order.items()},
+    }), 200
+
 # ===========================
 # LEADS ENDPOINTS
 # ===========================
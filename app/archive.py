@@ -0,0 +1,59 @@
+"""Hot/cold split of opportunities.
+
+``archive_opportunities`` moves closed deals (``CLOSED_STAGES``) whose close
+date, or creation date when they have none, is older than a cutoff from
+``opportunity`` to ``opportunity_archive``, ``chunk_size`` rows per
+transaction (``INSERT ... SELECT`` then ``DELETE`` by id); it backs
+``flask archive-opportunities``. Day-to-day views only read the hot table;
+``opportunity_rows(include_archived=True)`` gives a ``UNION ALL`` of both
+for the list/report APIs.
+"""
+from datetime import datetime
+
+from sqlalchemy import false, func, literal, select, true, union_all
+
+from . import db
+from .models import Opportunity, OpportunityArchive, bump_data_versions
+
+CLOSED_STAGES = ('Closed-Won', 'Closed-Lost')
+ARCHIVE_CHUNK_SIZE = 500
+
+_hot = Opportunity.__table__
+_cold = OpportunityArchive.__table__
+_COLUMNS = ('id', 'name', 'stage', 'value', 'close_date', 'created_at', 'position', 'account_id', 'owner_id')
+
+
+def _archivable(cutoff):
+    return (_hot.c.stage.in_(CLOSED_STAGES)
+            & (func.coalesce(_hot.c.close_date, _hot.c.created_at) < cutoff))
+
+
+def count_archivable(cutoff) -> int:
+    return db.session.execute(select(func.count()).select_from(_hot).where(_archivable(cutoff))).scalar()
+
+
+def archive_opportunities(cutoff, chunk_size: int = ARCHIVE_CHUNK_SIZE, now=None) -> int:
+    """Move closed opportunities older than ``cutoff`` to the archive; returns how many were moved."""
+    now = now or datetime.utcnow()
+    moved = 0
+    while True:
+        with db.engine.begin() as conn:
+            ids = conn.execute(select(_hot.c.id).where(_archivable(cutoff))
+                               .order_by(_hot.c.id).limit(chunk_size)).scalars().all()
+            if not ids:
+                break
+            rows = select(*[_hot.c[name] for name in _COLUMNS], literal(now)).where(_hot.c.id.in_(ids))
+            conn.execute(_cold.insert().from_select(list(_COLUMNS) + ['archived_at'], rows))
+            conn.execute(_hot.delete().where(_hot.c.id.in_(ids)))
+            bump_data_versions(conn, [_hot.name, _cold.name])
+        moved += len(ids)
+    return moved
+
+
+def opportunity_rows(include_archived: bool = False):
+    """A subquery of opportunity rows with an ``archived`` flag, optionally including the archive."""
+    hot = select(*[_hot.c[name] for name in _COLUMNS], false().label('archived'))
+    if not include_archived:
+        return hot.subquery('opportunities')
+    cold = select(*[_cold.c[name] for name in _COLUMNS], true().label('archived'))
+    return union_all(hot, cold).subquery('opportunities')
@@ -0,0 +1,248 @@
+"""Flask-Login user and request loaders.
+
+Sessions resolve to ``UserSnapshot`` objects from a per-process cache
+(``USER_CACHE_TTL``) instead of a ``SELECT`` from ``user`` on every request.
+``invalidate_user`` must be called after any change to a user's identity
+fields (edit, role change, delete, password reset); it drops the local entry
+and bumps a stamp file (``AUTH_CACHE_STAMP``, by default under the instance
+folder) so every worker clears its caches before serving its next request.
+
+Requests carrying ``Authorization: Bearer <token>`` are authenticated by the
+``request_loader`` below: candidate tokens are found via the indexed
+``token_prefix`` column and verified with HMAC-SHA256. Successful
+verifications are kept in a bounded TTL cache keyed on a SHA-256 digest of the
+token, so repeat calls skip the lookup entirely; ``invalidate_token`` (called
+from ``Token.revoke``) drops them in the same way. Each authenticated request
+is counted by ``app.tokens.record_token_use`` and written back in batches.
+
+``POST /api/auth/token`` exchanges such a token for a short-lived signed
+access token (``issue_access_token``) carrying the user's id, role, names and
+the token's scopes. Access tokens are verified from the signature alone; the
+only state consulted is a per-process map of live token ids and their owners'
+roles, reloaded every ``API_ACCESS_TOKEN_REFRESH`` seconds (and at once when
+the invalidation stamp changes), so a revoked, expired, swept or re-roled
+token's access tokens stop working without a lookup per request.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import UserMixin
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import or_
+
+from . import db, login_manager
+from .cache import SharedStamp, TTLCache
+from .models import Token, User
+from .tokens import record_token_use
+
+
+@dataclass(frozen=True, eq=False)
+class UserSnapshot(UserMixin):
+    """Immutable copy of a User's identity fields, used as ``current_user``."""
+    id: int
+    email: str
+    first_name: str
+    last_name: str
+    role: str
+    # scopes of the API token the request was authenticated with, if any
+    scopes: str = None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, email=user.email, first_name=user.first_name,
+                   last_name=user.last_name, role=user.role)
+
+    def get_record(self):
+        """Load the full User row (for anything beyond the cached fields)."""
+        return db.session.get(User, self.id)
+
+    def check_password(self, password):
+        user = self.get_record()
+        return user is not None and user.check_password(password)
+
+
+def _stamp() -> SharedStamp:
+    stamp = current_app.extensions.get('auth_cache_stamp')
+    if stamp is None:
+        stamp = SharedStamp(current_app.config.get('AUTH_CACHE_STAMP')
+                            or os.path.join(current_app.instance_path, 'auth_cache.stamp'))
+        current_app.extensions['auth_cache_stamp'] = stamp
+    return stamp
+
+
+def _check_stamp():
+    if _stamp().changed():
+        _user_cache().clear()
+        _token_cache().clear()
+        current_app.extensions.pop('live_tokens', None)
+
+
+def _user_cache() -> TTLCache:
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        cache = TTLCache(maxsize=current_app.config.get('USER_CACHE_SIZE', 1024),
+                         ttl=current_app.config.get('USER_CACHE_TTL', 30))
+        current_app.extensions['user_cache'] = cache
+    return cache
+
+
+def _token_cache() -> TTLCache:
+    cache = current_app.extensions.get('token_cache')
+    if cache is None:
+        cache = TTLCache(maxsize=current_app.config.get('API_TOKEN_CACHE_SIZE', 4096),
+                         ttl=current_app.config.get('API_TOKEN_CACHE_TTL', 60))
+        current_app.extensions['token_cache'] = cache
+    return cache
+
+
+def bearer_token_from_request(req=None):
+    req = req or request
+    header = req.headers.get('Authorization', '')
+    if header[:7].lower() == 'bearer ':
+        return header[7:].strip() or None
+    return None
+
+
+def authenticate_token(plain_token: str):
+    """Return ``(token_id, user_id, expires_at)`` for a valid token, else None."""
+    digest = hashlib.sha256(plain_token.encode('utf-8')).hexdigest()
+    _check_stamp()
+    cache = _token_cache()
+    entry = cache.get(digest)
+    if entry is not None:
+        expires_at = entry[2]
+        if expires_at is None or datetime.utcnow() <= expires_at:
+            return entry
+        cache.pop(digest)
+        return None
+
+    for token in Token.query.filter_by(token_prefix=plain_token[:8]):
+        if not token.check_token(plain_token):
+            continue
+        if token.needs_rehash:
+            # migrate legacy PBKDF2 hashes to HMAC on first successful use
+            token.set_token(plain_token)
+            db.session.commit()
+        entry = (token.id, token.user_id, token.expires_at)
+        cache.set(digest, entry)
+        return entry
+    return None
+
+
+def invalidate_token(token_id: int):
+    """Forget cached verifications of ``token_id`` (e.g. after it is revoked), in every worker."""
+    _token_cache().evict(lambda _, entry: entry[0] == token_id)
+    _stamp().bump()
+
+
+ACCESS_TOKEN_SALT = 'api-access-token'
+
+
+def _access_serializer():
+    # same serializer as password reset links, with its own salt so the two can't be swapped
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=ACCESS_TOKEN_SALT)
+
+
+def issue_access_token(token_id: int, user, scopes=None, expires_at=None):
+    """Return ``(signed access token, lifetime in seconds)`` for an authenticated API token."""
+    ttl = int(current_app.config.get('API_ACCESS_TOKEN_TTL', 900))
+    if expires_at is not None:
+        ttl = max(0, min(ttl, int((expires_at - datetime.utcnow()).total_seconds())))
+    payload = {
+        'uid': user.id, 'tid': token_id, 'role': user.role, 'scopes': scopes,
+        'email': user.email, 'fn': user.first_name, 'ln': user.last_name,
+        'exp': int(time.time()) + ttl,
+    }
+    return _access_serializer().dumps(payload), ttl
+
+
+_live_tokens_lock = threading.Lock()
+
+
+def _live_tokens() -> dict:
+    """``{token_id: (user_id, role)}`` for unrevoked, unexpired tokens, reloaded on an interval."""
+    cached = current_app.extensions.get('live_tokens')
+    interval = current_app.config.get('API_ACCESS_TOKEN_REFRESH', 10)
+    if cached is not None and time.monotonic() - cached[0] < interval:
+        return cached[1]
+    with _live_tokens_lock:
+        cached = current_app.extensions.get('live_tokens')
+        if cached is not None and time.monotonic() - cached[0] < interval:
+            return cached[1]
+        now = datetime.utcnow()
+        rows = db.session.query(Token.id, Token.user_id, User.role).join(User, Token.user_id == User.id).filter(
+            or_(Token.revoked.is_(False), Token.revoked.is_(None)),
+            or_(Token.expires_at.is_(None), Token.expires_at > now),
+        )
+        live = {tid: (uid, role) for tid, uid, role in rows}
+        current_app.extensions['live_tokens'] = (time.monotonic(), live)
+        return live
+
+
+def verify_access_token(value: str):
+    """Return a UserSnapshot for a valid, unrevoked access token, else None."""
+    try:
+        data = _access_serializer().loads(value, max_age=current_app.config.get('API_ACCESS_TOKEN_TTL', 900))
+    except BadSignature:
+        return None
+    if data.get('exp', 0) < time.time():
+        return None
+    _check_stamp()
+    if _live_tokens().get(data['tid']) != (data['uid'], data['role']):
+        return None
+    g.api_token = ('access', data['tid'])
+    record_token_use(data['tid'])
+    return UserSnapshot(id=data['uid'], email=data['email'], first_name=data['fn'],
+                        last_name=data['ln'], role=data['role'], scopes=data.get('scopes'))
+
+
+def get_user_snapshot(user_id: int):
+    _check_stamp()
+    cache = _user_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        cache.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: int):
+    """Drop the cached snapshot of ``user_id`` here and make other workers reload theirs."""
+    _user_cache().pop(user_id)
+    _stamp().bump()
+
+
+# This is the callback function that Flask-Login will use to load a user
+# from the session. It must be defined to use Flask-Login.
+@login_manager.user_loader
+def load_user(user_id):
+    try:
+        return get_user_snapshot(int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+@login_manager.request_loader
+def load_user_from_request(req):
+    plain_token = bearer_token_from_request(req)
+    if not plain_token:
+        return None
+    if '.' in plain_token:
+        # signed access token (API tokens are URL-safe base64 and never contain '.')
+        return verify_access_token(plain_token)
+    entry = authenticate_token(plain_token)
+    if entry is None:
+        return None
+    user = get_user_snapshot(entry[1])
+    if user is not None:
+        g.api_token = ('token', entry[0])
+        record_token_use(entry[0])
+    return user
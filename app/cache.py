@@ -0,0 +1,90 @@
+"""Small in-process caches."""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def evict(self, predicate) -> int:
+        """Remove every entry for which ``predicate(key, value)`` is true; returns the count."""
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+        return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedStamp:
+    """Cross-process "something changed" signal backed by a file's mtime.
+
+    Writers call ``bump()``; each process calls ``changed()`` before trusting
+    its local caches, which costs one ``stat`` call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._seen = None
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        current = self._mtime()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a'):
+            pass
+        # force a strictly newer mtime even if the clock or FS granularity hasn't moved
+        mtime = max(time.time_ns(), current + 1000)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def changed(self) -> bool:
+        mtime = self._mtime()
+        if mtime == self._seen:
+            return False
+        first = self._seen is None
+        self._seen = mtime
+        return not first
@@ -12,11 +12,88 @@ class Config:
     # Used for session security (e.g., Flask-Login)
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a_very_long_and_very_secret_key_fallback'
     
+    # API tokens are stored as HMAC-SHA256 digests keyed with this value
+    # (defaults to SECRET_KEY; set it separately to allow rotating SECRET_KEY)
+    TOKEN_HMAC_KEY = os.environ.get('TOKEN_HMAC_KEY')
+    # Successful token verifications are cached per process for this long
+    API_TOKEN_CACHE_TTL = int(os.environ.get('API_TOKEN_CACHE_TTL', 60))
+    API_TOKEN_CACHE_SIZE = int(os.environ.get('API_TOKEN_CACHE_SIZE', 4096))
+    # Signed access tokens from POST /api/auth/token: lifetime, and how often
+    # each process reloads the set of live (unrevoked) API tokens they check against
+    API_ACCESS_TOKEN_TTL = int(os.environ.get('API_ACCESS_TOKEN_TTL', 900))
+    API_ACCESS_TOKEN_REFRESH = float(os.environ.get('API_ACCESS_TOKEN_REFRESH', 10))
+    # Token last_used_at/use_count are written back in one batch this often
+    TOKEN_USAGE_FLUSH_INTERVAL = float(os.environ.get('TOKEN_USAGE_FLUSH_INTERVAL', 5))
+    # Per-process cache of logged-in user identities (see app/auth.py)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    # File whose mtime tells every worker to drop its user/token caches; all
+    # workers must see the same file (defaults to <instance>/auth_cache.stamp)
+    AUTH_CACHE_STAMP = os.environ.get('AUTH_CACHE_STAMP')
+
+    # Password hashing policy (see app/passwords.py); stored hashes with other
+    # parameters are upgraded on the user's next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+    # Threads doing hashing work (bounds CPU spent on logins; 0 = request thread)
+    # and how many more calls may wait for one before logins get a 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 64))
+
     # Database Config
     # Sets the database URI from the .env file, or defaults to a simple SQLite file
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica for list/report/export views and API GETs (see
+    # app/replica.py); users read from the primary for a few seconds after writing
+    SQLALCHEMY_READ_REPLICA_URI = os.environ.get('READ_REPLICA_URL')
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    # Local testing: refresh a SQLite replica from the primary with the backup API (0 = off)
+    READ_REPLICA_REFRESH_SECONDS = float(os.environ.get('READ_REPLICA_REFRESH_SECONDS', 0))
+
+    # SQLite connection profile (see app/sqlite_profile.py): 'production' sets
+    # WAL, synchronous=NORMAL, busy_timeout, mmap/cache sizes and foreign keys
+    # on every connection; 'default' keeps SQLite's own settings
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))  # pages, or KiB if negative
+    # Connection pool per process; size it to the worker's thread count
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    SQLITE_POOL_OVERFLOW = int(os.environ.get('SQLITE_POOL_OVERFLOW', 10))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get('SQLITE_POOL_TIMEOUT', 30))
+
+    # Per-request SQL instrumentation (see app/instrumentation.py): Server-Timing
+    # header, and warnings for expensive requests and suspected N+1 queries
+    SQL_INSTRUMENTATION_ENABLED = os.environ.get('SQL_INSTRUMENTATION_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True').lower() in ('1', 'true', 'yes')
+    SQL_LOG_QUERY_COUNT = int(os.environ.get('SQL_LOG_QUERY_COUNT', 30))
+    SQL_LOG_DB_MS = float(os.environ.get('SQL_LOG_DB_MS', 250))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+
+    # Slow-query log (see app/slow_queries.py): statements slower than this are
+    # written with their EXPLAIN QUERY PLAN to SLOW_QUERY_LOG (defaults to
+    # <instance>/slow_queries.jsonl); `flask slow-queries top` summarizes it
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'True').lower() in ('1', 'true', 'yes')
+
+    # On-demand profiling of admin requests sent with an X-Profile header or
+    # ?_profile=1 (see app/profiler.py); reports go to PROFILE_DIR (defaults
+    # to <instance>/profiles), keeping the newest PROFILE_KEEP
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+
+    # Prometheus metrics at /metrics (see app/metrics.py). Every worker writes
+    # to its own file in METRICS_DIR (defaults to <instance>/metrics), which
+    # must be shared by all workers on the host; set METRICS_TOKEN to require
+    # "Authorization: Bearer <token>" from the scraper
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 
     # Security headers
     STRICT_TRANSPORT_SECURITY = os.environ.get('STRICT_TRANSPORT_SECURITY', 'max-age=31536000; includeSubDomains')
@@ -25,12 +102,48 @@ class Config:
     X_FRAME_OPTIONS = 'SAMEORIGIN'
     X_XSS_PROTECTION = '1; mode=block'
     
-    # Rate limiting
+    # Rate limiting (see app/ratelimit.py). Limits apply per endpoint and signed-in
+    # user (or client address when anonymous); use sqlite:///ratelimit.db to share
+    # counters between workers
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True').lower() in ('1', 'true', 'yes')
     RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '100/hour')
     RATELIMIT_HEADERS_ENABLED = True
-    RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
-    RATELIMIT_STRATEGY = 'fixed-window'
-    
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL') or os.environ.get('REDIS_URL', 'memory://')
+    # fixed-window, sliding-window or token-bucket
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'fixed-window')
+    # Per-route overrides for the endpoints that are expensive or brute-forceable
+    RATELIMIT_LOGIN = os.environ.get('RATELIMIT_LOGIN', '10/minute;50/hour')
+    RATELIMIT_IMPORT = os.environ.get('RATELIMIT_IMPORT', '20/hour')
+    RATELIMIT_EXPORT = os.environ.get('RATELIMIT_EXPORT', '30/minute')
+    # Number of reverse proxies in front of the app whose X-Forwarded-For/-Proto
+    # headers are trusted (werkzeug ProxyFix); 0 uses the socket address as is
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+    # CSV imports: rows are normalized in chunks, inline by default. Setting this
+    # to 2+ validates files larger than one chunk in a process pool of that many
+    # workers; the pool is started per import, so it only pays off for very
+    # large files on hosts with idle cores
+    IMPORT_VALIDATION_WORKERS = int(os.environ.get('IMPORT_VALIDATION_WORKERS', 0))
+    IMPORT_VALIDATION_CHUNK_SIZE = int(os.environ.get('IMPORT_VALIDATION_CHUNK_SIZE', 5000))
+
+    # Accounts with more contacts/opportunities than this are deleted by a
+    # background purge, this many rows per transaction (see app/purge.py)
+    ACCOUNT_PURGE_THRESHOLD = int(os.environ.get('ACCOUNT_PURGE_THRESHOLD', 5000))
+    ACCOUNT_PURGE_CHUNK_SIZE = int(os.environ.get('ACCOUNT_PURGE_CHUNK_SIZE', 1000))
+
+    # Pipeline board columns, in order (GET /api/pipeline/board); stages in use
+    # but not listed here are shown after these
+    PIPELINE_STAGES = os.environ.get('PIPELINE_STAGES', 'Prospecting,Qualification,Proposal,Negotiation,Closed-Won,Closed-Lost')
+
+    # Bulk API writes (POST /api/<entity>/bulk)
+    API_BULK_MAX_ITEMS = int(os.environ.get('API_BULK_MAX_ITEMS', 50000))
+    API_BULK_CHUNK_SIZE = int(os.environ.get('API_BULK_CHUNK_SIZE', 1000))
+
+    # Cached export artifacts (defaults to <instance>/exports)
+    EXPORT_CACHE_ENABLED = os.environ.get('EXPORT_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR')
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
     # Mail settings (optional)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 0)) if os.environ.get('MAIL_PORT') else None
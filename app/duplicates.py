@@ -0,0 +1,197 @@
+"""Duplicate contact detection and merging.
+
+``find_duplicate_contacts`` (``flask find-duplicate-contacts``) never
+compares every contact with every other. One streaming pass puts each
+contact in hash buckets by its blocking keys:
+
+- normalized email
+- the last 9 digits of its phone number (so '+27 11 555 0100' meets '011 555 0100')
+- soundex of first and last name within the same account
+
+Then only contacts sharing a bucket are scored. Buckets bigger than
+``max_bucket`` (a shared ``info@`` address, a placeholder phone number) are
+skipped rather than scored pairwise. Pairs scoring at least ``threshold``
+are written to ``contact_duplicate`` for review at /admin/duplicates, where
+``merge_duplicates`` folds each duplicate into the contact it duplicates.
+"""
+from difflib import SequenceMatcher
+
+from sqlalchemy import delete, or_, select
+
+from . import db
+from .importer import normalize_email
+from .models import Contact, ContactDuplicate
+
+SCAN_CHUNK_SIZE = 5000
+MAX_BUCKET = 50
+THRESHOLD = 0.7
+MERGED_FIELDS = ('last_name', 'email', 'phone_number', 'role_title')
+
+_contact = Contact.__table__
+_suggestion = ContactDuplicate.__table__
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ('aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r')) for c in letters}
+
+
+def soundex(name) -> str:
+    """American soundex ('Robert' and 'Rupert' -> 'R163'); '' for names without letters."""
+    letters = [c for c in (name or '').lower() if c in _SOUNDEX_CODES]
+    if not letters:
+        return ''
+    code, last = letters[0].upper(), _SOUNDEX_CODES[letters[0]]
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES[c]
+        if digit != '0' and digit != last:
+            code += digit
+        if c not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def phone_key(value) -> str:
+    """The last 9 digits of a phone number, or '' if it has fewer than 7."""
+    digits = ''.join(c for c in (value or '') if c.isdigit())
+    return digits[-9:] if len(digits) >= 7 else ''
+
+
+def blocking_keys(first_name, last_name, email, phone, account_id):
+    email = normalize_email(email)
+    if email:
+        yield ('email', email)
+    phone = phone_key(phone)
+    if phone:
+        yield ('phone', phone)
+    name = (soundex(first_name), soundex(last_name))
+    if name[0] and name[1]:
+        yield ('name', account_id) + name
+
+
+def _full_name(first_name, last_name) -> str:
+    return ' '.join(f'{first_name or ""} {last_name or ""}'.lower().split())
+
+
+def score_pair(a, b):
+    """``(score, reasons)`` for two ``(id, first, last, email, phone, account_id)`` rows."""
+    score, reasons = 0.0, []
+    email = normalize_email(a[3])
+    if email and email == normalize_email(b[3]):
+        score += 0.6
+        reasons.append('email')
+    phone = phone_key(a[4])
+    if phone and phone == phone_key(b[4]):
+        score += 0.4
+        reasons.append('phone')
+    names = _full_name(a[1], a[2]), _full_name(b[1], b[2])
+    similarity = SequenceMatcher(None, *names).ratio() if all(names) else 0.0
+    if similarity >= 0.8:
+        reasons.append('name')
+    score += 0.5 * similarity
+    if a[5] == b[5]:
+        score += 0.2
+        reasons.append('account')
+    return min(round(score, 3), 1.0), reasons
+
+
+def _candidate_pairs(conn, max_bucket: int, chunk_size: int) -> set:
+    """``(older id, newer id)`` pairs sharing at least one bucket of at most ``max_bucket`` contacts."""
+    buckets = {}
+    columns = (_contact.c.id, _contact.c.first_name, _contact.c.last_name, _contact.c.email,
+               _contact.c.phone_number, _contact.c.account_id)
+    last_id = 0
+    while True:
+        rows = conn.execute(select(*columns).where(_contact.c.id > last_id)
+                            .order_by(_contact.c.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        for row in rows:
+            for key in blocking_keys(*row[1:]):
+                # most buckets hold one contact: keep a bare id until a second one arrives
+                bucket = buckets.setdefault(hash(key), row[0])
+                if isinstance(bucket, list):
+                    if len(bucket) <= max_bucket:
+                        bucket.append(row[0])
+                elif bucket != row[0]:
+                    buckets[hash(key)] = [bucket, row[0]]
+        last_id = rows[-1][0]
+    pairs = set()
+    for bucket in buckets.values():
+        if isinstance(bucket, list) and len(bucket) <= max_bucket:
+            pairs.update((a, b) for i, a in enumerate(bucket) for b in bucket[i + 1:])
+    return pairs
+
+
+def _contact_rows(conn, ids) -> dict:
+    ids = sorted(ids)
+    rows = {}
+    for start in range(0, len(ids), 500):
+        rows.update((row[0], row) for row in conn.execute(
+            select(_contact.c.id, _contact.c.first_name, _contact.c.last_name, _contact.c.email,
+                   _contact.c.phone_number, _contact.c.account_id).where(_contact.c.id.in_(ids[start:start + 500]))))
+    return rows
+
+
+def find_duplicate_contacts(threshold: float = THRESHOLD, max_bucket: int = MAX_BUCKET,
+                            chunk_size: int = SCAN_CHUNK_SIZE) -> dict:
+    """Replace the pending suggestions with a fresh scan; returns counts for the CLI.
+
+    The scan only reads; the suggestions are swapped in one short write
+    transaction at the end.
+    """
+    suggestions = []
+    with db.engine.connect() as conn:
+        pairs = _candidate_pairs(conn, max_bucket, chunk_size)
+        pairs -= set(conn.execute(select(_suggestion.c.contact_id, _suggestion.c.duplicate_id)
+                                  .where(_suggestion.c.status == 'dismissed')).all())
+        ordered = sorted(pairs)
+        for start in range(0, len(ordered), chunk_size):
+            chunk = ordered[start:start + chunk_size]
+            rows = _contact_rows(conn, {i for pair in chunk for i in pair})
+            for a, b in chunk:
+                if a not in rows or b not in rows:
+                    continue
+                score, reasons = score_pair(rows[a], rows[b])
+                if score >= threshold:
+                    suggestions.append({'contact_id': a, 'duplicate_id': b, 'score': score,
+                                        'reasons': ','.join(reasons), 'status': 'pending'})
+    with db.engine.begin() as conn:
+        conn.execute(_suggestion.delete().where(_suggestion.c.status == 'pending'))
+        for start in range(0, len(suggestions), chunk_size):
+            conn.execute(_suggestion.insert(), suggestions[start:start + chunk_size])
+    return {'candidates': len(pairs), 'suggested': len(suggestions)}
+
+
+def merge_duplicates(suggestion_ids) -> int:
+    """Merge each suggestion's duplicate into its contact; returns how many were merged.
+
+    Blank fields on the kept contact are filled from the duplicate, which is
+    then deleted (through the ORM, so account rollups follow) along with any
+    other suggestion naming it. Suggestions whose contacts are already gone
+    are skipped. The caller commits.
+    """
+    merged = 0
+    for suggestion_id in sorted(suggestion_ids):
+        suggestion = db.session.get(ContactDuplicate, suggestion_id)
+        if suggestion is None or suggestion.status != 'pending':
+            continue
+        keep = db.session.get(Contact, suggestion.contact_id)
+        duplicate = db.session.get(Contact, suggestion.duplicate_id)
+        if keep is None or duplicate is None:
+            continue
+        for field in MERGED_FIELDS:
+            if not getattr(keep, field) and getattr(duplicate, field):
+                setattr(keep, field, getattr(duplicate, field))
+        # works whether or not the database enforces the ON DELETE CASCADE
+        db.session.execute(delete(ContactDuplicate).where(or_(
+            ContactDuplicate.contact_id == duplicate.id, ContactDuplicate.duplicate_id == duplicate.id)))
+        db.session.delete(duplicate)
+        db.session.flush()
+        merged += 1
+    return merged
+
+
+def dismiss_duplicates(suggestion_ids) -> int:
+    """Mark suggestions as not duplicates so later scans skip them. The caller commits."""
+    return db.session.execute(
+        _suggestion.update()
+        .where(_suggestion.c.id.in_(list(suggestion_ids)), _suggestion.c.status == 'pending')
+        .values(status='dismissed')).rowcount
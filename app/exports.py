@@ -0,0 +1,343 @@
+"""CSV export helpers.
+
+Exports are produced as generators so a response can start sending before the
+whole table has been read: rows come from ``Query.yield_per`` and CSV text is
+emitted in chunks of ``chunk_rows`` rows.
+
+The export queries are explicit column projections with the account and owner
+names joined in, so an export is a single SELECT returning lightweight row
+tuples however many rows it contains (no per-row relationship loads).
+
+``ExportCache`` keeps generated files under ``instance/exports/`` keyed on
+(entity, role scope, data version) so repeat downloads are a file read.
+
+Parquet and Arrow IPC exports are written as record batches with typed
+columns (int64 ids and values, timestamp close dates) when pyarrow is
+installed; without it ``columnar_available()`` is False and callers fall back
+to CSV.
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+from flask import current_app
+
+from . import db
+from .models import Account, Contact, Opportunity, User, data_versions
+
+EXPORT_CHUNK_ROWS = 500
+# Rows per Arrow record batch (and Parquet row group)
+EXPORT_BATCH_ROWS = 65536
+# Rows fetched per round-trip while streaming exports
+EXPORT_YIELD_PER = 1000
+
+OPPORTUNITY_HEADER = ['id', 'name', 'account', 'stage', 'value', 'close_date', 'owner']
+CONTACT_HEADER = ['id', 'first_name', 'last_name', 'email', 'phone', 'company']
+ACCOUNT_HEADER = ['id', 'name', 'industry', 'phone', 'website', 'owner']
+EXPORT_HEADERS = {
+    'opportunities': OPPORTUNITY_HEADER,
+    'contacts': CONTACT_HEADER,
+    'accounts': ACCOUNT_HEADER,
+}
+
+# Tables whose changes invalidate each export (owner names come from user)
+EXPORT_DEPENDENCIES = {
+    'opportunities': ('opportunity', 'account', 'user'),
+    'contacts': ('contact', 'account'),
+    'accounts': ('account', 'user'),
+}
+
+
+def _owner_name(first, last) -> str:
+    return f"{first} {last}" if first is not None else ''
+
+
+def opportunities_query(owner_id=None):
+    """Opportunity columns + account name + owner names in one SELECT, ordered by close date."""
+    query = db.session.query(
+        Opportunity.id,
+        Opportunity.name,
+        Account.name.label('account_name'),
+        Opportunity.stage,
+        Opportunity.value,
+        Opportunity.close_date,
+        User.first_name.label('owner_first_name'),
+        User.last_name.label('owner_last_name'),
+    ).join(Account, Opportunity.account_id == Account.id).outerjoin(User, Opportunity.owner_id == User.id)
+    if owner_id is not None:
+        query = query.filter(Opportunity.owner_id == owner_id)
+    return query.order_by(Opportunity.close_date.asc())
+
+
+def contacts_query():
+    return db.session.query(
+        Contact.id,
+        Contact.first_name,
+        Contact.last_name,
+        Contact.email,
+        Contact.phone_number,
+        Account.name.label('account_name'),
+    ).join(Account, Contact.account_id == Account.id).order_by(Contact.id.desc())
+
+
+def accounts_query():
+    return db.session.query(
+        Account.id,
+        Account.name,
+        Account.industry,
+        Account.phone,
+        Account.website,
+        User.first_name.label('owner_first_name'),
+        User.last_name.label('owner_last_name'),
+    ).outerjoin(User, Account.owner_id == User.id).order_by(Account.name.asc())
+
+
+def export_rows(entity: str, owner_id=None):
+    """Yield typed row tuples in ``EXPORT_HEADERS[entity]`` order (ints, datetimes and None kept as-is)."""
+    if entity == 'opportunities':
+        for r in opportunities_query(owner_id).yield_per(EXPORT_YIELD_PER):
+            yield (r.id, r.name, r.account_name, r.stage, r.value, r.close_date,
+                   _owner_name(r.owner_first_name, r.owner_last_name) or None)
+    elif entity == 'contacts':
+        for r in contacts_query().yield_per(EXPORT_YIELD_PER):
+            yield (r.id, r.first_name, r.last_name, r.email, r.phone_number, r.account_name)
+    elif entity == 'accounts':
+        for r in accounts_query().yield_per(EXPORT_YIELD_PER):
+            yield (r.id, r.name, r.industry, r.phone, r.website,
+                   _owner_name(r.owner_first_name, r.owner_last_name) or None)
+    else:
+        raise ValueError(f'unknown export {entity!r}')
+
+
+def csv_rows(entity: str, owner_id=None):
+    """Rows formatted for the CSV export (ISO dates, missing values as '' and value as 0)."""
+    for row in export_rows(entity, owner_id):
+        if entity == 'opportunities':
+            id_, name, account, stage, value, close_date, owner = row
+            yield [id_, name, account or '', stage, value or 0,
+                   close_date.isoformat() if close_date else '', owner or '']
+        else:
+            yield ['' if v is None else v for v in row]
+
+
+def iter_csv(header, rows, chunk_rows: int = EXPORT_CHUNK_ROWS, on_complete=None):
+    """Yield CSV text for ``header`` + ``rows`` in chunks of ``chunk_rows`` rows.
+
+    ``on_complete(count)`` is called with the number of data rows once the
+    last chunk has been produced.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    tail = buf.getvalue()
+    if tail:
+        yield tail
+    if on_complete is not None:
+        on_complete(count)
+
+
+# format -> (file extension, mimetype)
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_schema(entity: str):
+    import pyarrow as pa
+
+    if entity == 'opportunities':
+        return pa.schema([
+            ('id', pa.int64()), ('name', pa.string()), ('account', pa.string()), ('stage', pa.string()),
+            ('value', pa.int64()), ('close_date', pa.timestamp('us')), ('owner', pa.string()),
+        ])
+    types = {'id': pa.int64()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in EXPORT_HEADERS[entity]])
+
+
+def write_columnar(fileobj, fmt: str, entity: str, rows, batch_rows: int = EXPORT_BATCH_ROWS) -> int:
+    """Write typed ``rows`` as Parquet or Arrow IPC (file format) record batches; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(entity)
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(fileobj, schema)
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch], schema=schema))
+    else:
+        writer = pa.ipc.new_file(fileobj, schema)
+        write = writer.write_batch
+
+    count = 0
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                write(_record_batch(pa, schema, batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            write(_record_batch(pa, schema, batch))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+def _record_batch(pa, schema, rows):
+    columns = list(zip(*rows))
+    return pa.record_batch([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema)
+
+
+def write_csv(fileobj, header, rows) -> int:
+    """Write an export to a binary file object; returns the number of data rows."""
+    counts = []
+    for chunk in iter_csv(header, rows, on_complete=counts.append):
+        fileobj.write(chunk.encode('utf-8'))
+    return counts[0]
+
+
+def export_version(entity: str) -> str:
+    """Short digest of the database identity and the data versions ``entity`` depends on."""
+    tables = EXPORT_DEPENDENCIES[entity]
+    versions = data_versions(tables)
+    raw = '|'.join([str(db.engine.url)] + [f'{t}={versions.get(t, "0")}' for t in tables])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class ExportCache:
+    """Generated export files keyed on (entity, scope, version).
+
+    Artifacts are written to a temporary file and renamed into place, so a
+    reader never sees a partial file, and a lock file makes concurrent workers
+    wait for one generation instead of each running the export. Every hit
+    refreshes the file's mtime; when the directory grows past ``max_bytes``
+    the least recently used artifacts are removed.
+    """
+
+    LOCK_STALE_SECONDS = 300
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def artifact(self, entity: str, scope: str, version: str, ext: str, generate):
+        """Return ``(path, result)`` for an artifact.
+
+        On a miss ``generate(fileobj)`` writes the file and its return value is
+        passed back as ``result``; on a hit ``result`` is None.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prefix = f'{entity}-{scope}-'
+        path = self.directory / f'{prefix}{version}.{ext}'
+        if self._touch(path):
+            return path, None
+        with self._local_lock(prefix):
+            if self._touch(path):
+                return path, None
+            result = self._generate(path, generate)
+        self._evict(keep=path, stale_prefix=prefix, ext=ext)
+        return path, result
+
+    def _touch(self, path: Path) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _local_lock(self, key: str):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _generate(self, path: Path, generate):
+        lock = path.with_name(path.name + '.lock')
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                if path.exists():
+                    return None
+                try:
+                    if time.time() - lock.stat().st_mtime > self.LOCK_STALE_SECONDS:
+                        lock.unlink()
+                except FileNotFoundError:
+                    pass
+                time.sleep(0.05)
+
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp, 'wb') as f:
+                result = generate(f)
+            os.replace(tmp, path)
+            return result
+        finally:
+            for leftover in (tmp, lock):
+                try:
+                    leftover.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self, keep: Path, stale_prefix: str, ext: str):
+        artifacts = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(('.tmp', '.lock')):
+                continue
+            if entry.name.startswith(stale_prefix) and entry.name.endswith(f'.{ext}') and entry.name != keep.name:
+                # older data version of the same export: never served again
+                self._remove(entry.path)
+                continue
+            stat = entry.stat()
+            artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in artifacts)
+        for _, size, entry_path in sorted(artifacts):
+            if total <= self.max_bytes:
+                break
+            if entry_path == str(keep):
+                continue
+            self._remove(entry_path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_export_cache():
+    """Return the app's ExportCache, or None when EXPORT_CACHE_ENABLED is off."""
+    if not current_app.config.get('EXPORT_CACHE_ENABLED', True):
+        return None
+    cache = current_app.extensions.get('export_cache')
+    if cache is None:
+        directory = current_app.config.get('EXPORT_CACHE_DIR') or os.path.join(current_app.instance_path, 'exports')
+        cache = ExportCache(directory, current_app.config.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        current_app.extensions['export_cache'] = cache
+    return cache
@@ -0,0 +1,176 @@
+"""CSV import validation and normalization.
+
+Row normalizers are plain functions with no app or database access so that
+large files can be validated in worker processes. ``validate_rows`` yields
+``(row_index, record, error)`` tuples in input order; the import views consume
+that stream and only do the database writes themselves.
+"""
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+_PHONE_STRIP_RE = re.compile(r'[^\d+]')
+_NAME_SEPARATOR_RE = re.compile(r'[-_/]')
+_NAME_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def clean(value) -> str:
+    """Trim a raw cell value, treating None as an empty string."""
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def normalize_email(value) -> str:
+    return clean(value).lower()
+
+
+def normalize_phone(value) -> str:
+    """Keep digits and a single leading '+' (e.g. '+27 (11) 555-0100' -> '+27115550100')."""
+    value = clean(value)
+    if not value:
+        return ''
+    digits = _PHONE_STRIP_RE.sub('', value)
+    plus = digits.startswith('+')
+    digits = digits.replace('+', '')
+    return ('+' if plus else '') + digits
+
+
+def normalize_name_key(value) -> str:
+    """Casefold, drop punctuation and collapse whitespace ('RoshTech  Logistics, Inc.' -> 'roshtech logistics inc').
+
+    Hyphens, underscores and slashes separate words, so 'Rosh-Tech' matches 'Rosh Tech'.
+    """
+    value = _NAME_SEPARATOR_RE.sub(' ', clean(value).casefold())
+    return ' '.join(_NAME_PUNCTUATION_RE.sub('', value).split())
+
+
+def parse_date(value, fmt: str = '%Y-%m-%d'):
+    value = clean(value)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, fmt)
+    except ValueError:
+        raise ValueError(f'invalid date "{value}" (expected YYYY-MM-DD)')
+
+
+def parse_int(value):
+    value = clean(value)
+    if not value:
+        return None
+    try:
+        return int(value.replace(',', ''))
+    except ValueError:
+        raise ValueError(f'invalid number "{value}"')
+
+
+def normalize_account_row(row: dict) -> dict:
+    name = clean(row.get('name') or row.get('Name'))
+    if not normalize_name_key(name):
+        raise ValueError('missing name')
+    return {
+        'name': name,
+        'industry': clean(row.get('industry') or row.get('Industry')) or None,
+        'phone': normalize_phone(row.get('phone')) or None,
+        'website': clean(row.get('website')) or None,
+        'owner_email': normalize_email(row.get('owner_email') or row.get('owner')),
+    }
+
+
+def normalize_contact_row(row: dict) -> dict:
+    first = clean(row.get('first_name') or row.get('First'))
+    company = clean(row.get('company') or row.get('Company') or row.get('account'))
+    if not first or not company:
+        raise ValueError('missing first_name or company')
+    return {
+        'first_name': first,
+        'last_name': clean(row.get('last_name') or row.get('Last')),
+        'email': normalize_email(row.get('email') or row.get('Email')),
+        'phone_number': normalize_phone(row.get('phone')) or None,
+        'role_title': clean(row.get('role_title') or row.get('Role')),
+        'company': company,
+    }
+
+
+def normalize_opportunity_row(row: dict) -> dict:
+    name = clean(row.get('name') or row.get('Name'))
+    account_name = clean(row.get('account') or row.get('company'))
+    if not name or not account_name:
+        raise ValueError('missing name or account')
+    return {
+        'name': name,
+        'account': account_name,
+        'stage': clean(row.get('stage')) or 'Prospecting',
+        'value': parse_int(row.get('value')),
+        'close_date': parse_date(row.get('close_date')),
+        'owner_email': normalize_email(row.get('owner_email') or row.get('owner')),
+    }
+
+
+NORMALIZERS = {
+    'accounts': normalize_account_row,
+    'contacts': normalize_contact_row,
+    'opportunities': normalize_opportunity_row,
+}
+
+
+def _validate_chunk(kind: str, start: int, rows: list) -> list:
+    normalize = NORMALIZERS[kind]
+    out = []
+    for idx, row in enumerate(rows, start=start):
+        try:
+            out.append((idx, normalize(row), None))
+        except ValueError as e:
+            out.append((idx, None, f'Row {idx}: {e}'))
+    return out
+
+
+def _chunks(rows, size: int, start: int = 1):
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def validate_rows(kind: str, rows, workers: int = 0, chunk_size: int = 5000):
+    """Normalize ``rows`` (an iterable of dicts) and yield ``(row_index, record, error)``.
+
+    Exactly one of ``record`` / ``error`` is set. Row indexes start at 1 and
+    results always come back in input order. Inputs that fit in a single chunk
+    are validated inline; larger ones are split into chunks and fanned out to a
+    process pool of ``workers`` forkserver (or spawn) processes, with at most ``2 * workers`` chunks
+    in flight so memory stays bounded while the caller writes to the database.
+    """
+    chunks = _chunks(rows, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None or not workers or workers < 2:
+        yield from _validate_chunk(kind, *first)
+        if second is not None:
+            yield from _validate_chunk(kind, *second)
+            for start, chunk in chunks:
+                yield from _validate_chunk(kind, start, chunk)
+        return
+
+    # never fork: the caller is a threaded web worker holding DB connections and locks
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        pending = deque([
+            pool.submit(_validate_chunk, kind, *first),
+            pool.submit(_validate_chunk, kind, *second),
+        ])
+        for start, chunk in chunks:
+            pending.append(pool.submit(_validate_chunk, kind, start, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,120 @@
+"""Per-request SQL instrumentation.
+
+``before_cursor_execute`` / ``after_cursor_execute`` listeners on every engine
+count statements and their time for the current request (``g.sql_stats``).
+Template rendering is timed by a ``jinja2.Template`` subclass. Each response
+gets a ``Server-Timing`` header::
+
+    Server-Timing: db;dur=12.4;desc="7 queries", render;dur=3.1, total;dur=25.0
+
+Requests over ``SQL_LOG_QUERY_COUNT`` statements or ``SQL_LOG_DB_MS`` of
+database time are logged, and a statement run ``SQL_N_PLUS_ONE_THRESHOLD``
+times or more in one request (same SQL, any parameters) is logged as a
+suspected N+1. Streamed responses are measured up to the point the view
+returns, not while the body is being sent.
+"""
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+
+
+class RequestSQLStats:
+    """Statement count, database time and per-statement counts for one request."""
+
+    __slots__ = ('started', 'count', 'db_seconds', 'render_seconds', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int):
+        """``[(statement, times)]`` for statements run at least ``threshold`` times."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.count} queries", '
+                f'render;dur={self.render_seconds * 1000:.1f}, total;dur={total:.1f}')
+
+
+def request_sql_stats():
+    """The current request's RequestSQLStats, or None outside a request or when disabled."""
+    return g.get('sql_stats') if has_request_context() else None
+
+
+class TimedTemplate(Template):
+    def render(self, *args, **kwargs):
+        stats = request_sql_stats()
+        if stats is None:
+            return super().render(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.render_seconds += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start'].pop()
+    stats = request_sql_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't run for failed statements
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def _start_request():
+    g.sql_stats = RequestSQLStats()
+
+
+def _finish_request(response):
+    stats = request_sql_stats()
+    if stats is None:
+        return response
+    config = current_app.config
+    if config.get('SERVER_TIMING_HEADER', True):
+        response.headers['Server-Timing'] = stats.server_timing()
+
+    db_ms = stats.db_seconds * 1000
+    if stats.count >= config.get('SQL_LOG_QUERY_COUNT', 30) or db_ms >= config.get('SQL_LOG_DB_MS', 250):
+        current_app.logger.warning('Expensive request %s %s (%s): %d queries, %.1fms in the database',
+                                   request.method, request.path, request.endpoint, stats.count, db_ms)
+    for sql, times in stats.repeated(config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)):
+        current_app.logger.warning('Suspected N+1 in %s %s (%s): statement ran %d times: %s',
+                                   request.method, request.path, request.endpoint, times,
+                                   ' '.join(sql.split())[:300])
+    return response
+
+
+def init_app(app, db):
+    """Instrument every engine of ``db`` (call after ``db.init_app``)."""
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,376 @@
+"""Prometheus metrics, aggregated across worker processes.
+
+Each process writes its samples to its own memory-mapped file in
+``METRICS_DIR`` (default ``<instance>/metrics``): ``metrics-<pid>.db`` holds
+an append-only list of ``key -> float`` entries, so recording a sample is a
+dict lookup plus an 8-byte write, with no locking between processes.
+``GET /metrics`` reads every file and sums them into the text exposition
+format:
+
+* ``crm_http_requests_total{blueprint,endpoint,method,status}``
+* ``crm_http_request_duration_seconds{blueprint,endpoint}`` (histogram)
+* ``crm_http_request_db_seconds{blueprint,endpoint}`` (histogram, needs
+  ``SQL_INSTRUMENTATION_ENABLED``)
+* ``crm_http_requests_in_flight`` (gauge, live processes only)
+* ``crm_import_rows_total{entity,outcome}`` / ``crm_export_rows_total{entity,format}``
+* ``crm_audit_events_total{outcome}``
+
+Durations are measured up to the point the view returns, like the
+Server-Timing header. Files left by exited workers are folded into
+``metrics-archive.db`` on the next scrape, so counters never go backwards
+and the directory holds one file per live worker. Set ``METRICS_TOKEN`` to
+require ``Authorization: Bearer <token>`` on ``/metrics``.
+"""
+import bisect
+import fcntl
+import hmac
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from flask import Response, abort, current_app, g, has_app_context, request
+
+from .instrumentation import request_sql_stats
+from .ratelimit import limiter
+
+_HEADER = struct.Struct('i4x')  # bytes used, padded to keep values 8-byte aligned
+_LENGTH = struct.Struct('i')
+_VALUE = struct.Struct('d')
+_FILE_RE = re.compile(r'^metrics-(\d+)\.db$')
+ARCHIVE_FILE = 'metrics-archive.db'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _read_entries(buf, used):
+    """Yield ``(key, value, value_offset)`` for the entries in ``buf[:used]``."""
+    pos = _HEADER.size
+    while pos < used:
+        length = _LENGTH.unpack_from(buf, pos)[0]
+        key = bytes(buf[pos + 4:pos + 4 + length]).decode('utf-8')
+        pos += 4 + length + (-(4 + length) % 8)
+        yield key, _VALUE.unpack_from(buf, pos)[0], pos
+        pos += 8
+
+
+def read_values(path: str) -> dict:
+    """All ``key -> value`` entries of a metrics file."""
+    with open(path, 'rb') as f:
+        buf = f.read()
+    if len(buf) < _HEADER.size:
+        return {}
+    return {key: value for key, value, _ in _read_entries(buf, _HEADER.unpack_from(buf, 0)[0])}
+
+
+class MmapedValues:
+    """``key -> float`` map backed by a memory-mapped file written by one process.
+
+    New keys are appended and the used-size header is updated last, so a
+    reader in another process never sees a partial entry.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size:
+            size = self.INITIAL_SIZE
+            self._file.truncate(size)
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        self._positions = {key: pos for key, _, pos in _read_entries(self._map, self._used)}
+
+    def _position(self, key: str) -> int:
+        pos = self._positions.get(key)
+        if pos is None:
+            encoded = key.encode('utf-8')
+            padded = len(encoded) + (-(4 + len(encoded)) % 8)
+            entry = _LENGTH.pack(len(encoded)) + encoded.ljust(padded, b'\0') + _VALUE.pack(0.0)
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+                self._file.truncate(self._capacity)
+                self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), self._capacity)
+            self._map[self._used:self._used + len(entry)] = entry
+            pos = self._used + len(entry) - 8
+            self._used += len(entry)
+            _HEADER.pack_into(self._map, 0, self._used)
+            self._positions[key] = pos
+        return pos
+
+    def inc(self, key: str, amount: float = 1.0):
+        with self._lock:
+            pos = self._position(key)
+            _VALUE.pack_into(self._map, pos, _VALUE.unpack_from(self._map, pos)[0] + amount)
+
+    def set(self, key: str, value: float):
+        with self._lock:
+            _VALUE.pack_into(self._map, self._position(key), value)
+
+    def get(self, key: str) -> float:
+        with self._lock:
+            pos = self._positions.get(key)
+            return 0.0 if pos is None else _VALUE.unpack_from(self._map, pos)[0]
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+            self._file.close()
+
+
+def _sample_key(name: str, suffix: str, labels: dict) -> str:
+    return json.dumps([name, suffix, labels], sort_keys=True, separators=(',', ':'))
+
+
+class Metric:
+    """A metric definition; samples go to the current app's ``MetricsStore``."""
+
+    def __init__(self, name: str, kind: str, documentation: str, labelnames=(), buckets=None):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),) if buckets else None
+        self._keys = {}
+
+    def _key(self, suffix: str, labels: dict) -> str:
+        cache_key = (suffix,) + tuple(sorted(labels.items()))
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = _sample_key(self.name, suffix, {k: str(v) for k, v in labels.items()})
+            self._keys[cache_key] = key
+        return key
+
+    def inc(self, amount: float = 1.0, **labels):
+        store = _store()
+        if store is not None:
+            store.values().inc(self._key('', labels), amount)
+
+    def set(self, value: float, **labels):
+        store = _store()
+        if store is not None:
+            store.values().set(self._key('', labels), value)
+
+    def observe(self, value: float, **labels):
+        store = _store()
+        if store is None:
+            return
+        values = store.values()
+        le = self.buckets[bisect.bisect_left(self.buckets, value)]
+        values.inc(self._key('_bucket', dict(labels, le=_format_value(le))))
+        values.inc(self._key('_sum', labels), value)
+        values.inc(self._key('_count', labels))
+
+
+REQUESTS = Metric('crm_http_requests_total', 'counter', 'HTTP requests handled.',
+                  ('blueprint', 'endpoint', 'method', 'status'))
+REQUEST_DURATION = Metric('crm_http_request_duration_seconds', 'histogram',
+                          'Time spent handling a request, up to the view returning.',
+                          ('blueprint', 'endpoint'), LATENCY_BUCKETS)
+REQUEST_DB_TIME = Metric('crm_http_request_db_seconds', 'histogram',
+                         'Time spent in SQL statements per request.', ('blueprint', 'endpoint'), DB_BUCKETS)
+IN_FLIGHT = Metric('crm_http_requests_in_flight', 'gauge', 'Requests currently being handled.')
+IMPORT_ROWS = Metric('crm_import_rows_total', 'counter', 'Rows processed by CSV and bulk API imports.',
+                     ('entity', 'outcome'))
+EXPORT_ROWS = Metric('crm_export_rows_total', 'counter',
+                     'Rows written to export files (cache hits are not re-counted).', ('entity', 'format'))
+AUDIT_EVENTS = Metric('crm_audit_events_total', 'counter', 'Audit events written to the audit log.',
+                      ('outcome',))
+
+METRICS = (REQUESTS, REQUEST_DURATION, REQUEST_DB_TIME, IN_FLIGHT, IMPORT_ROWS, EXPORT_ROWS, AUDIT_EVENTS)
+
+
+class MetricsStore:
+    """The metrics directory of one app, and this process's file in it."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._values = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def values(self) -> MmapedValues:
+        pid = os.getpid()
+        if self._pid != pid:
+            # first use, or a forked worker that must not share its parent's file
+            with self._lock:
+                if self._pid != pid:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._values = MmapedValues(os.path.join(self.directory, f'metrics-{pid}.db'))
+                    self._pid = pid
+        return self._values
+
+    def collect(self) -> dict:
+        """``{key: value}`` summed over every process (gauges: live processes only)."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._archive_dead_files()
+                totals = {}
+                for filename in os.listdir(self.directory):
+                    if filename != ARCHIVE_FILE and not _FILE_RE.match(filename):
+                        continue
+                    for key, value in read_values(os.path.join(self.directory, filename)).items():
+                        totals[key] = totals.get(key, 0.0) + value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return totals
+
+    def _archive_dead_files(self):
+        dead = [f for f in os.listdir(self.directory)
+                if (m := _FILE_RE.match(f)) and not _pid_alive(int(m.group(1)))]
+        if not dead:
+            return
+        gauges = {m.name for m in METRICS if m.kind == 'gauge'}
+        archive = MmapedValues(os.path.join(self.directory, ARCHIVE_FILE))
+        try:
+            for filename in dead:
+                path = os.path.join(self.directory, filename)
+                for key, value in read_values(path).items():
+                    if json.loads(key)[0] not in gauges:
+                        archive.inc(key, value)
+                os.unlink(path)
+        finally:
+            archive.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_value(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def exposition(totals: dict) -> str:
+    """Render collected samples in the Prometheus text format (version 0.0.4)."""
+    samples = {}
+    for key, value in totals.items():
+        name, suffix, labels = json.loads(key)
+        samples.setdefault(name, []).append((suffix, labels, value))
+
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        found = samples.get(metric.name, [])
+        if metric.kind != 'histogram':
+            if not found and not metric.labelnames:
+                found = [('', {}, 0.0)]
+            for _, labels, value in sorted(found, key=lambda s: sorted(s[1].items())):
+                lines.append(f'{metric.name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+        series = {}
+        for suffix, labels, value in found:
+            le = labels.pop('le', None)
+            entry = series.setdefault(tuple(sorted(labels.items())), {'buckets': {}, '_sum': 0.0, '_count': 0.0})
+            if suffix == '_bucket':
+                entry['buckets'][le] = entry['buckets'].get(le, 0.0) + value
+            else:
+                entry[suffix] += value
+        for label_items, entry in sorted(series.items()):
+            labels = dict(label_items)
+            cumulative = 0.0
+            for bound in metric.buckets:
+                le = _format_value(bound)
+                cumulative += entry['buckets'].get(le, 0.0)
+                lines.append(f'{metric.name}_bucket{_format_labels(dict(labels, le=le))} {_format_value(cumulative)}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(entry["_sum"])}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {_format_value(entry["_count"])}')
+    return '\n'.join(lines) + '\n'
+
+
+def _store():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('metrics')
+
+
+def count_import_rows(entity: str, created: int, rejected: int):
+    if created:
+        IMPORT_ROWS.inc(created, entity=entity, outcome='created')
+    if rejected:
+        IMPORT_ROWS.inc(rejected, entity=entity, outcome='rejected')
+
+
+def count_export_rows(entity: str, fmt: str, rows):
+    if rows:
+        EXPORT_ROWS.inc(rows, entity=entity, format=fmt)
+
+
+def _request_labels() -> dict:
+    return {'blueprint': request.blueprint or 'none', 'endpoint': request.endpoint or 'none'}
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _finish_request(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    labels = _request_labels()
+    REQUESTS.inc(method=request.method, status=response.status_code, **labels)
+    REQUEST_DURATION.observe(time.perf_counter() - started, **labels)
+    stats = request_sql_stats()
+    if stats is not None:
+        REQUEST_DB_TIME.observe(stats.db_seconds, **labels)
+    return response
+
+
+def _end_request(exc):
+    if g.pop('metrics_started', None) is not None:
+        IN_FLIGHT.inc(-1)
+
+
+@limiter.exempt
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            abort(401)
+    body = exposition(current_app.extensions['metrics'].collect())
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_app(app):
+    """Record request metrics and serve ``/metrics`` (call before other ``before_request`` hooks)."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    directory = app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+    app.extensions['metrics'] = MetricsStore(directory)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
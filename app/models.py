@@ -1,19 +1,15 @@
-from . import db, login_manager
+from . import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# This is the callback function that Flask-Login will use to load a user
-# from the session. It must be defined to use Flask-Login.
-@login_manager.user_loader
-def load_user(user_id):
-    # Use session.get to avoid SQLAlchemy Query.get() deprecation warnings
-    try:
-        return db.session.get(User, int(user_id))
-    except Exception:
-        # fallback
-        return User.query.get(int(user_id))
+from .passwords import get_password_hasher
+from .importer import normalize_name_key
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from flask import current_app
+import hashlib
+import hmac
+import uuid
 
 class User(UserMixin, db.Model):
     """
@@ -34,15 +30,34 @@ class User(UserMixin, db.Model):
     tokens = db.relationship('Token', back_populates='user', lazy='dynamic', cascade="all, delete-orphan")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify ``password``; on success, re-hash it if the stored parameters are outdated.
+
+        A re-hash only changes ``password_hash`` on this object, so the caller
+        commits it (see ``main.login``).
+        """
+        hasher = get_password_hasher()
+        if not hasher.verify(self.password_hash, password):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+        return True
 
     def __repr__(self):
         return f'<User {self.email}>'
 
 
+# Token hashes written by set_token(); anything else is a legacy PBKDF2 hash
+TOKEN_HASH_PREFIX = 'hmac-sha256$'
+
+
+def _token_hmac(plain_token: str) -> str:
+    key = current_app.config.get('TOKEN_HMAC_KEY') or current_app.config['SECRET_KEY']
+    return hmac.new(key.encode('utf-8'), plain_token.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
 class Token(db.Model):
     """API token for programmatic access.
     Tokens are simple bearer tokens tied to a User and can be revoked.
@@ -56,24 +71,43 @@ class Token(db.Model):
     expires_at = db.Column(db.DateTime, nullable=True)
     scopes = db.Column(db.String(255), nullable=True)
     revoked = db.Column(db.Boolean, default=False)
+    # Maintained in batches by app.tokens.TokenUsageTracker (may lag by a few seconds)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    use_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     user = db.relationship('User', back_populates='tokens')
 
     def set_token(self, plain_token: str):
-        self.token_hash = generate_password_hash(plain_token)
+        # Tokens are high-entropy random strings, so a keyed HMAC-SHA256 is as
+        # strong as a slow password hash here and costs microseconds per check.
+        self.token_hash = TOKEN_HASH_PREFIX + _token_hmac(plain_token)
         # store short prefix for indexed lookup (helps avoid scanning all tokens)
         self.token_prefix = plain_token[:8]
 
-    def check_token(self, plain_token: str) -> bool:
+    @property
+    def is_active(self) -> bool:
+        """False once the token has been revoked or has expired."""
         if self.revoked:
             return False
-        if self.expires_at and datetime.utcnow() > self.expires_at:
+        return not (self.expires_at and datetime.utcnow() > self.expires_at)
+
+    def check_token(self, plain_token: str) -> bool:
+        if not self.is_active:
             return False
+        if self.token_hash.startswith(TOKEN_HASH_PREFIX):
+            return hmac.compare_digest(self.token_hash[len(TOKEN_HASH_PREFIX):], _token_hmac(plain_token))
         return check_password_hash(self.token_hash, plain_token)
 
+    @property
+    def needs_rehash(self) -> bool:
+        """True for tokens still stored as PBKDF2 hashes (migrated on first use)."""
+        return not self.token_hash.startswith(TOKEN_HASH_PREFIX)
+
     def revoke(self):
+        from .auth import invalidate_token
         self.revoked = True
         db.session.commit()
+        invalidate_token(self.id)
 
     def __repr__(self):
         return f'<Token {self.token_prefix}... for user_id={self.user_id}>'
@@ -85,6 +119,9 @@ class Account(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), unique=True, nullable=False, index=True)
+    # normalize_name_key(name), kept in step by _set_name_key; the unique index
+    # makes "RoshTech Logistics" and "roshtech logistics " the same account
+    name_key = db.Column(db.String(160), unique=True, nullable=False, index=True)
     industry = db.Column(db.String(100))
     phone = db.Column(db.String(20))
     website = db.Column(db.String(120))
@@ -92,11 +129,36 @@ class Account(db.Model):
     
     # Foreign key for the User who "owns" or manages this account
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    # Rollups of the account's contacts and open deals, maintained on every
+    # flush (app/rollups.py) so account lists can sort/filter on an index
+    contact_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    open_opportunity_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    open_pipeline_value = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    last_activity_at = db.Column(db.DateTime, index=True)
+    # Set when a background purge was scheduled (app/purge.py); the row is
+    # deleted once the purge finishes, and ``flask purge-accounts`` resumes
+    # purges cut short by a restart
+    purge_requested_at = db.Column(db.DateTime, index=True)
     
     # Relationships
     owner = db.relationship('User', back_populates='accounts')
-    contacts = db.relationship('Contact', back_populates='account', lazy='dynamic', cascade="all, delete-orphan")
-    opportunities = db.relationship('Opportunity', back_populates='account', lazy='dynamic', cascade="all, delete-orphan")
+    # Children are removed by the database (ON DELETE CASCADE), so deleting an
+    # account doesn't load them; large accounts are purged in chunks (app/purge.py)
+    contacts = db.relationship('Contact', back_populates='account', lazy='dynamic', cascade="all, delete-orphan",
+                               passive_deletes=True)
+    opportunities = db.relationship('Opportunity', back_populates='account', lazy='dynamic',
+                                    cascade="all, delete-orphan", passive_deletes=True)
+
+    @db.validates('name')
+    def _set_name_key(self, key, name):
+        self.name_key = normalize_name_key(name)
+        return name
+
+    @staticmethod
+    def by_name(name):
+        """The account whose name matches ``name`` ignoring case, spacing and punctuation, or None."""
+        return Account.query.filter_by(name_key=normalize_name_key(name)).first()
 
     def __repr__(self):
         return f'<Account {self.name}>'
@@ -113,7 +175,7 @@ class Contact(db.Model):
     role_title = db.Column(db.String(100)) # (e.g., "Head of Security", "Logistics Manager")
     
     # Foreign key to link this contact to a company
-    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     account = db.relationship('Account', back_populates='contacts')
@@ -132,9 +194,12 @@ class Opportunity(db.Model):
     value = db.Column(db.Integer) # Estimated value of the deal
     close_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Manual order within the stage on the pipeline board (NULL = after the
+    # positioned cards, by close date); see PATCH /api/pipeline/moves
+    position = db.Column(db.Integer)
     
     # Foreign key to link this deal to a company
-    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id', ondelete='CASCADE'), nullable=False, index=True)
     # Foreign key for the User who is managing this deal
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     
@@ -142,5 +207,113 @@ class Opportunity(db.Model):
     account = db.relationship('Account', back_populates='opportunities')
     owner = db.relationship('User', back_populates='opportunities')
 
+    __table_args__ = (
+        db.Index('ix_opportunity_stage_position', 'stage', 'position'),
+        # keyset pages of an account's deals by close date (GET /api/accounts/<id>/opportunities)
+        db.Index('ix_opportunity_account_close_date', 'account_id', 'close_date'),
+        # ids move to opportunity_archive with their rows and must never be reused
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<Opportunity {self.name}>'
+
+
+class OpportunityArchive(db.Model):
+    """Closed opportunities moved out of the hot ``opportunity`` table.
+
+    Same columns (and ids) as Opportunity plus ``archived_at``; rows are moved
+    by ``flask archive-opportunities`` (see app/archive.py) and read back with
+    ``include_archived`` on the list/report APIs.
+    """
+    __tablename__ = 'opportunity_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    stage = db.Column(db.String(50))
+    value = db.Column(db.Integer)
+    close_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    position = db.Column(db.Integer)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id', ondelete='CASCADE'), nullable=False, index=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OpportunityArchive {self.name}>'
+
+
+class ContactDuplicate(db.Model):
+    """A suggested pair of duplicate contacts, written by ``flask find-duplicate-contacts``.
+
+    ``contact_id`` is the contact to keep (the older one) and ``duplicate_id``
+    the one merged into it; admins review them at /admin/duplicates (see
+    app/duplicates.py). Dismissed pairs are kept so later runs skip them.
+    """
+    __tablename__ = 'contact_duplicate'
+    id = db.Column(db.Integer, primary_key=True)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id', ondelete='CASCADE'), nullable=False)
+    duplicate_id = db.Column(db.Integer, db.ForeignKey('contact.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    reasons = db.Column(db.String(100))  # comma-separated: email, phone, name, account
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | dismissed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('contact_id', 'duplicate_id', name='uq_contact_duplicate_pair'),
+        db.Index('ix_contact_duplicate_status_score', 'status', 'score'),
+    )
+
+    def __repr__(self):
+        return f'<ContactDuplicate {self.contact_id}/{self.duplicate_id}>'
+
+
+
+class DataVersion(db.Model):
+    """Per-table change marker used to key cached artifacts such as exports.
+
+    ``version`` is replaced with a random token whenever rows of one of the
+    ``VERSIONED_TABLES`` are inserted, updated or deleted through the ORM (see
+    the ``after_flush`` hook below). Code that writes with Core statements must call
+    ``bump_data_versions`` itself.
+    """
+    __tablename__ = 'data_version'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DataVersion {self.table_name}={self.version}>'
+
+
+def bump_data_versions(connection, table_names):
+    """Give each table in ``table_names`` a fresh version token (inside the caller's transaction)."""
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    for name in sorted(set(table_names)):
+        values = {'version': uuid.uuid4().hex, 'updated_at': now}
+        result = connection.execute(table.update().where(table.c.table_name == name).values(**values))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(table_name=name, **values))
+
+
+def data_versions(table_names) -> dict:
+    """Return ``{table_name: version}`` for the given tables (missing tables are omitted)."""
+    rows = db.session.query(DataVersion.table_name, DataVersion.version).filter(
+        DataVersion.table_name.in_(list(table_names)))
+    return dict(rows.all())
+
+
+# Tables the ORM hook versions: everything in exports.EXPORT_DEPENDENCIES.
+# Other writes (tokens, suggestions, archive rows) don't touch data_version.
+VERSIONED_TABLES = frozenset({'account', 'contact', 'opportunity', 'user'})
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_data_versions_after_flush(session, flush_context):
+    changed = {obj.__table__.name for obj in session.new}
+    changed.update(obj.__table__.name for obj in session.deleted)
+    changed.update(obj.__table__.name for obj in session.dirty
+                   if session.is_modified(obj, include_collections=False))
+    changed &= VERSIONED_TABLES
+    if changed:
+        bump_data_versions(session.connection(), changed)
@@ -0,0 +1,147 @@
+"""Password hashing policy.
+
+Hashes use Werkzeug's PBKDF2 format (``pbkdf2:<digest>:<iterations>$<salt>$<hex>``)
+so existing rows keep verifying, but the digest and iteration count come from
+config (``PASSWORD_HASH_METHOD`` / ``PASSWORD_HASH_ITERATIONS``) instead of
+library defaults. ``needs_rehash`` reports stored hashes whose parameters differ
+from the policy; ``User.check_password`` replaces them on the next successful
+login.
+
+Hashing and verification run on a small bounded thread pool
+(``PASSWORD_HASH_WORKERS``): ``hashlib.pbkdf2_hmac`` releases the GIL, so this
+caps how many cores a login rush can burn at once while other requests keep
+running. When more than ``PASSWORD_HASH_QUEUE`` calls are already waiting,
+``HashingBusy`` is raised instead of queueing without bound.
+
+This module only needs the standard library (Flask is imported lazily by
+``get_password_hasher``) so ``scripts/create_admin_sqlite.py`` can load it
+directly and write hashes with the same policy as the app.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256'
+DEFAULT_HASH_ITERATIONS = 260000
+SALT_LENGTH = 16
+_SALT_CHARS = string.ascii_letters + string.digits
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool already has its maximum number of waiting calls."""
+
+
+def _parse_method(method: str):
+    """Return the PBKDF2 digest name for a policy method like 'pbkdf2:sha256'."""
+    scheme, _, digest = method.partition(':')
+    if scheme != 'pbkdf2' or not digest or ':' in digest:
+        raise ValueError(f'unsupported password hash method {method!r} (expected pbkdf2:<digest>)')
+    hashlib.new(digest)  # raises ValueError for unknown digests
+    return digest
+
+
+def hash_password(password: str, method: str = DEFAULT_HASH_METHOD,
+                  iterations: int = DEFAULT_HASH_ITERATIONS) -> str:
+    digest = _parse_method(method)
+    salt = ''.join(secrets.choice(_SALT_CHARS) for _ in range(SALT_LENGTH))
+    dk = hashlib.pbkdf2_hmac(digest, password.encode('utf-8'), salt.encode('utf-8'), iterations)
+    return f'pbkdf2:{digest}:{iterations}${salt}${dk.hex()}'
+
+
+def hash_parameters(stored: str):
+    """Return ``(method, iterations)`` for a stored PBKDF2 hash, or None for other formats."""
+    if not stored or stored.count('$') < 2:
+        return None
+    method = stored.split('$', 1)[0]
+    parts = method.split(':')
+    if parts[0] != 'pbkdf2' or len(parts) != 3 or not parts[2].isdigit():
+        return None
+    return f'pbkdf2:{parts[1]}', int(parts[2])
+
+
+def verify_password(stored: str, password: str) -> bool:
+    params = hash_parameters(stored)
+    if params is None:
+        if not stored:
+            return False
+        # other Werkzeug formats (e.g. old salted sha256 hashes)
+        from werkzeug.security import check_password_hash
+        return check_password_hash(stored, password)
+    method, iterations = params
+    _, salt, expected = stored.split('$', 2)
+    try:
+        dk = hashlib.pbkdf2_hmac(method[7:], password.encode('utf-8'), salt.encode('utf-8'), iterations)
+    except ValueError:
+        return False
+    return hmac.compare_digest(dk.hex(), expected)
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with one policy on a bounded worker pool.
+
+    ``workers=0`` runs everything in the calling thread.
+    """
+
+    def __init__(self, method: str = DEFAULT_HASH_METHOD, iterations: int = DEFAULT_HASH_ITERATIONS,
+                 workers: int = 0, max_queued: int = 64):
+        _parse_method(method)
+        self.method = method
+        self.iterations = iterations
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(workers + max_queued) if workers else None
+
+    @classmethod
+    def from_env(cls, environ=None, **kwargs):
+        """Policy from PASSWORD_HASH_METHOD / PASSWORD_HASH_ITERATIONS (same variables as Config)."""
+        environ = os.environ if environ is None else environ
+        return cls(environ.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+                   int(environ.get('PASSWORD_HASH_ITERATIONS', DEFAULT_HASH_ITERATIONS)), **kwargs)
+
+    def _run(self, fn, *args):
+        if self._pool is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('too many password hashing requests in progress')
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.method, self.iterations)
+
+    def verify(self, stored: str, password: str) -> bool:
+        return self._run(verify_password, stored, password)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return hash_parameters(stored) != (self.method, self.iterations)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the app's PasswordHasher, rebuilt if the hashing config has changed."""
+    from flask import current_app
+
+    config = current_app.config
+    settings = (
+        config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+        int(config.get('PASSWORD_HASH_ITERATIONS', DEFAULT_HASH_ITERATIONS)),
+        int(config.get('PASSWORD_HASH_WORKERS', 0)),
+        int(config.get('PASSWORD_HASH_QUEUE', 64)),
+    )
+    cached = current_app.extensions.get('password_hasher')
+    if cached is None or cached[0] != settings:
+        if cached is not None:
+            cached[1].shutdown()
+        method, iterations, workers, max_queued = settings
+        cached = (settings, PasswordHasher(method, iterations, workers=workers, max_queued=max_queued))
+        current_app.extensions['password_hasher'] = cached
+    return cached[1]
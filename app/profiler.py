@@ -0,0 +1,158 @@
+"""On-demand request profiling for admins.
+
+An admin (or owner) adds an ``X-Profile: 1`` header or ``?_profile=1`` to a
+request and it runs under ``cProfile``. The stats are saved to
+``instance/profiles/<id>.prof`` (``PROFILE_DIR`` overrides the folder) with a
+``<id>.json`` summary next to them, the response carries an
+``X-Profile-Id`` header, and the report is viewable at
+``/admin/profiles/<id>``. Only the newest ``PROFILE_KEEP`` profiles are kept.
+
+Requests without the header or parameter only pay for a dict lookup; the
+user is not even loaded. Like the Server-Timing header, the profile covers
+the request up to the view returning, not the streaming of its body.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import time
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+from .instrumentation import request_sql_stats
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{12}-[A-Za-z0-9_.]+-[0-9a-f]{6}$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'pcalls')
+
+
+def profile_dir(app=None) -> str:
+    app = app or current_app
+    return app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def _requested() -> bool:
+    return 'X-Profile' in request.headers or request.args.get('_profile') == '1'
+
+
+def _start_profile():
+    if not _requested():
+        return
+    if not current_user.is_authenticated or current_user.role not in ('admin', 'owner'):
+        return
+    profiler = cProfile.Profile()
+    g.profile = (profiler, time.perf_counter())
+    profiler.enable()
+
+
+def _stop(save_response=None):
+    found = g.pop('profile', None)
+    if found is None:
+        return None
+    profiler, started = found
+    profiler.disable()
+    if save_response is None:
+        return None
+    return _save(profiler, time.perf_counter() - started, save_response)
+
+
+def _save(profiler, seconds: float, response) -> str:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.utcnow()
+    profile_id = f"{now:%Y%m%dT%H%M%S%f}-{request.endpoint or 'none'}-{secrets.token_hex(3)}"
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    stats = request_sql_stats()
+    summary = {
+        'id': profile_id,
+        'created': now.isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(seconds * 1000, 2),
+        'user_id': current_user.id,
+        'queries': stats.count if stats is not None else None,
+        'db_ms': round(stats.db_seconds * 1000, 2) if stats is not None else None,
+    }
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    _prune(directory, current_app.config.get('PROFILE_KEEP', 50))
+    return profile_id
+
+
+def _prune(directory: str, keep: int):
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:-keep] if keep > 0 else []:
+        for ext in ('.json', '.prof'):
+            try:
+                os.unlink(os.path.join(directory, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _finish_profile(response):
+    profile_id = _stop(response)
+    if profile_id is not None:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def _abandon_profile(exc):
+    _stop()
+
+
+def list_profiles(directory: str) -> list:
+    """Summaries of the saved profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return summaries
+
+
+def profile_files(directory: str, profile_id: str):
+    """``(summary_path, stats_path)`` for a saved profile, or None if there is no such profile."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    summary = os.path.join(directory, f'{profile_id}.json')
+    stats = os.path.join(directory, f'{profile_id}.prof')
+    if not (os.path.exists(summary) and os.path.exists(stats)):
+        return None
+    return summary, stats
+
+
+def render_report(directory: str, profile_id: str, sort: str = 'cumulative', limit: int = 50):
+    """A text report for a saved profile (pstats output under a summary line), or None."""
+    files = profile_files(directory, profile_id)
+    if files is None:
+        return None
+    with open(files[0], encoding='utf-8') as f:
+        summary = json.load(f)
+    out = io.StringIO()
+    out.write(f"{summary['method']} {summary['path']} ({summary['endpoint']}) -> {summary['status']} "
+              f"in {summary['duration_ms']}ms")
+    if summary.get('queries') is not None:
+        out.write(f", {summary['queries']} queries, {summary['db_ms']}ms in the database")
+    out.write(f"\nprofiled {summary['created']} for user {summary['user_id']}\n\n")
+    stats = pstats.Stats(files[1], stream=out)
+    stats.strip_dirs().sort_stats(sort if sort in SORT_KEYS else 'cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def init_app(app):
+    if not app.config.get('PROFILE_ENABLED', True):
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
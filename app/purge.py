@@ -0,0 +1,167 @@
+"""Account deletion.
+
+Contacts and opportunities (hot and archived) reference their account with
+``ON DELETE CASCADE``, so deleting an account is a single ``DELETE`` when the
+database enforces foreign keys (SQLite only does with
+``PRAGMA foreign_keys=ON``, which the production profile sets; otherwise the
+children, and duplicate suggestions naming its contacts, are removed with one
+``DELETE`` per table first).
+
+Accounts with more than ``ACCOUNT_PURGE_THRESHOLD`` contacts or
+opportunities are purged in the background instead: children go
+``ACCOUNT_PURGE_CHUNK_SIZE`` rows per transaction, so other writers get the
+write lock between chunks, and the account row goes last. The queue lives in
+the process that accepted the request, so the account is first marked with
+``purge_requested_at``; every process then treats it as being deleted, and if
+the process exits mid-purge the account is left with part of its children
+until ``flask purge-accounts`` finishes the job.
+"""
+import queue
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import db
+from .models import Account, Contact, ContactDuplicate, Opportunity, OpportunityArchive, bump_data_versions
+
+_account = Account.__table__
+_contact = Contact.__table__
+_children = (Contact.__table__, Opportunity.__table__, OpportunityArchive.__table__)
+_suggestion = ContactDuplicate.__table__
+_TABLES = ['account', 'contact', 'opportunity', 'opportunity_archive']
+
+
+def foreign_keys_enforced(conn) -> bool:
+    if conn.dialect.name != 'sqlite':
+        return True
+    return bool(conn.exec_driver_sql('PRAGMA foreign_keys').scalar())
+
+
+def is_large(conn, account_id: int, threshold: int) -> bool:
+    """Whether any child table has more than ``threshold`` rows for the account."""
+    for table in _children:
+        beyond = select(table.c.id).where(table.c.account_id == account_id).offset(threshold).limit(1)
+        if conn.execute(beyond).first() is not None:
+            return True
+    return False
+
+
+def _delete_suggestions(conn, contact_ids):
+    """Remove duplicate suggestions naming ``contact_ids`` (a list or a subquery of contact ids)."""
+    conn.execute(_suggestion.delete().where(
+        _suggestion.c.contact_id.in_(contact_ids) | _suggestion.c.duplicate_id.in_(contact_ids)))
+
+
+def delete_account_rows(conn, account_id: int):
+    """Delete an account and its children in the caller's transaction."""
+    if not foreign_keys_enforced(conn):
+        _delete_suggestions(conn, select(_contact.c.id).where(_contact.c.account_id == account_id))
+        for table in _children:
+            conn.execute(table.delete().where(table.c.account_id == account_id))
+    conn.execute(_account.delete().where(_account.c.id == account_id))
+    bump_data_versions(conn, _TABLES)
+
+
+def purge_account(engine, account_id: int, chunk_size: int = 1000) -> int:
+    """Delete an account's children ``chunk_size`` rows per transaction, then the account.
+
+    Returns the number of child rows removed.
+    """
+    removed = 0
+    for table in _children:
+        while True:
+            with engine.begin() as conn:
+                ids = conn.execute(select(table.c.id).where(table.c.account_id == account_id)
+                                   .order_by(table.c.id).limit(chunk_size)).scalars().all()
+                if not ids:
+                    break
+                if table is _contact and not foreign_keys_enforced(conn):
+                    _delete_suggestions(conn, ids)
+                conn.execute(table.delete().where(table.c.id.in_(ids)))
+                bump_data_versions(conn, [table.name])
+            removed += len(ids)
+    with engine.begin() as conn:
+        delete_account_rows(conn, account_id)
+    return removed
+
+
+def resume_purges(engine, chunk_size: int = 1000) -> int:
+    """Finish every purge that was scheduled but never completed; returns how many."""
+    with engine.connect() as conn:
+        ids = conn.execute(select(_account.c.id).where(_account.c.purge_requested_at.is_not(None))
+                           .order_by(_account.c.id)).scalars().all()
+    for account_id in ids:
+        purge_account(engine, account_id, chunk_size)
+    return len(ids)
+
+
+class AccountPurger:
+    """Runs ``purge_account`` for queued accounts on one background thread."""
+
+    def __init__(self, app, chunk_size: int):
+        self.app = app
+        self.chunk_size = chunk_size
+        self.pending = set()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, account_id: int):
+        with self._lock:
+            if account_id in self.pending:
+                return
+            self.pending.add(account_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='account-purge', daemon=True)
+                self._thread.start()
+        self._queue.put(account_id)
+
+    def _run(self):
+        while True:
+            account_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    removed = purge_account(db.engine, account_id, self.chunk_size)
+                self.app.logger.info('Purged account %s (%d contacts/opportunities)', account_id, removed)
+            except Exception:
+                self.app.logger.exception('Purging account %s failed', account_id)
+            finally:
+                with self._lock:
+                    self.pending.discard(account_id)
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued purge has finished."""
+        self._queue.join()
+
+
+def get_purger() -> AccountPurger:
+    purger = current_app.extensions.get('account_purger')
+    if purger is None:
+        purger = AccountPurger(current_app._get_current_object(),
+                               current_app.config.get('ACCOUNT_PURGE_CHUNK_SIZE', 1000))
+        current_app.extensions['account_purger'] = purger
+    return purger
+
+
+def delete_account(account_id: int) -> bool:
+    """Delete an account now, or mark it and queue a chunked purge if it is large.
+
+    Returns True if the account is gone, False if it was queued (now or by an
+    earlier request). Commits the session either way.
+    """
+    conn = db.session.connection()
+    scheduled = conn.execute(select(_account.c.purge_requested_at).where(_account.c.id == account_id)).scalar()
+    if scheduled is not None:
+        return False
+    if is_large(conn, account_id, current_app.config.get('ACCOUNT_PURGE_THRESHOLD', 5000)):
+        conn.execute(_account.update().where(_account.c.id == account_id)
+                     .values(purge_requested_at=datetime.utcnow()))
+        db.session.commit()
+        get_purger().submit(account_id)
+        return False
+    delete_account_rows(conn, account_id)
+    db.session.commit()
+    return True
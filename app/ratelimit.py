@@ -0,0 +1,332 @@
+"""Request rate limiting driven by the ``RATELIMIT_*`` config.
+
+Every request (other than static files and ``@limiter.exempt`` views) is
+counted against ``RATELIMIT_DEFAULT`` per endpoint and client: the signed-in
+user (session or API token) or, for anonymous requests, the client address
+(see ``TRUSTED_PROXY_COUNT`` when running behind a reverse proxy); views
+decorated with ``@limiter.limit(...)`` use their own limits instead. Limits
+are strings such as ``"100/hour"``, ``"10 per minute"`` or
+``"5/minute;50/day"``.
+
+``RATELIMIT_STRATEGY`` picks the algorithm:
+
+* ``fixed-window``: a counter per calendar window of the period;
+* ``sliding-window``: the current window's count plus the previous window's
+  count weighted by how much of it still overlaps the last period;
+* ``token-bucket``: a bucket of ``amount`` tokens refilled evenly over the
+  period, so short bursts are allowed but the average rate is capped.
+
+``RATELIMIT_STORAGE_URL`` picks where counters live: ``memory://`` (per
+process) or ``sqlite:///<path>`` (shared by every worker on the host; a
+relative path is placed in the instance folder). Other URLs fall back to
+memory with a warning.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from flask import current_app, jsonify, make_response, request
+
+_UNIT_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$', re.I)
+STRATEGIES = ('fixed-window', 'sliding-window', 'token-bucket')
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    amount: int
+    period: int  # seconds
+
+    def __str__(self):
+        return f'{self.amount}/{self.period}s'
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_at: float  # epoch seconds when the limit is fully available again
+    retry_after: float  # seconds until the next request would be allowed (0 if allowed)
+
+
+@lru_cache(maxsize=256)
+def parse_limits(value: str):
+    """Parse ``"100/hour;10 per minute"`` into a tuple of RateLimit."""
+    limits = []
+    for part in value.split(';'):
+        if not part.strip():
+            continue
+        match = _LIMIT_RE.match(part)
+        if not match:
+            raise ValueError(f'invalid rate limit {part.strip()!r}')
+        amount, multiple, unit = match.groups()
+        limits.append(RateLimit(int(amount), int(multiple or 1) * _UNIT_SECONDS[unit.lower()]))
+    return tuple(limits)
+
+
+# Each strategy maps (stored state or None, limit, now) to (new state, result).
+# States are tuples of floats so every store can persist them the same way.
+
+def _fixed_window(state, limit, now):
+    window = now - now % limit.period
+    count = state[1] if state and state[0] == window else 0
+    reset_at = window + limit.period
+    if count >= limit.amount:
+        return (window, count), RateLimitResult(False, limit.amount, 0, reset_at, reset_at - now)
+    count += 1
+    return (window, count), RateLimitResult(True, limit.amount, int(limit.amount - count), reset_at, 0.0)
+
+
+def _sliding_window(state, limit, now):
+    window = now - now % limit.period
+    count = previous = 0
+    if state:
+        if state[0] == window:
+            count, previous = state[1], state[2]
+        elif state[0] == window - limit.period:
+            previous = state[1]
+    overlap = 1 - (now - window) / limit.period
+    weighted = previous * overlap + count
+    reset_at = window + limit.period
+    if weighted + 1 > limit.amount:
+        # the previous window's weight decays linearly; wait until enough of it has gone
+        if previous and count < limit.amount:
+            retry_after = max(0.0, (weighted + 1 - limit.amount) / previous * limit.period)
+        else:
+            retry_after = reset_at - now
+        return (window, count, previous), RateLimitResult(False, limit.amount, 0, reset_at, retry_after)
+    count += 1
+    remaining = int(limit.amount - weighted - 1)
+    return (window, count, previous), RateLimitResult(True, limit.amount, remaining, reset_at, 0.0)
+
+
+def _token_bucket(state, limit, now):
+    rate = limit.amount / limit.period
+    if state:
+        tokens = min(float(limit.amount), state[0] + (now - state[1]) * rate)
+    else:
+        tokens = float(limit.amount)
+    if tokens < 1:
+        return (tokens, now), RateLimitResult(False, limit.amount, 0, now + (limit.amount - tokens) / rate,
+                                              (1 - tokens) / rate)
+    tokens -= 1
+    return (tokens, now), RateLimitResult(True, limit.amount, int(tokens), now + (limit.amount - tokens) / rate, 0.0)
+
+
+_STRATEGY_FUNCS = {
+    'fixed-window': _fixed_window,
+    'sliding-window': _sliding_window,
+    'token-bucket': _token_bucket,
+}
+
+
+class MemoryStore:
+    """Per-process state, guarded by a lock; expired keys are purged periodically."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def update(self, key: str, fn, ttl: float, now: float):
+        """Atomically replace the state at ``key`` with ``fn(state)[0]``; returns ``fn(state)[1]``."""
+        with self._lock:
+            item = self._data.get(key)
+            state = item[1] if item is not None and item[0] > now else None
+            new_state, result = fn(state)
+            self._data[key] = (now + ttl, new_state)
+            self._ops += 1
+            if self._ops % self.PURGE_EVERY == 0:
+                for k in [k for k, (expires, _) in self._data.items() if expires <= now]:
+                    del self._data[k]
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteStore:
+    """State in a small SQLite file shared by every process on the host.
+
+    Each update is one ``BEGIN IMMEDIATE`` transaction (so concurrent workers
+    serialize on the key) in WAL mode with ``synchronous=OFF``: counters are
+    disposable, so they are not worth an fsync per request.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute('CREATE TABLE IF NOT EXISTS ratelimit '
+                     '(key TEXT PRIMARY KEY, state TEXT NOT NULL, expires REAL NOT NULL)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def update(self, key: str, fn, ttl: float, now: float):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT state, expires FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            state = tuple(float(v) for v in row[0].split(',')) if row and row[1] > now else None
+            new_state, result = fn(state)
+            conn.execute('INSERT OR REPLACE INTO ratelimit (key, state, expires) VALUES (?, ?, ?)',
+                         (key, ','.join(repr(float(v)) for v in new_state), now + ttl))
+            self._ops += 1
+            if self._ops % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM ratelimit WHERE expires <= ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def clear(self):
+        self._connection().execute('DELETE FROM ratelimit')
+
+
+def store_from_url(url: str, instance_path: str):
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):] or 'ratelimit.db'
+        if not os.path.isabs(path):
+            path = os.path.join(instance_path, path)
+        return SQLiteStore(path)
+    if url and not url.startswith('memory://'):
+        current_app.logger.warning('Unsupported RATELIMIT_STORAGE_URL %r; using in-memory rate limits', url)
+    return MemoryStore()
+
+
+def config_limit(name: str):
+    """Limit value for ``RateLimiter.limit`` that reads config key ``name`` per request."""
+    return lambda: current_app.config.get(name)
+
+
+def remote_address():
+    return request.remote_addr or '127.0.0.1'
+
+
+def client_key():
+    """``user:<id>`` for signed-in requests, otherwise ``ip:<address>``."""
+    from flask_login import current_user
+
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    return f'ip:{remote_address()}'
+
+
+class RateLimiter:
+    """Flask extension enforcing ``RATELIMIT_*`` limits in a ``before_request`` hook."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['ratelimit'] = None  # store is created on first use
+        app.before_request(self._check_request)
+        app.after_request(self._add_headers)
+
+    def limit(self, value, key_func=None, methods=None):
+        """Decorator giving a view its own limits instead of ``RATELIMIT_DEFAULT``.
+
+        ``value`` is a limit string or a callable returning one (evaluated per
+        request, e.g. to read config); ``methods`` restricts counting to those
+        HTTP methods.
+        """
+        def decorator(view):
+            view._rate_limit = (value, key_func, tuple(m.upper() for m in methods) if methods else None)
+            return view
+        return decorator
+
+    def exempt(self, view):
+        view._rate_limit_exempt = True
+        return view
+
+    def store(self):
+        store = current_app.extensions.get('ratelimit')
+        if store is None:
+            store = store_from_url(current_app.config.get('RATELIMIT_STORAGE_URL') or 'memory://',
+                                   current_app.instance_path)
+            current_app.extensions['ratelimit'] = store
+        return store
+
+    def hit(self, key: str, limits, strategy: str = 'fixed-window', now=None):
+        """Count one request for ``key`` against each of ``limits``; returns the tightest result."""
+        fn = _STRATEGY_FUNCS.get(strategy)
+        if fn is None:
+            raise ValueError(f'unknown rate limit strategy {strategy!r} (expected one of {", ".join(STRATEGIES)})')
+        now = time.time() if now is None else now
+        store = self.store()
+        tightest = None
+        for limit in limits:
+            result = store.update(f'{key}:{strategy}:{limit}', lambda state: fn(state, limit, now), 2 * limit.period, now)
+            if tightest is None or (not result.allowed, -result.remaining) > (not tightest.allowed, -tightest.remaining):
+                tightest = result
+        return tightest
+
+    def _limits_for_request(self):
+        if request.endpoint is None or request.endpoint == 'static':
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        if view is None or getattr(view, '_rate_limit_exempt', False):
+            return None
+        override = getattr(view, '_rate_limit', None)
+        if override is None:
+            value, key_func = current_app.config.get('RATELIMIT_DEFAULT'), None
+        else:
+            value, key_func, methods = override
+            if methods and request.method not in methods:
+                return None
+            if callable(value):
+                value = value()
+        if not value:
+            return None
+        return parse_limits(value), (key_func or client_key)()
+
+    def _check_request(self):
+        if not current_app.config.get('RATELIMIT_ENABLED', True):
+            return None
+        found = self._limits_for_request()
+        if found is None:
+            return None
+        limits, key = found
+        result = self.hit(f'{request.endpoint}:{key}', limits,
+                          current_app.config.get('RATELIMIT_STRATEGY', 'fixed-window'))
+        request.environ['crm.ratelimit'] = result
+        if result.allowed:
+            return None
+        if request.path.startswith('/api/'):
+            response = make_response(jsonify({'error': 'Rate limit exceeded'}), 429)
+        else:
+            response = make_response('Too many requests. Please slow down and try again shortly.', 429)
+        response.headers['Retry-After'] = str(max(1, int(result.retry_after + 0.999)))
+        return response
+
+    def _add_headers(self, response):
+        result = request.environ.get('crm.ratelimit')
+        if result is not None and current_app.config.get('RATELIMIT_HEADERS_ENABLED', True):
+            response.headers['X-RateLimit-Limit'] = str(result.limit)
+            response.headers['X-RateLimit-Remaining'] = str(max(0, result.remaining))
+            response.headers['X-RateLimit-Reset'] = str(int(result.reset_at + 0.999))
+        return response
+
+
+limiter = RateLimiter()
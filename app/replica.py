@@ -0,0 +1,172 @@
+"""Optional read replica.
+
+When ``SQLALCHEMY_READ_REPLICA_URI`` is set it is added to ``SQLALCHEMY_BINDS``
+as the ``replica`` bind, and ``RoutingSession.get_bind`` sends plain SELECTs
+there for requests that opted in: API GET handlers (see ``api.before_request``)
+and the list/export/report views decorated with ``@read_replica``. Everything
+else, including flushes and the user/token lookups done while authenticating,
+stays on the primary.
+
+Read-your-writes: once a request flushes, the rest of it reads from the
+primary, and the user keeps reading from the primary for
+``READ_YOUR_WRITES_SECONDS`` afterwards (tracked in the session cookie, and per
+process for token-authenticated clients).
+
+For local testing the replica can be a SQLite file that is refreshed from the
+primary with SQLite's backup API every ``READ_REPLICA_REFRESH_SECONDS``
+(0 disables copying, e.g. when real replication keeps the replica current).
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import CompoundSelect, Select
+
+from .cache import TTLCache
+
+REPLICA_BIND = 'replica'
+_WRITE_AT_KEY = '_db_write_at'
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that routes SELECTs to the replica when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, (Select, CompoundSelect))
+                and clause._for_update_arg is None and has_request_context() and g.get('read_replica')):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+        g.read_replica = False
+
+
+def configure_binds(config):
+    """Register the replica bind from config (call before ``db.init_app``)."""
+    uri = config.get('SQLALCHEMY_READ_REPLICA_URI')
+    if uri:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = uri
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def replica_enabled() -> bool:
+    return bool(current_app.config.get('SQLALCHEMY_READ_REPLICA_URI'))
+
+
+def _recent_writers() -> TTLCache:
+    cache = current_app.extensions.get('replica_recent_writers')
+    if cache is None:
+        cache = TTLCache(maxsize=10000, ttl=current_app.config.get('READ_YOUR_WRITES_SECONDS', 5))
+        current_app.extensions['replica_recent_writers'] = cache
+    return cache
+
+
+def _wrote_recently(user_id) -> bool:
+    window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+    if session.get(_WRITE_AT_KEY, 0) > time.time() - window:
+        return True
+    return user_id is not None and _recent_writers().get(user_id) is not None
+
+
+def route_reads_to_replica():
+    """Send the rest of this request's SELECTs to the replica, unless the user wrote recently."""
+    if not replica_enabled():
+        return
+    # authenticate against the primary before routing (new users/tokens may not be replicated yet)
+    user_id = current_user.id if current_user.is_authenticated else None
+    if _wrote_recently(user_id):
+        return
+    _refresher().maybe_refresh()
+    g.read_replica = True
+
+
+def read_replica(view):
+    """Decorator for read-only views; place it below the auth decorators."""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        route_reads_to_replica()
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+def remember_writes(response):
+    """``after_request`` hook: start the read-your-writes window for a user who just wrote."""
+    if g.get('db_wrote') and replica_enabled():
+        user = g.get('_login_user')
+        if user is not None and user.is_authenticated:
+            _recent_writers().set(user.id, True)
+        if g.get('api_token') is None:
+            session[_WRITE_AT_KEY] = time.time()
+    return response
+
+
+class SQLiteReplicaRefresher:
+    """Copies the primary SQLite database over the replica with the backup API on an interval."""
+
+    def __init__(self, app, interval: float):
+        self.app = app
+        self.interval = interval
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def maybe_refresh(self):
+        if self.interval <= 0:
+            return
+        if self._refreshed_at is None:
+            # first use: the replica may not even have the schema yet
+            self.refresh()
+        elif time.monotonic() - self._refreshed_at >= self.interval:
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def refresh(self) -> bool:
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with self.app.app_context():
+                from . import db
+                source = db.engines[None].raw_connection()
+                target = db.engines[REPLICA_BIND].raw_connection()
+                try:
+                    source.driver_connection.backup(target.driver_connection)
+                finally:
+                    target.close()
+                    source.close()
+            self._refreshed_at = time.monotonic()
+            return True
+        except Exception:
+            # readers may hold the replica briefly; try again on the next interval
+            self.app.logger.exception('Read replica refresh failed')
+            self._refreshed_at = time.monotonic()
+            return False
+        finally:
+            self._lock.release()
+
+
+def _refresher() -> SQLiteReplicaRefresher:
+    refresher = current_app.extensions.get('replica_refresher')
+    if refresher is None:
+        refresher = SQLiteReplicaRefresher(current_app._get_current_object(),
+                                           current_app.config.get('READ_REPLICA_REFRESH_SECONDS', 0))
+        current_app.extensions['replica_refresher'] = refresher
+    return refresher
+
+
+def init_app(app, db):
+    """Call after ``db.init_app``."""
+    # No models live on the replica bind; drop the empty MetaData Flask-SQLAlchemy
+    # made for it so create_all()/drop_all() keep touching only the primary.
+    metadata = db.metadatas.get(REPLICA_BIND)
+    if metadata is not None and not metadata.tables:
+        del db.metadatas[REPLICA_BIND]
+    app.after_request(remember_writes)
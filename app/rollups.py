@@ -0,0 +1,251 @@
+"""Per-account rollup columns.
+
+``Account.contact_count``, ``open_opportunity_count``, ``open_pipeline_value``
+and ``last_activity_at`` are kept current from an ``after_flush`` hook: each
+flush that adds, changes or deletes contacts or opportunities applies the
+per-account deltas with one executemany ``UPDATE``. An opportunity is open
+while its stage is empty or not one of ``CLOSED_STAGES``; ``last_activity_at``
+is the last time one of the account's contacts or deals was added, changed or
+removed through the ORM.
+
+Writes that bypass the ORM call ``refresh_rollups`` for the accounts they
+touch, and so does the hook when it can't tell what a changed row used to
+hold. ``flask repair-rollups`` recomputes every account from scratch.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+
+from .archive import CLOSED_STAGES
+from .models import Account, Contact, Opportunity
+
+ROLLUP_COLUMNS = ('contact_count', 'open_opportunity_count', 'open_pipeline_value', 'last_activity_at')
+REPAIR_CHUNK_SIZE = 1000
+
+_account = Account.__table__
+_contact = Contact.__table__
+_opportunity = Opportunity.__table__
+_TRACKED = {Contact: ('account_id',), Opportunity: ('account_id', 'stage', 'value')}
+_UNKNOWN = object()
+
+
+def _history(obj, attr):
+    return get_history(obj, attr, passive=PASSIVE_NO_INITIALIZE)
+
+
+def _stored(session, obj):
+    identity = inspect(obj).identity
+    return session.info.get('rollup_previous', {}).get((type(obj), identity[0] if identity else None))
+
+
+def _previous(session, obj, attr):
+    """The value ``attr`` had in the database before this flush, or ``_UNKNOWN``."""
+    history = _history(obj, attr)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    stored = _stored(session, obj)
+    return stored[attr] if stored else _UNKNOWN
+
+
+def _current(session, obj, attr):
+    history = _history(obj, attr)
+    if history.added:
+        return history.added[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    stored = _stored(session, obj)
+    return stored[attr] if stored else getattr(obj, attr)
+
+
+def _open_value(stage, value):
+    """``(open deals, open value)`` an opportunity contributes to its account."""
+    if stage in CLOSED_STAGES:
+        return 0, 0
+    return 1, value or 0
+
+
+class _Deltas:
+    def __init__(self):
+        self.changes = {}
+        self.stale = set()
+
+    def add(self, account_id, contacts=0, deals=0, value=0):
+        if account_id is None or account_id is _UNKNOWN:
+            return
+        current = self.changes.get(account_id, (0, 0, 0))
+        self.changes[account_id] = (current[0] + contacts, current[1] + deals, current[2] + value)
+
+
+def _changed(session, cls):
+    return [obj for obj in session.dirty
+            if isinstance(obj, cls) and session.is_modified(obj, include_collections=False)]
+
+
+def _contact_deltas(deltas, session):
+    for obj in session.new:
+        if isinstance(obj, Contact):
+            deltas.add(obj.account_id, contacts=1)
+    for obj in session.deleted:
+        if isinstance(obj, Contact):
+            deltas.add(_previous(session, obj, 'account_id'), contacts=-1)
+    for obj in _changed(session, Contact):
+        old, new = _previous(session, obj, 'account_id'), _current(session, obj, 'account_id')
+        if old is _UNKNOWN:
+            deltas.stale.add(new)
+        elif old != new:
+            deltas.add(old, contacts=-1)
+            deltas.add(new, contacts=1)
+        else:
+            deltas.add(new)
+
+
+def _opportunity_deltas(deltas, session):
+    attrs = _TRACKED[Opportunity]
+    for obj in session.new:
+        if isinstance(obj, Opportunity):
+            deals, value = _open_value(obj.stage, obj.value)
+            deltas.add(obj.account_id, deals=deals, value=value)
+    for obj in session.deleted:
+        if isinstance(obj, Opportunity):
+            old = [_previous(session, obj, attr) for attr in attrs]
+            if _UNKNOWN in old:
+                deltas.stale.add(old[0])
+                continue
+            deals, value = _open_value(old[1], old[2])
+            deltas.add(old[0], deals=-deals, value=-value)
+    for obj in _changed(session, Opportunity):
+        old = [_previous(session, obj, attr) for attr in attrs]
+        new = [_current(session, obj, attr) for attr in attrs]
+        if _UNKNOWN in old:
+            deltas.stale.update({old[0], new[0]})
+            continue
+        old_deals, old_value = _open_value(old[1], old[2])
+        new_deals, new_value = _open_value(new[1], new[2])
+        deltas.add(old[0], deals=-old_deals, value=-old_value)
+        deltas.add(new[0], deals=new_deals, value=new_value)
+
+
+@event.listens_for(Session, 'before_flush')
+def _read_previous_values(session, flush_context, instances):
+    """Fetch stored values for changed/deleted rows whose old values were never loaded.
+
+    Objects are usually loaded before they are changed, so this rarely runs;
+    it covers e.g. an object expired by a commit and then modified or deleted.
+    """
+    missing = {}
+    for obj in list(session.dirty) + list(session.deleted):
+        attrs = _TRACKED.get(type(obj))
+        if attrs and inspect(obj).identity and any(
+                not (_history(obj, a).deleted or _history(obj, a).unchanged) for a in attrs):
+            missing.setdefault(type(obj), []).append(inspect(obj).identity[0])
+    previous = {}
+    for cls, ids in missing.items():
+        table = cls.__table__
+        rows = session.connection().execute(
+            select(table.c.id, *[table.c[a] for a in _TRACKED[cls]]).where(table.c.id.in_(ids)))
+        for row in rows:
+            previous[(cls, row[0])] = dict(zip(_TRACKED[cls], row[1:]))
+    session.info['rollup_previous'] = previous
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups_after_flush(session, flush_context):
+    deltas = _Deltas()
+    _contact_deltas(deltas, session)
+    _opportunity_deltas(deltas, session)
+    session.info.pop('rollup_previous', None)
+    if not deltas.changes and not deltas.stale:
+        return
+    conn = session.connection()
+    now = datetime.utcnow()
+    if deltas.changes:
+        conn.execute(
+            _account.update().where(_account.c.id == bindparam('aid')).values(
+                contact_count=_account.c.contact_count + bindparam('contacts'),
+                open_opportunity_count=_account.c.open_opportunity_count + bindparam('deals'),
+                open_pipeline_value=_account.c.open_pipeline_value + bindparam('value'),
+                last_activity_at=bindparam('now'),
+            ),
+            [{'aid': aid, 'contacts': c, 'deals': d, 'value': v, 'now': now}
+             for aid, (c, d, v) in sorted(deltas.changes.items())],
+        )
+    stale = deltas.stale - {None, _UNKNOWN}
+    if stale:
+        refresh_rollups(conn, stale, now=now)
+
+
+def _recomputed():
+    """Column -> correlated subquery computing it for ``account``."""
+    # a deal without a stage is open, as in _open_value (NULL NOT IN (...) is NULL, not true)
+    open_deals = (_opportunity.c.account_id == _account.c.id) & or_(
+        _opportunity.c.stage.is_(None), _opportunity.c.stage.notin_(CLOSED_STAGES))
+    return {
+        'contact_count': select(func.count()).where(_contact.c.account_id == _account.c.id).scalar_subquery(),
+        'open_opportunity_count': select(func.count()).where(open_deals).scalar_subquery(),
+        'open_pipeline_value': select(func.coalesce(func.sum(_opportunity.c.value), 0))
+                               .where(open_deals).scalar_subquery(),
+    }
+
+
+def refresh_rollups(conn, account_ids, now=None):
+    """Recompute the counters of ``account_ids`` (and mark them active at ``now``, if given)."""
+    values = _recomputed()
+    if now is not None:
+        values['last_activity_at'] = now
+    conn.execute(_account.update().where(_account.c.id.in_(sorted(account_ids))).values(**values))
+
+
+def repair_rollups(engine, chunk_size: int = REPAIR_CHUNK_SIZE) -> int:
+    """Recompute every account's counters, ``chunk_size`` accounts per transaction.
+
+    ``last_activity_at`` is only moved forward, to the newest deal's creation
+    time, since contacts and updates leave no timestamp to rebuild it from.
+    Returns the number of accounts whose counters were wrong.
+    """
+    values = _recomputed()
+    newest_deal = select(func.max(_opportunity.c.created_at)).where(
+        _opportunity.c.account_id == _account.c.id).scalar_subquery()
+    values['last_activity_at'] = case(
+        (newest_deal > _account.c.last_activity_at, newest_deal),
+        else_=func.coalesce(_account.c.last_activity_at, newest_deal),
+    )
+    wrong = (values['contact_count'] != _account.c.contact_count) \
+        | (values['open_opportunity_count'] != _account.c.open_opportunity_count) \
+        | (values['open_pipeline_value'] != _account.c.open_pipeline_value)
+    fixed = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(select(_account.c.id).where(_account.c.id > last_id)
+                               .order_by(_account.c.id).limit(chunk_size)).scalars().all()
+            if not ids:
+                break
+            fixed += conn.execute(select(func.count()).select_from(_account)
+                                  .where(_account.c.id.in_(ids), wrong)).scalar()
+            conn.execute(_account.update().where(_account.c.id.in_(ids)).values(**values))
+        last_id = ids[-1]
+    return fixed
+
+
+def account_listing(query, args, default_order):
+    """Apply ``?sort=<column>&order=asc|desc`` and ``?min_<counter>=N`` to an ``Account`` query.
+
+    ``sort`` takes a rollup column, ``name`` or ``created_at``; the rollups
+    are indexed, so sorting or filtering on them doesn't aggregate contacts
+    or opportunities. Unknown values fall back to ``default_order``.
+    """
+    for name in ROLLUP_COLUMNS[:3]:
+        minimum = args.get(f'min_{name}', type=int)
+        if minimum is not None:
+            query = query.filter(getattr(Account, name) >= minimum)
+    sort = args.get('sort', '')
+    if sort not in ROLLUP_COLUMNS + ('name', 'created_at'):
+        return query.order_by(default_order)
+    column = getattr(Account, sort)
+    if args.get('order', 'desc' if sort in ROLLUP_COLUMNS else 'asc') == 'desc':
+        return query.order_by(column.desc(), Account.id.desc())
+    return query.order_by(column.asc(), Account.id.asc())
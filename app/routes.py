@@ -1,10 +1,11 @@
 """Routes for the CRM application."""
 from datetime import datetime, timedelta
 import secrets
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app, stream_with_context, send_file
 from flask_login import login_user, logout_user, login_required, current_user
 from functools import wraps
 from . import db
+from sqlalchemy.orm import selectinload
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import smtplib
 from email.message import EmailMessage
@@ -12,9 +13,21 @@ import json
 from pathlib import Path
 import io
 import csv
+import tempfile
 from flask import Response
-from .models import User, Account, Contact, Opportunity
+from .models import User, Account, Contact, ContactDuplicate, Opportunity
 from .models import Token
+from .importer import normalize_name_key, validate_rows
+from .auth import invalidate_user
+from .ratelimit import limiter, config_limit
+from .replica import read_replica
+from .metrics import AUDIT_EVENTS, count_import_rows, count_export_rows
+from . import profiler
+from .purge import delete_account
+from .duplicates import dismiss_duplicates, merge_duplicates
+from .rollups import account_listing
+from .exports import iter_csv, write_csv, write_columnar, export_version, get_export_cache
+from .exports import export_rows, csv_rows, columnar_available, COLUMNAR_FORMATS, EXPORT_HEADERS
 
 main = Blueprint('main', __name__)
 @main.route('/calendar')
@@ -56,7 +69,9 @@ def _audit_event(action: str, actor_id: int | None, details: dict):
         }
         with log_file.open('a', encoding='utf-8') as f:
             f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        AUDIT_EVENTS.inc(outcome='written')
     except Exception:
+        AUDIT_EVENTS.inc(outcome='failed')
         current_app.logger.exception('Failed to write audit event')
 
 
@@ -137,12 +152,14 @@ def reset_password(token):
             return render_template('reset_password.html', token=token)
         user.set_password(new_password)
         db.session.commit()
+        invalidate_user(user.id)
         flash('Your password has been reset. You may now log in.', 'success')
         return redirect(url_for('main.login'))
 
     return render_template('reset_password.html', token=token, title='Reset Password')
 
 @main.route('/login', methods=['GET', 'POST'])
+@limiter.limit(config_limit('RATELIMIT_LOGIN'), methods=['POST'])
 def login():
     """Handles the login page and form submission."""
     if current_user.is_authenticated:
@@ -156,7 +173,11 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         # Check if the user exists and if the password is correct.
+        # a saturated hashing pool raises HashingBusy, answered with a 503 by create_app's handler
         if user and user.check_password(password):
+            if db.session.is_modified(user):
+                # check_password upgraded an outdated password hash
+                db.session.commit()
             # Log the user in (this creates their session).
             login_user(user)
             # Before redirecting, check if they were trying to access a protected page
@@ -190,6 +211,7 @@ def home():
 
 @main.route('/dashboard')
 @login_required
+@read_replica
 def dashboard():
     """Dashboard showing key metrics and recent items."""
     # Get recent accounts and open opportunities
@@ -234,6 +256,7 @@ def dashboard():
 
 @main.route('/users')
 @admin_required  # Only admins can see user list
+@read_replica
 def users():
     """List users with pagination and search (admin only)."""
     page = request.args.get('page', 1, type=int)
@@ -313,6 +336,7 @@ def user_edit(user_id):
         user.role = request.form.get('role', 'user')
         
         db.session.commit()
+        invalidate_user(user.id)
         _audit_event('user.update', current_user.id if current_user.is_authenticated else None, {'user_id': user.id, 'email': user.email, 'role': user.role})
 
         # If AJAX, return JSON so frontend can update inline
@@ -345,6 +369,7 @@ def user_delete(user_id):
     
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     _audit_event('user.delete', current_user.id if current_user.is_authenticated else None, {'user_id': user.id, 'email': user.email})
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
         return {'success': True, 'id': user_id}
@@ -379,6 +404,7 @@ def user_reset_password(user_id):
     
     user.set_password(new_password)
     db.session.commit()
+    invalidate_user(user.id)
     
     flash('Password reset successfully', 'success')
     return redirect(url_for('main.user_edit', user_id=user_id))
@@ -402,6 +428,7 @@ def user_set_role(user_id):
 
     user.role = new_role
     db.session.commit()
+    invalidate_user(user.id)
     _audit_event('user.role_change', current_user.id if current_user.is_authenticated else None, {'user_id': user.id, 'new_role': new_role})
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
@@ -491,9 +518,26 @@ def test_email():
 @main.route('/tokens')
 @admin_required
 def tokens_list():
-    """Admin list of tokens."""
-    tokens = Token.query.order_by(Token.created_at.desc()).all()
-    return render_template('users/tokens.html', tokens=tokens, title='API Tokens')
+    """Admin list of tokens (paginated; owner names joined in rather than lazy-loaded per token)."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 25, type=int)
+    base = db.session.query(
+        Token.id,
+        Token.token_prefix,
+        Token.user_id,
+        Token.created_at,
+        Token.expires_at,
+        Token.scopes,
+        Token.revoked,
+        Token.last_used_at,
+        Token.use_count,
+        User.email.label('user_email'),
+        User.first_name.label('user_first_name'),
+        User.last_name.label('user_last_name'),
+    ).join(User, Token.user_id == User.id)
+    pagination = base.order_by(Token.created_at.desc(), Token.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    tokens = pagination.items
+    return render_template('users/tokens.html', tokens=tokens, pagination=pagination, title='API Tokens')
 
 @main.route('/tokens/create', methods=['POST'])
 @admin_required
@@ -553,8 +597,91 @@ def tokens_revoke(token_id):
     flash('Token revoked', 'success')
     return redirect(url_for('main.tokens_list'))
 
+@main.route('/admin/profiles')
+@admin_required
+def profiles_list():
+    """Saved request profiles (see app.profiler), newest first."""
+    return {'profiles': profiler.list_profiles(profiler.profile_dir())}
+
+@main.route('/admin/profiles/<profile_id>')
+@admin_required
+def profile_report(profile_id):
+    """Text report for a saved profile; ?sort=cumulative|tottime|ncalls|pcalls&limit=50"""
+    report = profiler.render_report(profiler.profile_dir(), profile_id,
+                                    sort=request.args.get('sort', 'cumulative'),
+                                    limit=request.args.get('limit', 50, type=int))
+    if report is None:
+        abort(404)
+    return Response(report, mimetype='text/plain')
+
+@main.route('/admin/profiles/<profile_id>/download')
+@admin_required
+def profile_download(profile_id):
+    """Raw cProfile stats, for snakeviz or pstats."""
+    files = profiler.profile_files(profiler.profile_dir(), profile_id)
+    if files is None:
+        abort(404)
+    return send_file(files[1], mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
+
+@main.route('/admin/duplicates')
+@admin_required
+def duplicates_list():
+    """Pending duplicate-contact suggestions (see app.duplicates), best score first."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    pagination = (ContactDuplicate.query.filter_by(status='pending')
+                  .order_by(ContactDuplicate.score.desc(), ContactDuplicate.id)
+                  .paginate(page=page, per_page=per_page, error_out=False))
+    ids = {i for s in pagination.items for i in (s.contact_id, s.duplicate_id)}
+    contacts = {c.id: c for c in Contact.query.filter(Contact.id.in_(ids))} if ids else {}
+
+    def describe(contact_id):
+        c = contacts.get(contact_id)
+        return c and {'id': c.id, 'first_name': c.first_name, 'last_name': c.last_name, 'email': c.email,
+                      'phone_number': c.phone_number, 'account_id': c.account_id}
+    return {
+        'items': [{'id': s.id, 'score': s.score, 'reasons': s.reasons.split(',') if s.reasons else [],
+                   'contact': describe(s.contact_id), 'duplicate': describe(s.duplicate_id)}
+                  for s in pagination.items],
+        'page': pagination.page,
+        'total': pagination.total,
+    }
+
+@main.route('/admin/duplicates/merge', methods=['POST'])
+@admin_required
+def duplicates_merge():
+    """Merge the selected suggestions (form or JSON ``ids``)."""
+    ids = _selected_ids()
+    merged = merge_duplicates(ids)
+    db.session.commit()
+    _audit_event('contacts.merge', current_user.id, {'suggestions': sorted(ids), 'merged': merged})
+    return {'merged': merged}
+
+@main.route('/admin/duplicates/dismiss', methods=['POST'])
+@admin_required
+def duplicates_dismiss():
+    """Mark the selected suggestions as not duplicates."""
+    dismissed = dismiss_duplicates(_selected_ids())
+    db.session.commit()
+    return {'dismissed': dismissed}
+
+def _selected_ids() -> set:
+    data = request.get_json(silent=True)
+    if data is None:
+        raw = request.form.getlist('ids')
+    elif isinstance(data, dict) and isinstance(data.get('ids', []), list):
+        raw = data.get('ids')
+    else:
+        abort(400)
+    try:
+        return {int(i) for i in raw or []}
+    except (TypeError, ValueError):
+        abort(400)
+
 @main.route('/opportunities')
 @login_required
+@read_replica
 def opportunities():
     """List opportunities with pagination, search and RBAC (sales see own deals)."""
     page = request.args.get('page', 1, type=int)
@@ -575,21 +702,69 @@ def opportunities():
     return render_template('opportunities/list.html', opportunities=opportunities, pagination=pagination, q=q, title='Opportunities')
 
 
+def _csv_export_response(entity: str, filename: str, header: list, rows, audit_action: str):
+    """Stream ``rows`` as a CSV attachment; the audit event is written once the last row is sent."""
+    actor_id = current_user.id if current_user.is_authenticated else None
+
+    def audit(count):
+        count_export_rows(entity, 'csv', count)
+        _audit_event(audit_action, actor_id, {'count': count})
+
+    body = stream_with_context(iter_csv(header, rows, on_complete=audit))
+    return Response(body, mimetype='text/csv', headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+def _export_response(entity: str, scope: str, audit_action: str, owner_id=None):
+    """Serve an export, generated once per (entity, scope, data version, format) via the export cache.
+
+    ``?format=parquet`` / ``?format=arrow`` return typed columnar files when
+    pyarrow is installed; any other value, or a missing pyarrow, gives CSV.
+    Without a cache, CSV is streamed and columnar formats go through a temp file.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        current_app.logger.warning('pyarrow is not installed; serving %s export as CSV', entity)
+        fmt = 'csv'
+    header = EXPORT_HEADERS[entity]
+    if fmt in COLUMNAR_FORMATS:
+        ext, mimetype = COLUMNAR_FORMATS[fmt]
+        generate = lambda f: write_columnar(f, fmt, entity, export_rows(entity, owner_id))
+    else:
+        fmt, ext, mimetype = 'csv', 'csv', 'text/csv'
+        generate = lambda f: write_csv(f, header, csv_rows(entity, owner_id))
+    filename = f'{entity}.{ext}'
+    actor_id = current_user.id if current_user.is_authenticated else None
+
+    cache = get_export_cache()
+    if cache is None:
+        if fmt == 'csv':
+            return _csv_export_response(entity, filename, header, csv_rows(entity, owner_id), audit_action)
+        tmp = tempfile.TemporaryFile()
+        count = generate(tmp)
+        tmp.seek(0)
+        count_export_rows(entity, fmt, count)
+        _audit_event(audit_action, actor_id, {'count': count, 'format': fmt})
+        return send_file(tmp, mimetype=mimetype, as_attachment=True, download_name=filename)
+
+    version = export_version(entity)
+    path, count = cache.artifact(entity, scope, version, ext, generate)
+    count_export_rows(entity, fmt, count)
+    details = {'cached': True} if count is None else {'count': count}
+    details['format'] = fmt
+    _audit_event(audit_action, actor_id, details)
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename,
+                     etag=f'{entity}-{scope}-{version}-{ext}', max_age=0)
+
+
 @main.route('/opportunities/export')
+@limiter.limit(config_limit('RATELIMIT_EXPORT'))
 @login_required
+@read_replica
 def opportunities_export():
     # Export visible opportunities as CSV
-    base = Opportunity.query.join(Account)
-    if current_user.role != 'admin':
-        base = base.filter(Opportunity.owner_id == current_user.id)
-    opportunities = base.order_by(Opportunity.close_date.asc()).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['id','name','account','stage','value','close_date','owner'])
-    for o in opportunities:
-        writer.writerow([o.id, o.name, o.account.name if o.account else '', o.stage, o.value or 0, o.close_date.isoformat() if o.close_date else '', f"{o.owner.first_name} {o.owner.last_name}" if o.owner else ''])
-    _audit_event('export.opportunities', current_user.id if current_user.is_authenticated else None, {'count': len(opportunities)})
-    return Response(output.getvalue(), mimetype='text/csv', headers={"Content-Disposition": "attachment; filename=opportunities.csv"})
+    owner_id = None if current_user.role == 'admin' else current_user.id
+    scope = 'all' if owner_id is None else f'user{owner_id}'
+    return _export_response('opportunities', scope, 'export.opportunities', owner_id=owner_id)
 
 @main.route('/opportunities/create', methods=['GET', 'POST'])
 @login_required
@@ -671,6 +846,7 @@ def opportunity_delete(opportunity_id):
 
 @main.route('/contacts')
 @login_required
+@read_replica
 def contacts():
     """List contacts with pagination and search."""
     page = request.args.get('page', 1, type=int)
@@ -688,24 +864,17 @@ def contacts():
 
 
 @main.route('/contacts/export')
+@limiter.limit(config_limit('RATELIMIT_EXPORT'))
 @login_required
+@read_replica
 def contacts_export():
-    base = Contact.query.join(Account)
-    if current_user.role != 'admin':
-        # non-admins see contacts via accounts they own? For now return all but this can be restricted
-        base = base
-    contacts = base.order_by(Contact.id.desc()).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['id','first_name','last_name','email','phone','company'])
-    for c in contacts:
-        writer.writerow([c.id, c.first_name, c.last_name, c.email or '', c.phone_number or '', c.account.name if c.account else ''])
-    _audit_event('export.contacts', current_user.id if current_user.is_authenticated else None, {'count': len(contacts)})
-    return Response(output.getvalue(), mimetype='text/csv', headers={"Content-Disposition": "attachment; filename=contacts.csv"})
+    # non-admins see contacts via accounts they own? For now all users export all contacts
+    return _export_response('contacts', 'all', 'export.contacts')
 
 
 @main.route('/accounts')
 @login_required
+@read_replica
 def accounts():
     """List accounts with pagination and search."""
     page = request.args.get('page', 1, type=int)
@@ -717,29 +886,52 @@ def accounts():
         pattern = f"%{q}%"
         base = base.filter(Account.name.ilike(pattern) | Account.industry.ilike(pattern))
 
-    pagination = base.order_by(Account.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    base = account_listing(base, request.args, Account.id.desc())
+    pagination = base.paginate(page=page, per_page=per_page, error_out=False)
     accounts = pagination.items
-    return render_template('accounts/list.html', accounts=accounts, pagination=pagination, q=q, title='Accounts')
+    return render_template('accounts/list.html', accounts=accounts, pagination=pagination, q=q,
+                           sort=request.args.get('sort', ''), title='Accounts')
 
 
 @main.route('/accounts/export')
+@limiter.limit(config_limit('RATELIMIT_EXPORT'))
 @login_required
+@read_replica
 def accounts_export():
-    base = Account.query
-    if current_user.role != 'admin':
-        # For now all users can export; customize later to restrict
-        base = base
-    accounts = base.order_by(Account.name.asc()).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['id','name','industry','phone','website','owner'])
-    for a in accounts:
-        writer.writerow([a.id, a.name, a.industry or '', a.phone or '', a.website or '', f"{a.owner.first_name} {a.owner.last_name}" if a.owner else ''])
-    _audit_event('export.accounts', current_user.id if current_user.is_authenticated else None, {'count': len(accounts)})
-    return Response(output.getvalue(), mimetype='text/csv', headers={"Content-Disposition": "attachment; filename=accounts.csv"})
+    # For now all users can export; customize later to restrict
+    return _export_response('accounts', 'all', 'export.accounts')
+
+
+def _validated_import_rows(kind: str, data: str):
+    """Stream ``(row_index, record, error)`` for an uploaded CSV body (see app.importer)."""
+    reader = csv.DictReader(io.StringIO(data))
+    return validate_rows(
+        kind,
+        reader,
+        workers=current_app.config.get('IMPORT_VALIDATION_WORKERS', 0),
+        chunk_size=current_app.config.get('IMPORT_VALIDATION_CHUNK_SIZE', 5000),
+    )
+
+
+def _owner_ids_by_email() -> dict:
+    """Map lower-cased user email -> id, loaded once per import instead of once per row."""
+    return {email.lower(): uid for uid, email in db.session.query(User.id, User.email)}
+
+
+def _account_id_lookup():
+    """``lookup(name) -> account id or None`` by normalized name, one index probe per distinct name."""
+    found = {}
+
+    def lookup(name):
+        key = normalize_name_key(name)
+        if key not in found:
+            found[key] = db.session.query(Account.id).filter_by(name_key=key).scalar()
+        return found[key]
+    return lookup
 
 
 @main.route('/accounts/import', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
 @login_required
 def accounts_import():
     """Import accounts from an uploaded CSV file. Expected columns: name, industry, phone, website, owner_email(optional)"""
@@ -754,28 +946,24 @@ def accounts_import():
         flash('Failed to read uploaded file (ensure UTF-8 CSV)', 'error')
         return redirect(url_for('main.accounts'))
 
-    reader = csv.DictReader(io.StringIO(data))
     created = 0
     errors = []
-    for idx, row in enumerate(reader, start=1):
-        name = (row.get('name') or row.get('Name') or '').strip()
-        if not name:
-            errors.append(f'Row {idx}: missing name')
+    owners = _owner_ids_by_email()
+    for idx, record, error in _validated_import_rows('accounts', data):
+        if error:
+            errors.append(error)
             continue
-        if Account.query.filter_by(name=name).first():
+        name = record['name']
+        if Account.by_name(name):
             errors.append(f'Row {idx}: account "{name}" already exists')
             continue
-        owner = None
-        owner_email = (row.get('owner_email') or row.get('owner') or '').strip()
-        if owner_email:
-            owner = User.query.filter_by(email=owner_email).first()
 
         account = Account(
             name=name,
-            industry=row.get('industry') or row.get('Industry'),
-            phone=row.get('phone'),
-            website=row.get('website'),
-            owner_id=owner.id if owner else None
+            industry=record['industry'],
+            phone=record['phone'],
+            website=record['website'],
+            owner_id=owners.get(record['owner_email'])
         )
         db.session.add(account)
         try:
@@ -785,12 +973,14 @@ def accounts_import():
             db.session.rollback()
             errors.append(f'Row {idx}: DB error: {e}')
 
+    count_import_rows('accounts', created, len(errors))
     _audit_event('import.accounts', current_user.id if current_user.is_authenticated else None, {'created': created, 'errors': len(errors)})
     # Render a results page showing created count and any row errors
     return render_template('accounts/import_result.html', created=created, errors=errors, title='Import Results')
 
 
 @main.route('/contacts/import', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
 @login_required
 def contacts_import():
     """Import contacts from CSV. Expected headers: first_name,last_name,email,phone,role_title,company (account name)"""
@@ -804,28 +994,25 @@ def contacts_import():
         flash('Failed to read uploaded file (ensure UTF-8 CSV)', 'error')
         return redirect(url_for('main.contacts'))
 
-    reader = csv.DictReader(io.StringIO(data))
     created = 0
     errors = []
-    for idx, row in enumerate(reader, start=1):
-        first = (row.get('first_name') or row.get('First') or '').strip()
-        last = (row.get('last_name') or row.get('Last') or '').strip()
-        email = (row.get('email') or row.get('Email') or '').strip()
-        company = (row.get('company') or row.get('Company') or row.get('account') or '').strip()
-        if not first or not company:
-            errors.append(f'Row {idx}: missing first_name or company')
+    account_ids = _account_id_lookup()
+    for idx, record, error in _validated_import_rows('contacts', data):
+        if error:
+            errors.append(error)
             continue
-        account = Account.query.filter_by(name=company).first()
-        if not account:
+        company = record['company']
+        account_id = account_ids(company)
+        if account_id is None:
             errors.append(f'Row {idx}: account "{company}" not found')
             continue
         contact = Contact(
-            first_name=first,
-            last_name=last,
-            email=email,
-            phone_number=row.get('phone'),
-            role_title=row.get('role_title') or row.get('Role') or '',
-            account_id=account.id
+            first_name=record['first_name'],
+            last_name=record['last_name'],
+            email=record['email'],
+            phone_number=record['phone_number'],
+            role_title=record['role_title'],
+            account_id=account_id
         )
         db.session.add(contact)
         try:
@@ -835,11 +1022,13 @@ def contacts_import():
             db.session.rollback()
             errors.append(f'Row {idx}: DB error: {e}')
 
+    count_import_rows('contacts', created, len(errors))
     _audit_event('import.contacts', current_user.id if current_user.is_authenticated else None, {'created': created, 'errors': len(errors)})
     return render_template('accounts/import_result.html', created=created, errors=errors, title='Contacts Import Results')
 
 
 @main.route('/opportunities/import', methods=['POST'])
+@limiter.limit(config_limit('RATELIMIT_IMPORT'))
 @login_required
 def opportunities_import():
     """Import opportunities from CSV. Expected headers: name,account,stage,value,close_date(YYYY-MM-DD),owner_email(optional)"""
@@ -853,34 +1042,27 @@ def opportunities_import():
         flash('Failed to read uploaded file (ensure UTF-8 CSV)', 'error')
         return redirect(url_for('main.opportunities'))
 
-    reader = csv.DictReader(io.StringIO(data))
     created = 0
     errors = []
-    for idx, row in enumerate(reader, start=1):
-        name = (row.get('name') or row.get('Name') or '').strip()
-        account_name = (row.get('account') or row.get('company') or '').strip()
-        if not name or not account_name:
-            errors.append(f'Row {idx}: missing name or account')
+    owners = _owner_ids_by_email()
+    account_ids = _account_id_lookup()
+    for idx, record, error in _validated_import_rows('opportunities', data):
+        if error:
+            errors.append(error)
             continue
-        account = Account.query.filter_by(name=account_name).first()
-        if not account:
+        account_name = record['account']
+        account_id = account_ids(account_name)
+        if account_id is None:
             errors.append(f'Row {idx}: account "{account_name}" not found')
             continue
-        owner = None
-        owner_email = (row.get('owner_email') or row.get('owner') or '').strip()
-        if owner_email:
-            owner = User.query.filter_by(email=owner_email).first()
         try:
-            close_date = None
-            if row.get('close_date'):
-                close_date = datetime.strptime(row.get('close_date'), '%Y-%m-%d')
             opp = Opportunity(
-                name=name,
-                stage=row.get('stage') or 'Prospecting',
-                value=int(row.get('value')) if row.get('value') else None,
-                close_date=close_date,
-                account_id=account.id,
-                owner_id=owner.id if owner else None
+                name=record['name'],
+                stage=record['stage'],
+                value=record['value'],
+                close_date=record['close_date'],
+                account_id=account_id,
+                owner_id=owners.get(record['owner_email'])
             )
             db.session.add(opp)
             db.session.commit()
@@ -889,12 +1071,14 @@ def opportunities_import():
             db.session.rollback()
             errors.append(f'Row {idx}: DB error: {e}')
 
+    count_import_rows('opportunities', created, len(errors))
     _audit_event('import.opportunities', current_user.id if current_user.is_authenticated else None, {'created': created, 'errors': len(errors)})
     return render_template('accounts/import_result.html', created=created, errors=errors, title='Opportunities Import Results')
 
 
 @main.route('/api/dashboard')
 @login_required
+@read_replica
 def api_dashboard():
     """Return JSON summary for dashboard widgets."""
     total_accounts = Account.query.count()
@@ -934,10 +1118,10 @@ def api_dashboard():
 def account_create():
     if request.method == 'POST':
         name = request.form.get('name')
-        if not name:
+        if not normalize_name_key(name):
             flash('Name is required', 'error')
             return render_template('accounts/form.html', title='Create Account')
-        if Account.query.filter_by(name=name).first():
+        if Account.by_name(name):
             flash('An account with this name already exists', 'error')
             return render_template('accounts/form.html', title='Create Account')
 
@@ -960,13 +1144,16 @@ def account_create():
 
 @main.route('/accounts/<int:account_id>')
 @login_required
+@read_replica
 def account_detail(account_id):
     account = db.session.get(Account, account_id)
     if not account:
         abort(404)
     # fetch related contacts and opportunities
     contacts = account.contacts.order_by(Contact.id.desc()).limit(50).all()
-    opportunities = account.opportunities.order_by(Opportunity.close_date.asc()).limit(50).all()
+    # owners in one batched query rather than one lazy load per row in the template
+    opportunities = (account.opportunities.options(selectinload(Opportunity.owner))
+                     .order_by(Opportunity.close_date.asc()).limit(50).all())
     return render_template('accounts/detail.html', account=account, contacts=contacts, opportunities=opportunities, title=account.name)
 
 
@@ -978,10 +1165,16 @@ def account_edit(account_id):
         abort(404)
     if request.method == 'POST':
         name = request.form.get('name')
-        if not name:
-            flash('Name is required', 'error')
-            return render_template('accounts/form.html', account=account, title='Edit Account')
-        account.name = name
+        # an unchanged name is left alone: legacy duplicates keep their " #<id>" key
+        if name != account.name:
+            if not normalize_name_key(name):
+                flash('Name is required', 'error')
+                return render_template('accounts/form.html', account=account, title='Edit Account')
+            existing = Account.by_name(name)
+            if existing and existing.id != account.id:
+                flash('An account with this name already exists', 'error')
+                return render_template('accounts/form.html', account=account, title='Edit Account')
+            account.name = name
         account.industry = request.form.get('industry')
         account.phone = request.form.get('phone')
         account.website = request.form.get('website')
@@ -1005,10 +1198,13 @@ def account_delete(account_id):
     if account.owner_id != current_user.id and current_user.role != 'admin':
         flash('You do not have permission to delete this account', 'error')
         return redirect(url_for('main.accounts'))
-    db.session.delete(account)
-    db.session.commit()
-    _audit_event('account.delete', current_user.id if current_user.is_authenticated else None, {'account_id': account_id})
-    flash('Account deleted successfully', 'success')
+    deleted = delete_account(account_id)
+    _audit_event('account.delete', current_user.id if current_user.is_authenticated else None,
+                 {'account_id': account_id, 'background': not deleted})
+    if deleted:
+        flash('Account deleted successfully', 'success')
+    else:
+        flash('Account deletion started; large accounts take a few moments to disappear', 'success')
     return redirect(url_for('main.accounts'))
 
 @main.route('/contacts/create', methods=['GET', 'POST'])
@@ -0,0 +1,222 @@
+"""Slow-query log.
+
+Statements that take longer than ``SLOW_QUERY_MS`` are appended to
+``instance/slow_queries.jsonl`` (``SLOW_QUERY_LOG`` overrides the path), one
+JSON object per line::
+
+    {"ts": "...", "fingerprint": "3f2a9c0b1d4e", "sql": "SELECT ... WHERE id IN (?, ...)",
+     "params": ["int", "str"], "duration_ms": 412.7, "endpoint": "main.accounts",
+     "plan": ["SCAN account", "USE TEMP B-TREE FOR ORDER BY"]}
+
+Parameter values are never written, only their shape. The statement is
+timed inline; the ``EXPLAIN QUERY PLAN`` and the file write happen on a
+background thread, so a slow request pays only for queueing the record. If
+the queue is full, records are dropped (and counted) rather than blocking.
+``flask slow-queries top`` aggregates the log by fingerprint.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+SORT_KEYS = ('total', 'max', 'count', 'mean')
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and replace literals and placeholder lists so similar statements compare equal."""
+    sql = ' '.join(statement.split())
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _PLACEHOLDER_LIST_RE.sub('(?, ...)', sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def params_shape(parameters, executemany: bool = False):
+    """Type names of the bound parameters (never their values)."""
+    if executemany:
+        rows = list(parameters or ())
+        return {'rows': len(rows), 'row': params_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def explain(engine, statement: str, parameters):
+    """The query plan for ``statement`` as a list of strings, or None if it can't be explained."""
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    if engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif engine.dialect.name in ('postgresql', 'mysql', 'mariadb'):
+        prefix = 'EXPLAIN '
+    else:
+        return None
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    if engine.dialect.name == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parent
+        depth = {0: -1}
+        plan = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            plan.append('  ' * depth[row[0]] + row[3])
+        return plan
+    return [' | '.join(str(v) for v in row) for row in rows]
+
+
+class SlowQueryRecorder:
+    """Queues slow statements and writes them, with their plans, from a background thread."""
+
+    def __init__(self, path: str, explain_plans: bool = True, max_queued: int = 1000):
+        self.path = path
+        self.explain_plans = explain_plans
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, engine, statement, parameters, executemany, seconds, endpoint):
+        normalized = normalize_sql(statement)
+        record = {
+            'ts': datetime.utcnow().isoformat(),
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized,
+            'params': params_shape(parameters, executemany),
+            'duration_ms': round(seconds * 1000, 2),
+            'endpoint': endpoint,
+        }
+        # executemany plans are the same for every row; explain with the first
+        plan_params = (list(parameters)[:1] or [()])[0] if executemany else parameters
+        try:
+            self._queue.put_nowait((engine, statement, plan_params, record))
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            engine, statement, parameters, record = self._queue.get()
+            try:
+                self._write(engine, statement, parameters, record)
+            except Exception:
+                pass  # the log is best effort; never let it take the worker down
+            finally:
+                self._queue.task_done()
+
+    def _write(self, engine, statement, parameters, record):
+        if self.explain_plans:
+            try:
+                record['plan'] = explain(engine, statement, parameters)
+            except Exception as e:
+                record['plan_error'] = str(e)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def join(self):
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+
+def read_log(path: str, since=None):
+    """Yield records from a slow-query log, optionally only those at or after ``since`` (a datetime)."""
+    if not os.path.exists(path):
+        return
+    cutoff = since.isoformat() if since else None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a partially written last line
+            if cutoff is None or record.get('ts', '') >= cutoff:
+                yield record
+
+
+def top_queries(records, by: str = 'total', limit: int = 10) -> list:
+    """Aggregate records by fingerprint, worst first."""
+    if by not in SORT_KEYS:
+        raise ValueError(f'unknown sort key {by!r} (expected one of {", ".join(SORT_KEYS)})')
+    groups = {}
+    for record in records:
+        group = groups.get(record['fingerprint'])
+        if group is None:
+            group = groups[record['fingerprint']] = {
+                'fingerprint': record['fingerprint'], 'sql': record['sql'], 'count': 0,
+                'total': 0.0, 'max': 0.0, 'endpoints': set(), 'plan': None, 'last_seen': None,
+            }
+        duration = record['duration_ms']
+        group['count'] += 1
+        group['total'] += duration
+        group['max'] = max(group['max'], duration)
+        if record.get('endpoint'):
+            group['endpoints'].add(record['endpoint'])
+        if record.get('plan') is not None:
+            group['plan'] = record['plan']
+        group['last_seen'] = max(group['last_seen'] or '', record.get('ts', ''))
+    for group in groups.values():
+        group['mean'] = group['total'] / group['count']
+        group['endpoints'] = sorted(group['endpoints'])
+    return sorted(groups.values(), key=lambda g: g[by], reverse=True)[:limit]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('slow_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def install(engine, app, recorder):
+    """Time every statement on ``engine`` and submit the slow ones to ``recorder``."""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['slow_query_start'].pop()
+        if seconds * 1000 < app.config.get('SLOW_QUERY_MS', 200) or statement.startswith('EXPLAIN'):
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        recorder.submit(engine, statement, parameters, executemany, seconds, endpoint)
+
+
+def log_path(app) -> str:
+    return app.config.get('SLOW_QUERY_LOG') or os.path.join(app.instance_path, 'slow_queries.jsonl')
+
+
+def init_app(app, db):
+    """Record slow statements from every engine of ``db`` (call after ``db.init_app``)."""
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+        return
+    recorder = SlowQueryRecorder(log_path(app), app.config.get('SLOW_QUERY_EXPLAIN', True))
+    app.extensions['slow_queries'] = recorder
+    with app.app_context():
+        for engine in db.engines.values():
+            install(engine, app, recorder)
@@ -0,0 +1,78 @@
+"""Connection profile for SQLite file databases.
+
+With ``SQLITE_PROFILE = 'production'`` (the default) every new SQLite
+connection is set up from a ``connect`` event with:
+
+* ``journal_mode=WAL``: readers no longer block the writer (or vice versa);
+* ``synchronous=NORMAL``: safe with WAL, and commits skip an fsync;
+* ``busy_timeout`` (``SQLITE_BUSY_TIMEOUT`` ms): wait for the write lock
+  instead of failing with "database is locked";
+* ``mmap_size`` / ``cache_size`` (``SQLITE_MMAP_SIZE`` bytes,
+  ``SQLITE_CACHE_SIZE`` pages, or KiB when negative);
+* ``foreign_keys=ON`` and ``temp_store=MEMORY``.
+
+File databases also get a connection pool sized for threaded workers
+(``SQLITE_POOL_SIZE`` + ``SQLITE_POOL_OVERFLOW``) unless the app sets
+``SQLALCHEMY_ENGINE_OPTIONS`` itself. ``SQLITE_PROFILE = 'default'`` leaves
+SQLite's own settings alone.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite_file(uri) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_pragmas(config) -> list:
+    """The ``PRAGMA`` statements for the configured profile, in the order they are run."""
+    if config.get('SQLITE_PROFILE', 'production') != 'production':
+        return []
+    return [
+        # first, so switching to WAL waits for other connections' locks
+        f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}",
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+        f"PRAGMA cache_size = {int(config.get('SQLITE_CACHE_SIZE', -64000))}",
+        'PRAGMA foreign_keys = ON',
+        'PRAGMA temp_store = MEMORY',
+    ]
+
+
+def apply_engine_options(config):
+    """Default pool settings for a SQLite file database (call before ``db.init_app``)."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or not is_sqlite_file(uri) or config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+        return
+    if config.get('SQLITE_PROFILE', 'production') != 'production':
+        return
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(config.get('SQLITE_POOL_SIZE', 10)),
+        'max_overflow': int(config.get('SQLITE_POOL_OVERFLOW', 10)),
+        'pool_timeout': int(config.get('SQLITE_POOL_TIMEOUT', 30)),
+    }
+
+
+def install_pragmas(engine, config):
+    """Run the profile's PRAGMAs on every new DBAPI connection of a SQLite ``engine``."""
+    pragmas = sqlite_pragmas(config)
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_app(app, db):
+    """Attach the profile to every engine of ``db`` (call after ``db.init_app``)."""
+    with app.app_context():
+        for engine in db.engines.values():
+            install_pragmas(engine, app.config)
@@ -0,0 +1,141 @@
+"""API token usage tracking and cleanup.
+
+Successful token authentications are counted in memory by
+``TokenUsageTracker`` and written back in one batched ``UPDATE`` at most every
+``TOKEN_USAGE_FLUSH_INTERVAL`` seconds (after the response that notices the
+interval has passed has been sent, and again at interpreter exit), instead of
+one write per API request.
+
+``sweep_tokens`` deletes revoked and expired tokens in chunks, optionally
+appending them to a JSON-lines archive first; it backs ``flask sweep-tokens``.
+"""
+import atexit
+import json
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, case, or_, select
+
+from . import db
+from .models import Token, bump_data_versions
+
+SWEEP_CHUNK_SIZE = 500
+
+_token = Token.__table__
+
+
+class TokenUsageTracker:
+    """Per-process ``token_id -> (uses, last_used_at)`` counts awaiting a flush."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, token_id: int, when=None):
+        when = when or datetime.utcnow()
+        with self._lock:
+            uses, _ = self._pending.get(token_id, (0, None))
+            self._pending[token_id] = (uses + 1, when)
+
+    def due(self) -> bool:
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.interval
+
+    def flush(self, engine) -> int:
+        """Write pending counts with one executemany UPDATE; returns the number of tokens updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        stmt = _token.update().where(_token.c.id == bindparam('tid')).values(
+            use_count=_token.c.use_count + bindparam('uses'),
+            last_used_at=case(
+                (or_(_token.c.last_used_at.is_(None), _token.c.last_used_at < bindparam('used_at')),
+                 bindparam('used_at')),
+                else_=_token.c.last_used_at,
+            ),
+        )
+        params = [{'tid': tid, 'uses': uses, 'used_at': used_at} for tid, (uses, used_at) in pending.items()]
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt, params)
+        except Exception:
+            # keep the counts for the next flush rather than losing them
+            with self._lock:
+                for tid, (uses, used_at) in pending.items():
+                    newer_uses, newer_at = self._pending.get(tid, (0, used_at))
+                    self._pending[tid] = (uses + newer_uses, max(used_at, newer_at))
+            raise
+        return len(pending)
+
+
+def _flush_at_exit(app_ref):
+    app = app_ref()
+    tracker = app.extensions.get('token_usage') if app is not None else None
+    if tracker is None or not tracker._pending:
+        return
+    try:
+        with app.app_context():
+            tracker.flush(db.engine)
+    except Exception:
+        app.logger.exception('Could not write pending API token usage at exit')
+
+
+def get_usage_tracker() -> TokenUsageTracker:
+    tracker = current_app.extensions.get('token_usage')
+    if tracker is None:
+        tracker = TokenUsageTracker(current_app.config.get('TOKEN_USAGE_FLUSH_INTERVAL', 5))
+        current_app.extensions['token_usage'] = tracker
+        if not current_app.testing:
+            # test apps drop their database before exit; anything else gets a last flush
+            atexit.register(_flush_at_exit, weakref.ref(current_app._get_current_object()))
+    return tracker
+
+
+def record_token_use(token_id: int):
+    get_usage_tracker().record(token_id)
+
+
+def flush_token_usage_after(response):
+    """``after_request`` hook: schedule a flush once the response has been sent, if one is due."""
+    tracker = current_app.extensions.get('token_usage')
+    if tracker is not None and tracker.due():
+        engine = db.engine
+        response.call_on_close(lambda: tracker.flush(engine))
+    return response
+
+
+def _archive_row(row) -> str:
+    record = {}
+    for key, value in row._mapping.items():
+        record[key] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(record)
+
+
+def sweep_tokens(now=None, chunk_size: int = SWEEP_CHUNK_SIZE, archive=None) -> int:
+    """Delete revoked and expired tokens ``chunk_size`` at a time; returns how many were removed.
+
+    When ``archive`` (a text file object) is given, each token's metadata
+    (never its hash) is written to it as a JSON line before the delete.
+    """
+    now = now or datetime.utcnow()
+    doomed = or_(_token.c.revoked.is_(True), _token.c.expires_at < now)
+    columns = [c for c in _token.c if c.name != 'token_hash']
+    removed = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(select(*columns).where(doomed).order_by(_token.c.id).limit(chunk_size)).all()
+            if not rows:
+                break
+            if archive is not None:
+                archive.write(''.join(_archive_row(row) + '\n' for row in rows))
+                archive.flush()
+            conn.execute(_token.delete().where(_token.c.id.in_([row.id for row in rows])))
+            bump_data_versions(conn, ['token'])
+        removed += len(rows)
+    return removed
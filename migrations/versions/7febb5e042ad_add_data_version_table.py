@@ -0,0 +1,39 @@
+"""Add data_version table
+
+Revision ID: 7febb5e042ad
+Revises: 02196377ba5c
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from datetime import datetime
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7febb5e042ad'
+down_revision = '02196377ba5c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_version = op.create_table('data_version',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.String(length=32), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    # Seed fresh tokens so artifacts cached against another copy of the data
+    # can never be mistaken for this database's.
+    now = datetime.utcnow()
+    op.bulk_insert(data_version, [
+        {'table_name': name, 'version': uuid.uuid4().hex, 'updated_at': now}
+        for name in ('user', 'token', 'account', 'contact', 'opportunity')
+    ])
+
+
+def downgrade():
+    op.drop_table('data_version')
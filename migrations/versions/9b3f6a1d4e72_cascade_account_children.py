@@ -0,0 +1,50 @@
+"""Cascade account deletes to contacts and opportunities
+
+Revision ID: 9b3f6a1d4e72
+Revises: 5d8e2b7c9a13
+Create Date: 2026-10-19 18:04:12.552190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f6a1d4e72'
+down_revision = '5d8e2b7c9a13'
+branch_labels = None
+depends_on = None
+
+# SQLite reports the original foreign keys without a name; batch mode gives
+# them this one so they can be dropped and recreated
+naming_convention = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _account_fk_name(table):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk['referred_table'] == 'account' and fk['constrained_columns'] == ['account_id']:
+            return fk['name'] or f'fk_{table}_account_id_account'
+    return None
+
+
+def _replace_account_fk(table, ondelete):
+    name = _account_fk_name(table)
+    with op.batch_alter_table(table, schema=None, naming_convention=naming_convention) as batch_op:
+        if name:
+            batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(f'fk_{table}_account_id_account', 'account', ['account_id'], ['id'],
+                                    ondelete=ondelete)
+        if ondelete:
+            batch_op.create_index(batch_op.f(f'ix_{table}_account_id'), ['account_id'], unique=False)
+        else:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_account_id'))
+
+
+def upgrade():
+    _replace_account_fk('contact', 'CASCADE')
+    _replace_account_fk('opportunity', 'CASCADE')
+
+
+def downgrade():
+    _replace_account_fk('opportunity', None)
+    _replace_account_fk('contact', None)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Compare per-record POST /api/contacts against POST /api/contacts/bulk on a
+throwaway SQLite database.
+
+Usage:
+    python scripts/bench_api_bulk.py --records 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Account, User
+
+
+def make_app(db_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'bench-key',
+        'RATELIMIT_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(email='bench@test.com', first_name='Bench', last_name='User', role='admin')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.add(Account(name='Bench Co'))
+        db.session.commit()
+        account_id = Account.query.filter_by(name='Bench Co').first().id
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@test.com', 'password': 'password123'})
+    return client, account_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client, account_id = make_app(os.path.join(tmp, 'single.db'))
+        records = [{'first_name': f'Contact {i}', 'email': f'c{i}@example.com', 'account_id': account_id}
+                   for i in range(args.records)]
+        start = time.perf_counter()
+        for rec in records:
+            assert client.post('/api/contacts', json=rec).status_code == 201
+        single = time.perf_counter() - start
+
+        client, account_id = make_app(os.path.join(tmp, 'bulk.db'))
+        body = '\n'.join(json.dumps(dict(rec, account_id=account_id)) for rec in records)
+        start = time.perf_counter()
+        resp = client.post('/api/contacts/bulk', data=body, content_type='application/x-ndjson')
+        bulk = time.perf_counter() - start
+        assert resp.get_json()['created'] == args.records
+
+    print(f'per-record: {single:6.2f}s  {args.records / single:>9,.0f} records/s')
+    print(f'bulk:       {bulk:6.2f}s  {args.records / bulk:>9,.0f} records/s  ({single / bulk:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark CSV import validation (app.importer.validate_rows) inline vs. in a
+process pool, on a generated opportunities file.
+
+Usage:
+    python scripts/bench_import_validation.py --rows 500000 --workers 4
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.importer import validate_rows
+
+
+def generate_csv(rows: int) -> str:
+    rnd = random.Random(42)
+    stages = ['Prospecting', 'Proposal', 'Negotiation', 'Closed-Won', 'Closed-Lost']
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['name', 'account', 'stage', 'value', 'close_date', 'owner_email'])
+    for i in range(rows):
+        writer.writerow([
+            f'  Deal {i} ',
+            f'Account {rnd.randint(1, 5000)}',
+            rnd.choice(stages),
+            str(rnd.randint(1000, 5_000_000)),
+            f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}',
+            f' Rep{rnd.randint(1, 40)}@RoshTech.com ',
+        ])
+    return out.getvalue()
+
+
+def run(data: str, workers: int, chunk_size: int):
+    reader = csv.DictReader(io.StringIO(data))
+    start = time.perf_counter()
+    ok = errors = 0
+    for _, record, error in validate_rows('opportunities', reader, workers=workers, chunk_size=chunk_size):
+        if error:
+            errors += 1
+        else:
+            ok += 1
+    return time.perf_counter() - start, ok, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    data = generate_csv(args.rows)
+    print(f'Generated {args.rows} rows ({len(data) / 1e6:.1f} MB) in {time.perf_counter() - t0:.1f}s')
+
+    for workers in sorted({0, args.workers}):
+        elapsed, ok, errors = run(data, workers, args.chunk_size)
+        label = 'inline' if workers < 2 else f'{workers} workers'
+        print(f'{label:>12}: {elapsed:6.2f}s  {args.rows / elapsed:>10,.0f} rows/s  (ok={ok}, errors={errors})')
+
+
+if __name__ == '__main__':
+    main()
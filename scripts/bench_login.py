@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Measure login throughput at several PBKDF2 iteration counts, and how long a
+cheap authenticated request takes while logins are in progress.
+
+Each round creates a throwaway SQLite database whose users are hashed with the
+round's cost, then runs --threads concurrent clients posting to /login.
+
+Usage:
+    python scripts/bench_login.py --costs 60000,260000,600000 --workers 1 --threads 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import User
+
+
+def make_app(db_path, iterations, workers, users):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'bench-key',
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_ITERATIONS': iterations,
+        'PASSWORD_HASH_WORKERS': workers,
+        'PASSWORD_HASH_QUEUE': 1000,
+    })
+    with app.app_context():
+        db.create_all()
+        for i in range(users):
+            user = User(email=f'user{i}@test.com', first_name='Bench', last_name=str(i), role='user')
+            user.set_password('password123')
+            db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def run_round(app, threads, logins_per_thread):
+    probe = app.test_client()
+    probe.post('/login', data={'email': 'user0@test.com', 'password': 'password123'})
+    probe_times = []
+    done = threading.Event()
+
+    def login_worker(n):
+        client = app.test_client()
+        for _ in range(logins_per_thread):
+            resp = client.post('/login', data={'email': f'user{n}@test.com', 'password': 'password123'})
+            assert resp.status_code == 302, resp.status_code
+
+    def probe_worker():
+        while not done.is_set():
+            start = time.perf_counter()
+            probe.get('/api/auth/me')
+            probe_times.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    workers = [threading.Thread(target=login_worker, args=(i,)) for i in range(threads)]
+    prober = threading.Thread(target=probe_worker)
+    start = time.perf_counter()
+    prober.start()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+    probe_times.sort()
+    p95 = probe_times[int(len(probe_times) * 0.95) - 1] if probe_times else 0.0
+    return threads * logins_per_thread / elapsed, p95
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--costs', default='60000,260000,600000', help='comma-separated PBKDF2 iteration counts')
+    parser.add_argument('--workers', default='0,1', help='comma-separated PASSWORD_HASH_WORKERS values to compare')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent login clients')
+    parser.add_argument('--logins', type=int, default=5, help='logins per client')
+    args = parser.parse_args()
+
+    print(f'{"iterations":>10} {"workers":>7} {"logins/s":>9} {"p95 /api/auth/me":>17}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for cost in (int(c) for c in args.costs.split(',')):
+            for workers in (int(w) for w in args.workers.split(',')):
+                app = make_app(os.path.join(tmp, f'{cost}-{workers}.db'), cost, workers, args.threads)
+                rate, p95 = run_round(app, args.threads, args.logins)
+                print(f'{cost:>10} {workers:>7} {rate:>9.1f} {p95 * 1000:>15.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
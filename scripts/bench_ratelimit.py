@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Measure rate limiter overhead in microseconds: the cost of one limiter hit
+for each strategy and store, and the end-to-end difference it makes to a
+cheap request through the Flask test client.
+
+Usage:
+    python scripts/bench_ratelimit.py --hits 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.ratelimit import STRATEGIES, limiter, parse_limits
+
+
+def make_app(tmp, **config):
+    return create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+        'SECRET_KEY': 'bench-key',
+    }, **config))
+
+
+def time_hits(app, strategy, hits):
+    limits = parse_limits('1000000/hour')
+    with app.app_context():
+        limiter.hit('warmup', limits, strategy)
+        start = time.perf_counter()
+        for i in range(hits):
+            limiter.hit(f'client{i % 100}', limits, strategy)
+        return (time.perf_counter() - start) / hits * 1e6
+
+
+def time_requests(app, requests):
+    client = app.test_client()
+    client.get('/api/auth/me')
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/auth/me')
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {'memory': 'memory://', 'sqlite': f'sqlite:///{os.path.join(tmp, "ratelimit.db")}'}
+        print(f'{"store":>7} {"strategy":>15} {"us/hit":>8}')
+        for store_name, url in stores.items():
+            app = make_app(tmp, RATELIMIT_STORAGE_URL=url)
+            for strategy in STRATEGIES:
+                print(f'{store_name:>7} {strategy:>15} {time_hits(app, strategy, args.hits):>8.1f}')
+
+        print()
+        print(f'{"limiter":>24} {"us/request":>10}')
+        disabled = time_requests(make_app(tmp, RATELIMIT_ENABLED=False), args.requests)
+        print(f'{"disabled":>24} {disabled:>10.1f}')
+        for store_name, url in stores.items():
+            app = make_app(tmp, RATELIMIT_STORAGE_URL=url, RATELIMIT_DEFAULT='1000000/hour')
+            took = time_requests(app, args.requests)
+            print(f'{store_name + " fixed-window":>24} {took:>10.1f}  (+{took - disabled:.1f})')
+
+
+if __name__ == '__main__':
+    main()
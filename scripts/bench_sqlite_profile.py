@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Compare read/write concurrency on a SQLite file with SQLite's default
+settings (SQLITE_PROFILE=default) and with the production profile (WAL,
+synchronous=NORMAL, busy_timeout, mmap, pooled connections).
+
+Reader threads run the accounts list query while writer threads insert
+contacts, each write in its own transaction, for a fixed duration.
+
+Usage:
+    python scripts/bench_sqlite_profile.py --readers 4 --writers 2 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.models import Account, User
+
+READ_SQL = text(
+    'SELECT account.id, account.name, user.email FROM account '
+    'LEFT OUTER JOIN user ON account.owner_id = user.id ORDER BY account.name LIMIT 50 OFFSET :offset'
+)
+WRITE_SQL = text(
+    "INSERT INTO contact (first_name, last_name, email, account_id) VALUES ('Bench', :n, :email, :account_id)"
+)
+
+
+def make_app(db_path, profile, accounts):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SECRET_KEY': 'bench-key',
+        'RATELIMIT_ENABLED': False,
+        'SQLITE_PROFILE': profile,
+    })
+    with app.app_context():
+        db.create_all()
+        owner = User(email='bench@test.com', first_name='Bench', last_name='User', role='admin', password_hash='x')
+        db.session.add(owner)
+        db.session.flush()
+        db.session.add_all(Account(name=f'Account {i:05d}', owner_id=owner.id) for i in range(accounts))
+        db.session.commit()
+    return app
+
+
+def run(app, readers, writers, seconds):
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        with app.app_context():
+            offset = 0
+            while time.monotonic() < stop:
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(READ_SQL, {'offset': offset}).all()
+                    count('reads')
+                except OperationalError:
+                    count('locked')
+                offset = (offset + 50) % 1000
+
+    def writer(w):
+        with app.app_context():
+            n = 0
+            while time.monotonic() < stop:
+                n += 1
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(WRITE_SQL, {'n': f'{w}-{n}', 'email': f'{w}-{n}@example.com', 'account_id': 1})
+                    count('writes')
+                except OperationalError:
+                    count('locked')
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        db.engine.dispose()
+    return {key: value / seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--accounts', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f'{"profile":>10} {"reads/s":>9} {"writes/s":>9} {"locked/s":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ('default', 'production'):
+            app = make_app(os.path.join(tmp, f'{profile}.db'), profile, args.accounts)
+            result = run(app, args.readers, args.writers, args.seconds)
+            print(f'{profile:>10} {result["reads"]:>9.0f} {result["writes"]:>9.0f} {result["locked"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,10 @@
 """
 Create or update the admin user directly in the project's SQLite DB.
 
-This script uses only the Python standard library to compute a PBKDF2-HMAC-SHA256
-password hash in the same format Werkzeug uses (pbkdf2:sha256:iterations$salt$hash).
+This script uses only the Python standard library. Password hashes are produced
+by app/passwords.py (loaded directly from its file, without importing the Flask
+app) so they follow the same PASSWORD_HASH_METHOD / PASSWORD_HASH_ITERATIONS
+policy as the app.
 
 Run from the project root like:
     python scripts/create_admin_sqlite.py --email admin@test.com --password password123
@@ -13,27 +15,25 @@ This avoids needing to install Flask/Werkzeug when pip access is not available.
 import os
 import sqlite3
 import argparse
-import secrets
-import hashlib
+import importlib.util
 
 
-def generate_pbkdf2_sha256_hash(password: str, iterations: int = 260000, salt_len: int = 8) -> str:
-    """Return a Werkzeug-compatible PBKDF2-SHA256 hash string.
+def _load_passwords_module():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'passwords.py')
+    spec = importlib.util.spec_from_file_location('crm_passwords', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
-    Format: pbkdf2:sha256:<iterations>$<salt>$<hex>
-    """
-    # generate a salt (hex string)
-    salt = secrets.token_hex(salt_len)
-    dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations)
-    hex_hash = dk.hex()
-    return f"pbkdf2:sha256:{iterations}${salt}${hex_hash}"
+
+passwords = _load_passwords_module()
 
 
 def ensure_admin(db_path: str, email: str, password: str, first_name: str = 'Test', last_name: str = 'Admin'):
     if not os.path.exists(db_path):
         raise FileNotFoundError(f"Database file not found: {db_path}")
 
-    pwd_hash = generate_pbkdf2_sha256_hash(password)
+    pwd_hash = passwords.PasswordHasher.from_env().hash(password)
 
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
@@ -5,7 +5,7 @@ from app import create_app, db
 from app.models import User
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     """Create and configure a new app instance for each test."""
     # Create a temporary file to isolate the database for each test
     db_fd, db_path = tempfile.mkstemp()
@@ -14,7 +14,13 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'WTF_CSRF_ENABLED': False,
-        'SECRET_KEY': 'test-key'
+        'SECRET_KEY': 'test-key',
+        # keep metrics, cached exports, profiles and the auth cache stamp out
+        # of the real instance folder
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+        'EXPORT_CACHE_DIR': str(tmp_path / 'exports'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'AUTH_CACHE_STAMP': str(tmp_path / 'auth_cache.stamp'),
     })
     
     # Create the database and load test data
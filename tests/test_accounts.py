@@ -38,3 +38,126 @@ def test_import_accounts_csv(client, auth):
     # Ensure imported company appears in list
     res2 = client.get('/accounts')
     assert b'ImportCo' in res2.data
+
+
+def _account_with_children(app, contacts=3, opportunities=2):
+    from app import db
+    from app.models import Account, Contact, Opportunity
+    with app.app_context():
+        acc = Account(name='Big Customer')
+        db.session.add(acc)
+        db.session.flush()
+        db.session.add_all([Contact(first_name=f'C{i}', account_id=acc.id) for i in range(contacts)])
+        db.session.add_all([Opportunity(name=f'O{i}', account_id=acc.id) for i in range(opportunities)])
+        db.session.commit()
+        return acc.id
+
+
+def _remaining(app, account_id):
+    from app import db
+    from app.models import Account, Contact, Opportunity
+    with app.app_context():
+        return (db.session.get(Account, account_id) is not None,
+                Contact.query.filter_by(account_id=account_id).count(),
+                Opportunity.query.filter_by(account_id=account_id).count())
+
+
+def test_delete_account_cascades_in_the_database(app, client, auth):
+    from sqlalchemy import event
+    from app import db
+    account_id = _account_with_children(app)
+    auth.login()
+    deletes = []
+    with app.app_context():
+        listener = lambda conn, cursor, statement, *args: deletes.append(statement) if statement.startswith('DELETE') else None
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            resp = client.delete(f'/api/accounts/{account_id}')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    assert resp.status_code == 200
+    # children go through ON DELETE CASCADE; nothing is loaded or deleted row by row
+    assert deletes == ['DELETE FROM account WHERE account.id = ?']
+    assert _remaining(app, account_id) == (False, 0, 0)
+
+
+def test_large_account_is_purged_in_the_background(app, client, auth):
+    from app.purge import get_purger
+    app.config.update(ACCOUNT_PURGE_THRESHOLD=4, ACCOUNT_PURGE_CHUNK_SIZE=2)
+    account_id = _account_with_children(app, contacts=7, opportunities=3)
+    auth.login()
+    resp = client.delete(f'/api/accounts/{account_id}')
+    assert resp.status_code == 202
+    with app.app_context():
+        get_purger().join()
+    assert _remaining(app, account_id) == (False, 0, 0)
+
+
+
+def test_interrupted_purge_is_resumed_from_the_cli(app, client, auth, runner, monkeypatch):
+    from app.purge import AccountPurger
+    app.config.update(ACCOUNT_PURGE_THRESHOLD=4, ACCOUNT_PURGE_CHUNK_SIZE=2)
+    account_id = _account_with_children(app, contacts=7, opportunities=3)
+    # the process accepting the request dies before its queue runs
+    monkeypatch.setattr(AccountPurger, 'submit', lambda self, account_id: None)
+    auth.login()
+    assert client.delete(f'/api/accounts/{account_id}').status_code == 202
+    # another request (or worker) sees the scheduled purge instead of deleting inline
+    app.config['ACCOUNT_PURGE_THRESHOLD'] = 5000
+    assert client.delete(f'/api/accounts/{account_id}').status_code == 202
+    assert _remaining(app, account_id) == (True, 7, 3)
+
+    result = runner.invoke(args=['purge-accounts'])
+    assert 'Purged 1 accounts' in result.output
+    assert _remaining(app, account_id) == (False, 0, 0)
+
+def test_account_names_are_unique_ignoring_case_and_punctuation(app, client, auth):
+    from app.models import Account
+    auth.login()
+    assert client.post('/api/accounts', json={'name': 'RoshTech Logistics'}).status_code == 201
+    assert client.post('/api/accounts', json={'name': 'roshtech  logistics.'}).status_code == 409
+    other = client.post('/api/accounts', json={'name': 'Other Co'}).get_json()['id']
+    assert client.put(f'/api/accounts/{other}', json={'name': 'ROSHTECH LOGISTICS'}).status_code == 409
+
+    resp = client.post('/api/accounts/bulk', json=[{'name': 'Fresh Co'}, {'name': 'fresh co '},
+                                                  {'name': 'Roshtech-Logistics'}])
+    assert [r.get('error') for r in resp.get_json()['results']] == [
+        None, 'Duplicate account name in request', 'Account already exists']
+    with app.app_context():
+        assert Account.by_name(' FRESH CO').name == 'Fresh Co'
+
+
+def test_punctuation_only_names_are_rejected(client, auth):
+    from app.importer import normalize_account_row
+    import pytest
+    auth.login()
+    assert client.post('/api/accounts', json={'name': '!!!'}).status_code == 400
+    assert client.post('/api/accounts', json={'name': '...'}).status_code == 400
+    acc = client.post('/api/accounts', json={'name': 'Real Co'}).get_json()['id']
+    assert client.put(f'/api/accounts/{acc}', json={'name': '-- '}).status_code == 400
+    with pytest.raises(ValueError):
+        normalize_account_row({'name': '?!'})
+
+
+def test_legacy_duplicate_accounts_stay_editable(app, client, auth):
+    from app import db
+    from app.models import Account
+    with app.app_context():
+        first, second = Account(name='Dup Co'), Account(name='Other Co')
+        db.session.add_all([first, second])
+        db.session.commit()
+        # what the name_key migration leaves for a pre-existing duplicate
+        db.session.execute(Account.__table__.update().where(Account.__table__.c.id == second.id)
+                           .values(name='DUP CO', name_key=f'dupco #{second.id}'))
+        db.session.commit()
+        dup_id = second.id
+    auth.login()
+    resp = client.put(f'/api/accounts/{dup_id}', json={'name': 'DUP CO', 'industry': 'Retail'})
+    assert resp.status_code == 200
+    resp = client.post(f'/accounts/{dup_id}/edit', data={'name': 'DUP CO', 'website': 'dup.example'})
+    assert resp.status_code == 302
+    with app.app_context():
+        acc = db.session.get(Account, dup_id)
+        assert (acc.industry, acc.website, acc.name_key) == (None, 'dup.example', f'dupco #{dup_id}')
+    # a real rename onto the oldest account's name is still refused
+    assert client.put(f'/api/accounts/{dup_id}', json={'name': 'dup co'}).status_code == 409
@@ -1,5 +1,5 @@
 import secrets
-from app.models import Token, User, Account, Opportunity
+from app.models import Token, User, Account, Contact, Opportunity
 
 def test_api_accounts_public(client, app):
     # Create an account in test DB
@@ -37,12 +37,81 @@ def test_token_auth_for_opportunities(client, app):
         db.session.add(t)
         db.session.commit()
 
-    # call API with token in query param
+    # tokens in the query string would end up in access logs: not accepted
     resp = client.get(f'/api/opportunities?token={token_value}')
-    assert resp.status_code == 200
-    data = resp.get_json()
-    assert 'items' in data
+    assert resp.status_code == 401
 
     # call API with Authorization header
     resp2 = client.get('/api/opportunities', headers={'Authorization': f'Bearer {token_value}'})
     assert resp2.status_code == 200
+    assert 'items' in resp2.get_json()
+
+
+def test_bulk_create_accounts(client, auth, app):
+    auth.login()
+    with app.app_context():
+        from app import db
+        db.session.add(Account(name='Existing Co'))
+        db.session.commit()
+
+    resp = client.post('/api/accounts/bulk', json=[
+        {'name': 'Bulk One', 'industry': 'Logistics'},
+        {'name': ''},
+        {'name': 'Existing Co'},
+        {'name': 'Bulk One'},
+        {'name': 'Bulk Two'},
+    ])
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['created'] == 2
+    assert data['failed'] == 3
+    results = data['results']
+    assert [r['index'] for r in results] == [0, 1, 2, 3, 4]
+    assert 'id' in results[0] and 'id' in results[4]
+    assert results[1]['error'] == 'Account name required'
+    assert results[2]['error'] == 'Account already exists'
+    assert results[3]['error'] == 'Duplicate account name in request'
+
+
+def test_bulk_db_error_fails_only_the_offending_item(client, auth, app, monkeypatch):
+    from app import api
+    auth.login()
+    with app.app_context():
+        from app import db
+        db.session.add(Account(name='Taken Co'))
+        db.session.commit()
+    # let the duplicate slip past the pre-check so the unique index rejects it
+    monkeypatch.setattr(api, '_existing_values', lambda column, values: set())
+
+    resp = client.post('/api/accounts/bulk', json=[{'name': 'Chunk A'}, {'name': 'Taken Co'}, {'name': 'Chunk B'}])
+    data = resp.get_json()
+    assert data['created'] == 2
+    assert 'id' in data['results'][0] and 'id' in data['results'][2]
+    assert data['results'][1] == {'index': 1, 'error': 'Could not be saved'}
+    with app.app_context():
+        assert Account.query.filter(Account.name.in_(['Chunk A', 'Chunk B'])).count() == 2
+
+
+def test_bulk_create_contacts_ndjson(client, auth, app):
+    auth.login()
+    with app.app_context():
+        from app import db
+        acc = Account(name='NDJSON Co')
+        db.session.add(acc)
+        db.session.commit()
+        account_id = acc.id
+
+    body = '\n'.join([
+        '{"first_name": "Thabo", "account_id": %d, "email": " Thabo@Example.com "}' % account_id,
+        '{"first_name": "Lerato", "account_id": 9999}',
+        '',
+        '{"first_name": "Sipho", "account_id": %d}' % account_id,
+    ])
+    resp = client.post('/api/contacts/bulk', data=body, content_type='application/x-ndjson')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['created'] == 2
+    assert data['results'][1] == {'index': 1, 'error': 'Account not found'}
+    with app.app_context():
+        contact = Contact.query.filter_by(first_name='Thabo').first()
+        assert contact.email == 'thabo@example.com'
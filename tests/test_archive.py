@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.archive import archive_opportunities
+from app.models import Account, Opportunity, OpportunityArchive
+
+
+@pytest.fixture
+def deals(app):
+    old = datetime.utcnow() - timedelta(days=400)
+    with app.app_context():
+        acc = Account(name='Archive Co')
+        db.session.add(acc)
+        db.session.flush()
+        db.session.add_all([
+            Opportunity(name='Old Won', stage='Closed-Won', value=100, close_date=old, account_id=acc.id, owner_id=1),
+            Opportunity(name='Old Lost', stage='Closed-Lost', value=50, close_date=old, account_id=acc.id, owner_id=1),
+            Opportunity(name='Old Open', stage='Proposal', value=10, close_date=old, account_id=acc.id, owner_id=1),
+            Opportunity(name='New Won', stage='Closed-Won', value=1, close_date=datetime.utcnow(),
+                        account_id=acc.id, owner_id=1),
+        ])
+        db.session.commit()
+        return acc.id
+
+
+def test_closed_deals_move_in_chunks(app, deals):
+    with app.app_context():
+        moved = archive_opportunities(datetime.utcnow() - timedelta(days=180), chunk_size=1)
+        assert moved == 2
+        assert sorted(o.name for o in Opportunity.query) == ['New Won', 'Old Open']
+        archived = OpportunityArchive.query.order_by(OpportunityArchive.id).all()
+        assert [(o.name, o.value, o.account_id) for o in archived] == [('Old Won', 100, deals), ('Old Lost', 50, deals)]
+        assert all(o.archived_at for o in archived)
+        # archived ids are not reused by new rows
+        new = Opportunity(name='Fresh', account_id=deals)
+        db.session.add(new)
+        db.session.commit()
+        assert new.id not in {o.id for o in archived}
+
+
+def test_include_archived_unions_both_tables(app, client, auth, deals):
+    auth.login()
+    result = app.test_cli_runner().invoke(args=['archive-opportunities', '--older-than', '180'])
+    assert 'Archived 2 opportunities' in result.output
+
+    hot = client.get('/api/opportunities').get_json()
+    assert hot['total'] == 2
+    both = client.get('/api/opportunities?include_archived=1&per_page=3').get_json()
+    assert both['total'] == 4 and both['pages'] == 2
+    page2 = client.get('/api/opportunities?include_archived=1&per_page=3&page=2').get_json()
+    names = {i['name']: i['archived'] for i in both['items'] + page2['items']}
+    assert names == {'Old Won': True, 'Old Lost': True, 'Old Open': False, 'New Won': False}
+    assert client.get('/api/opportunities?include_archived=1&q=Lost').get_json()['total'] == 1
+
+    assert client.get('/api/dashboard/stats').get_json()['opportunities'] == 2
+    stats = client.get('/api/dashboard/stats?include_archived=1').get_json()
+    assert stats['opportunities'] == 4 and stats['total_opportunity_value'] == 161
+
+
+def test_deleting_the_owner_of_an_archived_deal(app, client, auth, deals):
+    from app.models import User
+    with app.app_context():
+        rep = User(email='rep@test.com', first_name='Rep', last_name='One', role='sales')
+        rep.set_password('password123')
+        db.session.add(rep)
+        db.session.flush()
+        Opportunity.query.filter_by(name='Old Won').one().owner_id = rep.id
+        db.session.commit()
+        rep_id = rep.id
+        assert archive_opportunities(datetime.utcnow() - timedelta(days=180)) == 2
+    auth.login()
+    resp = client.post(f'/users/{rep_id}/delete', headers={'X-Requested-With': 'XMLHttpRequest'})
+    assert resp.status_code == 200
+    with app.app_context():
+        assert OpportunityArchive.query.filter_by(name='Old Won').one().owner_id is None
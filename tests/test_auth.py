@@ -61,4 +61,42 @@ def test_admin_routes_require_admin(client, auth, app):
     auth.login('admin@test.com', 'password123')
     for route in admin_routes:
         response = client.get(route)
-        assert response.status_code == 200
\ No newline at end of file
+        assert response.status_code == 200
+
+def test_user_loader_is_cached_until_user_changes(client, app):
+    """Authenticated requests reuse the cached identity; edits take effect at once."""
+    import secrets
+    from sqlalchemy import event
+    from app.models import Token
+
+    value = secrets.token_urlsafe(48)
+    with app.app_context():
+        user = User(email='cached@test.com', first_name='Cached', last_name='User', role='user')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        token = Token(user_id=user.id)
+        token.set_token(value)
+        db.session.add(token)
+        db.session.commit()
+        user_id = user.id
+        engine = db.engine
+    headers = {'Authorization': f'Bearer {value}'}
+    assert client.get('/api/auth/me', headers=headers).get_json()['role'] == 'user'
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(5):
+            assert client.get('/api/auth/me', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert not any('FROM user' in s for s in statements)
+
+    admin = app.test_client()
+    admin.post('/login', data={'email': 'admin@test.com', 'password': 'password123'})
+    resp = admin.post(f'/users/{user_id}/edit', headers={'X-Requested-With': 'XMLHttpRequest'},
+                      data={'email': 'cached@test.com', 'first_name': 'Cached', 'last_name': 'User', 'role': 'admin'})
+    assert resp.status_code == 200
+    assert client.get('/api/auth/me', headers=headers).get_json()['role'] == 'admin'
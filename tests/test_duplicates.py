@@ -0,0 +1,76 @@
+from app import db
+from app.duplicates import find_duplicate_contacts, soundex
+from app.models import Account, Contact, ContactDuplicate
+
+
+def _contacts(app):
+    with app.app_context():
+        a, b = Account(name='Dupe A'), Account(name='Dupe B')
+        db.session.add_all([a, b])
+        db.session.flush()
+        rows = [
+            ('Jon', 'Smith', 'jon@example.com', '+27 11 555 0100', a.id),
+            ('John', 'Smith', None, '011 555 0100', a.id),          # same phone and account, similar name
+            ('Jonathan', 'Smyth', ' JON@example.com', None, b.id),   # same email elsewhere
+            ('Mary', 'Jones', 'mary@example.com', None, a.id),
+        ] + [('Shared', f'Inbox {i}', 'info@example.com', None, b.id) for i in range(4)]
+        contacts = [Contact(first_name=f, last_name=l, email=e, phone_number=p, account_id=acc)
+                    for f, l, e, p, acc in rows]
+        db.session.add_all(contacts)
+        db.session.commit()
+        return [c.id for c in contacts], a.id
+
+
+def test_soundex():
+    assert soundex('Robert') == soundex('Rupert') == 'R163'
+    assert soundex('Smith') == soundex('Smyth') and soundex('') == ''
+
+
+def test_only_blocked_pairs_are_scored(app):
+    ids, _ = _contacts(app)
+    with app.app_context():
+        found = find_duplicate_contacts(max_bucket=3)
+        pairs = {(s.contact_id, s.duplicate_id): s.reasons.split(',') for s in ContactDuplicate.query}
+    # the four shared-inbox contacts overflow their bucket and are never compared
+    assert found['candidates'] == 2
+    assert set(pairs) == {(ids[0], ids[1]), (ids[0], ids[2])}
+    assert pairs[(ids[0], ids[1])] == ['phone', 'name', 'account']
+
+
+def test_admin_merges_and_dismisses(app, client, auth):
+    ids, account_id = _contacts(app)
+    with app.app_context():
+        find_duplicate_contacts(max_bucket=3)
+    auth.login()
+    items = client.get('/admin/duplicates').get_json()['items']
+    by_pair = {(i['contact']['id'], i['duplicate']['id']): i['id'] for i in items}
+
+    assert client.post('/admin/duplicates/merge', json={'ids': [by_pair[(ids[0], ids[1])]]}).get_json() == {'merged': 1}
+    assert client.post('/admin/duplicates/dismiss', json={'ids': [by_pair[(ids[0], ids[2])]]}).get_json() == {'dismissed': 1}
+    with app.app_context():
+        assert db.session.get(Contact, ids[1]) is None
+        assert db.session.get(Account, account_id).contact_count == 2
+        # a dismissed pair is not suggested again
+        assert find_duplicate_contacts(max_bucket=3)['suggested'] == 0
+    assert client.get('/admin/duplicates').get_json()['total'] == 0
+
+
+def test_malformed_selection_is_a_400(client, auth):
+    auth.login()
+    for body in ([1, 2], {'ids': '12'}, {'ids': ['x']}):
+        assert client.post('/admin/duplicates/merge', json=body).status_code == 400
+
+
+def test_purging_an_account_without_foreign_keys_drops_its_suggestions(app):
+    from app.purge import delete_account_rows
+    ids, account_id = _contacts(app)
+    with app.app_context():
+        find_duplicate_contacts(max_bucket=3)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            try:
+                delete_account_rows(conn, account_id)
+                conn.commit()
+            finally:
+                conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+        assert ContactDuplicate.query.count() == 0
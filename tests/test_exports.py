@@ -0,0 +1,178 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.exports import iter_csv
+from app.models import Account, Contact, Opportunity, User
+
+
+def test_iter_csv_emits_chunks():
+    counts = []
+    chunks = list(iter_csv(['id', 'name'], ([i, f'row {i}'] for i in range(5)), chunk_rows=2, on_complete=counts.append))
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert rows[0] == ['id', 'name']
+    assert rows[-1] == ['4', 'row 4']
+    assert counts == [5]
+
+
+def test_contacts_export_streams_csv(client, auth, app):
+    with app.app_context():
+        acc = Account(name='Export Co')
+        db.session.add(acc)
+        db.session.commit()
+        for i in range(3):
+            db.session.add(Contact(first_name=f'Person{i}', last_name='Test', account_id=acc.id))
+        db.session.commit()
+
+    auth.login()
+    resp = client.get('/contacts/export')
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=contacts.csv'
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0] == ['id', 'first_name', 'last_name', 'email', 'phone', 'company']
+    assert [r[1] for r in rows[1:]] == ['Person2', 'Person1', 'Person0']
+    assert all(r[5] == 'Export Co' for r in rows[1:])
+
+
+def _seed_opportunities(app, n, offset=0):
+    with app.app_context():
+        for i in range(offset, offset + n):
+            owner = User(email=f'rep{i}@test.com', first_name='Rep', last_name=str(i))
+            owner.set_password('x')
+            acc = Account(name=f'Account {i}', owner=owner)
+            db.session.add_all([owner, acc])
+            db.session.flush()
+            db.session.add(Opportunity(name=f'Deal {i}', account_id=acc.id, owner_id=owner.id, value=i))
+        db.session.commit()
+
+
+def _count_export_queries(app, client, url):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        resp = client.get(url)
+        body = resp.get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert resp.status_code == 200
+    return len(statements), body
+
+
+def test_export_query_count_is_constant(client, auth, app):
+    auth.login()
+    _seed_opportunities(app, 2)
+    client.get('/api/auth/me')  # load the session user into the cache first
+    small = {url: _count_export_queries(app, client, url)
+             for url in ('/opportunities/export', '/accounts/export', '/contacts/export')}
+
+    _seed_opportunities(app, 25, offset=2)
+    for url, (small_count, _) in small.items():
+        large_count, body = _count_export_queries(app, client, url)
+        assert large_count == small_count, url
+
+    rows = list(csv.reader(io.StringIO(_count_export_queries(app, client, '/opportunities/export')[1])))
+    assert len(rows) == 28
+    assert rows[1][2] == 'Account 0' and rows[1][6] == 'Rep 0'
+
+
+def test_export_cache_serves_file_with_etag(client, auth, app, tmp_path):
+    app.config['EXPORT_CACHE_DIR'] = str(tmp_path)
+    _seed_opportunities(app, 3)
+    auth.login()
+
+    first = client.get('/accounts/export')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert len(list(tmp_path.glob('accounts-all-*.csv'))) == 1
+
+    assert client.get('/accounts/export', headers={'If-None-Match': etag}).status_code == 304
+    partial = client.get('/accounts/export', headers={'Range': 'bytes=0-1'})
+    assert partial.status_code == 206
+    assert partial.data == b'id'
+
+    # A change to the accounts table produces a new artifact and evicts the old one
+    with app.app_context():
+        db.session.add(Account(name='Fresh Co'))
+        db.session.commit()
+    second = client.get('/accounts/export')
+    assert second.headers['ETag'] != etag
+    assert b'Fresh Co' in second.data
+    assert len(list(tmp_path.glob('accounts-all-*.csv'))) == 1
+
+
+
+def test_only_exported_tables_are_versioned(app):
+    from app.exports import EXPORT_DEPENDENCIES
+    from app.models import VERSIONED_TABLES, DataVersion, Token
+    assert {t for tables in EXPORT_DEPENDENCIES.values() for t in tables} <= VERSIONED_TABLES
+    with app.app_context():
+        token = Token(user_id=1)
+        token.set_token('not-exported-anywhere')
+        db.session.add(token)
+        db.session.commit()
+        assert db.session.get(DataVersion, 'token') is None
+        db.session.add(Account(name='Versioned Co'))
+        db.session.commit()
+        assert db.session.get(DataVersion, 'account') is not None
+
+def test_export_cache_evicts_least_recently_used(tmp_path):
+    from app.exports import ExportCache
+    import os
+    import time
+
+    cache = ExportCache(tmp_path, max_bytes=250)
+    write = lambda f: f.write(b'x' * 100)
+    a, _ = cache.artifact('accounts', 'all', 'v1', 'csv', write)
+    b, _ = cache.artifact('contacts', 'all', 'v1', 'csv', write)
+    os.utime(a, (time.time() - 60, time.time() - 60))
+    os.utime(b, (time.time() - 30, time.time() - 30))
+    assert cache.artifact('accounts', 'all', 'v1', 'csv', write)[1] is None  # hit refreshes a
+    cache.artifact('opportunities', 'all', 'v1', 'csv', write)
+    assert a.exists() and not b.exists()
+
+
+def test_opportunities_export_parquet_and_arrow(client, auth, app, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    app.config['EXPORT_CACHE_DIR'] = str(tmp_path)
+    _seed_opportunities(app, 3)
+    with app.app_context():
+        opp = Opportunity.query.filter_by(name='Deal 1').first()
+        opp.close_date = datetime(2025, 11, 30)
+        db.session.commit()
+    auth.login()
+
+    resp = client.get('/opportunities/export?format=parquet')
+    assert resp.status_code == 200
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=opportunities.parquet'
+    table = pq.read_table(io.BytesIO(resp.data))
+    assert table.schema.field('value').type == pa.int64()
+    assert table.schema.field('close_date').type == pa.timestamp('us')
+    assert table.num_rows == 3
+    assert datetime(2025, 11, 30) in table.column('close_date').to_pylist()
+
+    resp = client.get('/opportunities/export?format=arrow')
+    table = pa.ipc.open_file(pa.BufferReader(resp.data)).read_all()
+    assert table.column('owner').to_pylist().count('Rep 2') == 1
+
+
+def test_columnar_export_falls_back_to_csv(client, auth, app, monkeypatch):
+    monkeypatch.setattr('app.routes.columnar_available', lambda: False)
+    auth.login()
+    resp = client.get('/accounts/export?format=parquet')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert resp.data.startswith(b'id,name,industry')
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from app.importer import normalize_name_key, normalize_opportunity_row, normalize_phone, validate_rows
+
+
+def test_normalize_opportunity_row():
+    record = normalize_opportunity_row({
+        'name': '  Fleet Tracking ',
+        'account': 'RoshTech Logistics',
+        'value': '1,500',
+        'close_date': '2025-11-30',
+        'owner_email': ' Admin@Test.com ',
+    })
+    assert record['name'] == 'Fleet Tracking'
+    assert record['stage'] == 'Prospecting'
+    assert record['value'] == 1500
+    assert record['close_date'] == datetime(2025, 11, 30)
+    assert record['owner_email'] == 'admin@test.com'
+    assert normalize_phone('+27 (11) 555-0100') == '+27115550100'
+    assert normalize_name_key(' RoshTech  Logistics, Inc. ') == normalize_name_key('roshtech logistics inc')
+
+
+def test_validate_rows_in_order_across_workers():
+    rows = []
+    for i in range(1, 51):
+        rows.append({'name': f'Deal {i}', 'account': 'Acme', 'value': 'abc' if i % 10 == 0 else str(i)})
+
+    results = list(validate_rows('opportunities', rows, workers=2, chunk_size=7))
+    assert [idx for idx, _, _ in results] == list(range(1, 51))
+    errors = [error for _, _, error in results if error]
+    assert errors == [f'Row {i}: invalid number "abc"' for i in (10, 20, 30, 40, 50)]
+    assert results[0][1]['value'] == 1
@@ -0,0 +1,32 @@
+import logging
+import re
+
+from app import db
+from app.models import User
+
+
+def test_server_timing_header(client, auth):
+    auth.login()
+    resp = client.get('/api/auth/me')
+    match = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries", render;dur=[\d.]+, total;dur=[\d.]+',
+                         resp.headers['Server-Timing'])
+    assert match
+
+
+def test_repeated_statements_are_flagged(app, client, caplog):
+    def lookups():
+        for _ in range(6):
+            db.session.get(User, 1)
+            db.session.expunge_all()
+        return 'ok'
+
+    app.add_url_rule('/_lookups', 'lookups', lookups)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        resp = client.get('/_lookups')
+    assert '6 queries' in resp.headers['Server-Timing']
+    assert any('Suspected N+1' in r.getMessage() and 'ran 6 times' in r.getMessage() for r in caplog.records)
+
+    app.config['SQL_LOG_QUERY_COUNT'] = 3
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/_lookups')
+    assert any('Expensive request GET /_lookups' in r.getMessage() for r in caplog.records)
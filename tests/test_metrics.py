@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import re
+
+import pytest
+
+from app.metrics import (ARCHIVE_FILE, IN_FLIGHT, REQUESTS, MetricsStore, MmapedValues,
+                         exposition, read_values)
+
+
+@pytest.fixture
+def metrics_dir(app, tmp_path):
+    app.extensions['metrics'] = MetricsStore(str(tmp_path / 'metrics'))
+    return tmp_path / 'metrics'
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def _dead_pid():
+    pid = 4_000_000
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid += 1
+
+
+def test_mmaped_values_grow_and_reopen(tmp_path):
+    path = str(tmp_path / 'metrics-1.db')
+    values = MmapedValues(path)
+    for i in range(3000):  # well past the initial mapping
+        values.inc(f'key-{i}', i)
+    values.inc('key-7', 0.5)
+    values.close()
+
+    assert read_values(path)['key-7'] == 7.5
+    reopened = MmapedValues(path)
+    reopened.inc('key-2999')
+    assert reopened.get('key-2999') == 3000
+    reopened.close()
+
+
+def _record_in_child(app):
+    with app.app_context():
+        REQUESTS.inc(5, blueprint='api', endpoint='api.list_accounts', method='GET', status=200)
+
+
+def test_counters_are_summed_across_processes(app, metrics_dir):
+    with app.app_context():
+        REQUESTS.inc(2, blueprint='api', endpoint='api.list_accounts', method='GET', status=200)
+    child = multiprocessing.get_context('fork').Process(target=_record_in_child, args=(app,))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+
+    # the child has exited, so its file is folded into the archive on collection
+    text = exposition(app.extensions['metrics'].collect())
+    prefix = ('crm_http_requests_total{blueprint="api",endpoint="api.list_accounts",'
+              'method="GET",status="200"}')
+    assert _sample(text, prefix) == 7.0
+    assert sorted(os.listdir(metrics_dir)) == sorted(['.lock', ARCHIVE_FILE, f'metrics-{os.getpid()}.db'])
+    # folding is idempotent
+    assert _sample(exposition(app.extensions['metrics'].collect()), prefix) == 7.0
+
+
+def test_gauges_from_exited_processes_are_dropped(app, metrics_dir):
+    metrics_dir.mkdir()
+    stale = MmapedValues(str(metrics_dir / f'metrics-{_dead_pid()}.db'))
+    stale.set(IN_FLIGHT._key('', {}), 3)
+    stale.close()
+    with app.app_context():
+        IN_FLIGHT.inc()
+        text = exposition(app.extensions['metrics'].collect())
+    assert _sample(text, 'crm_http_requests_in_flight') == 1.0
+
+
+def test_metrics_endpoint(app, client, auth, metrics_dir):
+    auth.login()
+    for _ in range(3):
+        client.get('/api/auth/me')
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
+    text = resp.get_data(as_text=True)
+
+    labels = 'blueprint="api",endpoint="api.get_current_user"'
+    assert _sample(text, f'crm_http_requests_total{{{labels},method="GET",status="200"}}') == 3.0
+    buckets = [float(v) for v in re.findall(
+        rf'^crm_http_request_duration_seconds_bucket{{{labels},le="[^"]+"}} (\S+)$', text, re.M)]
+    assert buckets == sorted(buckets) and buckets[-1] == 3.0
+    assert _sample(text, f'crm_http_request_duration_seconds_count{{{labels}}}') == 3.0
+    assert _sample(text, f'crm_http_request_db_seconds_count{{{labels}}}') == 3.0
+    # the scrape itself is in flight
+    assert _sample(text, 'crm_http_requests_in_flight') == 1.0
+
+
+def test_metrics_token_and_row_counters(app, client, auth, metrics_dir):
+    app.config['METRICS_TOKEN'] = 's3cret'
+    auth.login()
+    resp = client.post('/api/accounts/bulk', json=[{'name': 'Acme'}, {'name': ''}])
+    assert resp.status_code == 200
+
+    assert client.get('/metrics').status_code == 401
+    text = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).get_data(as_text=True)
+    assert _sample(text, 'crm_import_rows_total{entity="accounts",outcome="created"}') == 1.0
+    assert _sample(text, 'crm_import_rows_total{entity="accounts",outcome="rejected"}') == 1.0
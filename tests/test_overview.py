@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Account, Contact, Opportunity, User
+
+
+@pytest.fixture
+def big_account(app):
+    with app.app_context():
+        rep = User(email='rep@test.com', first_name='Sales', last_name='Rep', role='sales')
+        rep.set_password('password123')
+        acc = Account(name='Big Co', owner_id=1)
+        db.session.add_all([rep, acc])
+        db.session.flush()
+        db.session.add_all([Contact(first_name='C', last_name=str(i), account_id=acc.id) for i in range(7)])
+        for i in range(5):
+            db.session.add(Opportunity(name=f'Deal {i}', stage='Proposal' if i % 2 else 'Closed-Won', value=10,
+                                       close_date=datetime(2027, 1, 1) if i < 3 else None,
+                                       account_id=acc.id, owner_id=rep.id if i == 0 else 1))
+        db.session.commit()
+        return acc.id
+
+
+def test_overview_is_a_fixed_number_of_queries(app, client, auth, big_account):
+    auth.login()
+    client.get('/api/auth/me')  # warm the user cache
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            resp = client.get(f'/api/accounts/{big_account}/overview?limit=2')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    assert resp.status_code == 200
+    assert len(statements) == 5
+
+    data = resp.get_json()
+    assert data['account']['name'] == 'Big Co'
+    assert data['summary']['contact_count'] == 7 and data['summary']['open_opportunity_count'] == 2
+    assert {s['stage']: s['count'] for s in data['summary']['stages']} == {'Closed-Won': 3, 'Proposal': 2}
+    assert [c['last_name'] for c in data['contacts']['items']] == ['6', '5']
+    # undated deals first, then by close date and id
+    assert [o['name'] for o in data['opportunities']['items']] == ['Deal 3', 'Deal 4']
+    assert set(data['owners']) == {'1'}
+
+
+def test_cursors_walk_every_row_once(client, auth, big_account):
+    auth.login()
+    data = client.get(f'/api/accounts/{big_account}/overview?limit=2').get_json()
+    for kind, expected in (('contacts', 7), ('opportunities', 5)):
+        names = [item['id'] for item in data[kind]['items']]
+        cursor = data[kind]['next_cursor']
+        while cursor:
+            page = client.get(f'/api/accounts/{big_account}/{kind}?limit=2&cursor={cursor}').get_json()
+            names += [item['id'] for item in page['items']]
+            cursor = page['next_cursor']
+        assert len(names) == len(set(names)) == expected
+    assert client.get(f'/api/accounts/{big_account}/contacts?cursor=bogus').status_code == 400
+
+
+def test_reps_only_see_their_own_deals(client, auth, big_account):
+    auth.login('rep@test.com')
+    data = client.get(f'/api/accounts/{big_account}/overview').get_json()
+    assert [o['name'] for o in data['opportunities']['items']] == ['Deal 0']
+    assert data['opportunities']['next_cursor'] is None
+    assert client.get('/api/accounts/999999/overview').status_code == 404
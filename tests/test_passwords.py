@@ -0,0 +1,69 @@
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app import db
+from app.models import User
+from app.passwords import HashingBusy, PasswordHasher, hash_parameters, hash_password, verify_password
+
+
+def test_hashes_are_werkzeug_compatible():
+    stored = hash_password('s3cret', 'pbkdf2:sha512', 1000)
+    assert hash_parameters(stored) == ('pbkdf2:sha512', 1000)
+    assert check_password_hash(stored, 's3cret')
+    assert verify_password(stored, 's3cret')
+    assert not verify_password(stored, 'wrong')
+    assert verify_password(generate_password_hash('s3cret'), 's3cret')
+
+    hasher = PasswordHasher('pbkdf2:sha256', 2000)
+    assert hasher.needs_rehash(stored)
+    assert not hasher.needs_rehash(hasher.hash('s3cret'))
+    with pytest.raises(ValueError):
+        PasswordHasher('argon2')
+
+
+def test_full_pool_raises_busy():
+    hasher = PasswordHasher(iterations=1000, workers=1, max_queued=0)
+    hasher._slots.acquire()
+    with pytest.raises(HashingBusy):
+        hasher.verify(hash_password('x', iterations=1000), 'x')
+    hasher._slots.release()
+    assert hasher.verify(hash_password('x', iterations=1000), 'x')
+    hasher.shutdown()
+
+
+def test_login_upgrades_outdated_hash(client, app):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@test.com').first()
+        user.password_hash = hash_password('password123', 'pbkdf2:sha256', 1000)
+        db.session.commit()
+    app.config['PASSWORD_HASH_ITERATIONS'] = 1500
+
+    resp = client.post('/login', data={'email': 'admin@test.com', 'password': 'password123'})
+    assert resp.headers['Location'] == '/dashboard'
+    with app.app_context():
+        stored = User.query.filter_by(email='admin@test.com').first().password_hash
+    assert hash_parameters(stored) == ('pbkdf2:sha256', 1500)
+    assert verify_password(stored, 'password123')
+
+
+def test_busy_pool_returns_503_everywhere(client, auth, app, monkeypatch):
+    from app.passwords import PasswordHasher as Hasher
+
+    def busy(self, *args):
+        raise HashingBusy()
+
+    @app.route('/api/test-hash')
+    def hash_something():
+        User(email='x@test.com').set_password('x')
+
+    monkeypatch.setattr(Hasher, 'hash', busy)
+    monkeypatch.setattr(Hasher, 'verify', busy)
+    resp = client.post('/login', data={'email': 'admin@test.com', 'password': 'password123'})
+    assert resp.status_code == 503 and resp.headers['Retry-After'] == '1'
+    resp = client.get('/api/test-hash')
+    assert resp.status_code == 503 and 'error' in resp.get_json()
+
+    monkeypatch.undo()
+    auth.login()
+    monkeypatch.setattr(Hasher, 'hash', busy)
+    assert client.post('/users/1/reset-password', data={'password': 'another-password'}).status_code == 503
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Account, DataVersion, Opportunity, User
+
+
+@pytest.fixture
+def board(app):
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@test.com').first()
+        rep = User(email='rep@test.com', first_name='Sales', last_name='Rep', role='sales')
+        rep.set_password('password123')
+        acc = Account(name='Board Co')
+        db.session.add_all([rep, acc])
+        db.session.flush()
+        opps = {}
+        for i, stage in enumerate(['Prospecting'] * 4 + ['Proposal'] * 2 + ['Custom']):
+            opp = Opportunity(name=f'Deal {i}', stage=stage, value=100 * (i + 1), account_id=acc.id,
+                              close_date=datetime(2027, 1, 10 - i), owner_id=rep.id if i == 0 else admin.id)
+            db.session.add(opp)
+            db.session.flush()
+            opps[opp.name] = opp.id
+        db.session.commit()
+        return opps
+
+
+def _column(data, stage):
+    return next(c for c in data['stages'] if c['stage'] == stage)
+
+
+def test_board_returns_top_n_per_stage_in_one_query(app, client, auth, board):
+    auth.login()
+    client.get('/api/auth/me')  # warm the user cache
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            resp = client.get('/api/pipeline/board?limit=2')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    assert resp.status_code == 200
+    assert len([s for s in statements if 'opportunity' in s]) == 1
+
+    data = resp.get_json()
+    stages = [c['stage'] for c in data['stages']]
+    assert stages[:6] == ['Prospecting', 'Qualification', 'Proposal', 'Negotiation', 'Closed-Won', 'Closed-Lost']
+    assert stages[6:] == ['Custom']
+    prospecting = _column(data, 'Prospecting')
+    assert prospecting['count'] == 4 and prospecting['total_value'] == 1000
+    # nearest close date first
+    assert [i['name'] for i in prospecting['items']] == ['Deal 3', 'Deal 2']
+    assert _column(data, 'Qualification') == {'stage': 'Qualification', 'count': 0, 'total_value': 0, 'items': []}
+
+
+def test_moves_are_applied_in_one_transaction(app, client, auth, board):
+    auth.login()
+    with app.app_context():
+        before = db.session.get(DataVersion, 'opportunity').version
+
+    resp = client.patch('/api/pipeline/moves', json={'moves': [
+        {'id': board['Deal 0'], 'stage': 'Proposal', 'position': 0},
+        {'id': board['Deal 1'], 'stage': 'Prospecting', 'position': 0},
+    ]})
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()['stages']['Proposal'] == [board['Deal 0'], board['Deal 5'], board['Deal 4']]
+
+    data = client.get('/api/pipeline/board').get_json()
+    assert [i['name'] for i in _column(data, 'Proposal')['items']] == ['Deal 0', 'Deal 5', 'Deal 4']
+    assert [i['name'] for i in _column(data, 'Prospecting')['items']] == ['Deal 1', 'Deal 3', 'Deal 2']
+    with app.app_context():
+        assert db.session.get(DataVersion, 'opportunity').version != before
+
+
+def test_invalid_batch_changes_nothing(app, client, auth, board):
+    auth.login()
+    resp = client.patch('/api/pipeline/moves', json=[
+        {'id': board['Deal 1'], 'stage': 'Proposal', 'position': 0},
+        {'id': 999999, 'stage': 'Proposal', 'position': 0},
+    ])
+    assert resp.status_code == 404 and resp.get_json()['ids'] == [999999]
+    assert client.patch('/api/pipeline/moves', json=[{'id': board['Deal 1']}]).status_code == 400
+    with app.app_context():
+        assert db.session.get(Opportunity, board['Deal 1']).stage == 'Prospecting'
+
+
+def test_reps_only_see_and_move_their_own_deals(client, auth, board):
+    auth.login('rep@test.com')
+    data = client.get('/api/pipeline/board').get_json()
+    assert sum(c['count'] for c in data['stages']) == 1
+    resp = client.patch('/api/pipeline/moves', json=[{'id': board['Deal 1'], 'stage': 'Proposal', 'position': 0}])
+    assert resp.status_code == 404
+
+
+def test_rep_moves_keep_the_shared_column_order(app, client, auth, board):
+    # Proposal holds Deal 5, Deal 4 (admin's); the rep owns Deal 0 in Prospecting
+    auth.login('rep@test.com')
+    resp = client.patch('/api/pipeline/moves', json=[{'id': board['Deal 0'], 'stage': 'Proposal', 'position': 0}])
+    assert resp.status_code == 200
+    # the rep's view of the column only has their own card
+    assert resp.get_json()['stages']['Proposal'] == [board['Deal 0']]
+    auth.logout()
+
+    auth.login()
+    with app.app_context():
+        rows = (Opportunity.query.filter_by(stage='Proposal').order_by(Opportunity.position).all())
+        positions = [o.position for o in rows]
+    assert positions == list(range(len(rows)))
+    # the rep had no cards in the column, so theirs goes after the admin's
+    assert [i['name'] for i in _column(client.get('/api/pipeline/board').get_json(), 'Proposal')['items']] == [
+        'Deal 5', 'Deal 4', 'Deal 0']
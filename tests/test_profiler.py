@@ -0,0 +1,54 @@
+import pytest
+
+from app import db
+from app.models import User
+
+
+@pytest.fixture
+def profiles(app, tmp_path):
+    app.config['PROFILE_DIR'] = str(tmp_path / 'profiles')
+    return tmp_path / 'profiles'
+
+
+def test_admin_request_is_profiled(client, auth, profiles):
+    auth.login()
+    assert 'X-Profile-Id' not in client.get('/api/auth/me').headers
+
+    resp = client.get('/api/auth/me', headers={'X-Profile': '1'})
+    profile_id = resp.headers['X-Profile-Id']
+    assert profile_id.endswith(tuple('0123456789abcdef')) and 'api.get_current_user' in profile_id
+    assert client.get('/api/auth/me?_profile=1').headers.get('X-Profile-Id')
+
+    listing = client.get('/admin/profiles').get_json()['profiles']
+    assert len(listing) == 2 and profile_id in {p['id'] for p in listing}
+    summary = next(p for p in listing if p['id'] == profile_id)
+    assert summary['path'] == '/api/auth/me' and summary['status'] == 200
+
+    report = client.get(f'/admin/profiles/{profile_id}?sort=tottime&limit=5')
+    assert report.mimetype == 'text/plain'
+    text = report.get_data(as_text=True)
+    assert text.startswith('GET /api/auth/me (api.get_current_user) -> 200') and 'function calls' in text
+    assert client.get(f'/admin/profiles/{profile_id}/download').status_code == 200
+    assert client.get('/admin/profiles/..%2F..%2Fconfig').status_code == 404
+
+
+def test_only_admins_can_profile(app, client, auth, profiles):
+    with app.app_context():
+        user = User(email='sales@test.com', first_name='S', last_name='R', role='sales')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+    auth.login('sales@test.com')
+    resp = client.get('/api/auth/me', headers={'X-Profile': '1'})
+    assert resp.status_code == 200 and 'X-Profile-Id' not in resp.headers
+    assert client.get('/admin/profiles').status_code == 403
+    assert not profiles.exists()
+
+
+def test_old_profiles_are_pruned(app, client, auth, profiles):
+    app.config['PROFILE_KEEP'] = 2
+    auth.login()
+    ids = [client.get('/api/auth/me', headers={'X-Profile': '1'}).headers['X-Profile-Id'] for _ in range(3)]
+    kept = {p['id'] for p in client.get('/admin/profiles').get_json()['profiles']}
+    assert len(kept) == 2 and len(list(profiles.glob('*.prof'))) == 2
+    assert ids[-1] in kept
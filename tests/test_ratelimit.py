@@ -0,0 +1,89 @@
+import pytest
+
+from app.ratelimit import RateLimiter, SQLiteStore, parse_limits
+
+
+def _hits(app, strategy, count, limit='3/minute', start=1000.0, step=1.0):
+    limiter = RateLimiter()
+    with app.app_context():
+        app.extensions['ratelimit'] = None
+        limits = parse_limits(limit)
+        return [limiter.hit('k', limits, strategy, now=start + i * step) for i in range(count)]
+
+
+def test_parse_limits():
+    assert [(l.amount, l.period) for l in parse_limits('100/hour; 10 per 5 minutes')] == [(100, 3600), (10, 300)]
+    with pytest.raises(ValueError):
+        parse_limits('lots/hour')
+
+
+@pytest.mark.parametrize('strategy', ['fixed-window', 'sliding-window', 'token-bucket'])
+def test_strategies_cap_requests(app, strategy):
+    results = _hits(app, strategy, 5)
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after > 0
+
+
+def test_token_bucket_refills_evenly(app):
+    # 3/minute refills one token every 20 seconds
+    results = _hits(app, 'token-bucket', 7, step=10.0)
+    assert [r.allowed for r in results] == [True, True, True, True, True, False, True]
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / 'rl.db')
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    bump = lambda state: (((state or (0.0,))[0] + 1,), (state or (0.0,))[0] + 1)
+    assert first.update('k', bump, 60, 1.0) == 1
+    assert second.update('k', bump, 60, 2.0) == 2
+    assert first.update('k', bump, 60, 100.0) == 1  # expired
+
+
+def test_login_is_rate_limited(client, app):
+    app.config['RATELIMIT_LOGIN'] = '2/minute'
+    data = {'email': 'admin@test.com', 'password': 'password123'}
+    first = client.post('/api/auth/login', json=data)
+    assert first.headers['X-RateLimit-Limit'] == '2'
+    assert first.headers['X-RateLimit-Remaining'] == '1'
+    client.post('/api/auth/login', json=data)
+    blocked = client.post('/api/auth/login', json=data)
+    assert blocked.status_code == 429
+    assert blocked.get_json() == {'error': 'Rate limit exceeded'}
+    assert int(blocked.headers['Retry-After']) >= 1
+    assert blocked.headers['X-RateLimit-Remaining'] == '0'
+
+    # other endpoints use RATELIMIT_DEFAULT and are counted separately
+    resp = client.get('/api/auth/me')
+    assert resp.status_code == 401
+    assert resp.headers['X-RateLimit-Limit'] == '100'
+
+
+def test_default_limit_is_per_user_or_address(client, app, auth):
+    app.config['RATELIMIT_DEFAULT'] = '2/minute'
+    other = app.test_client()
+    # anonymous clients are told apart by address
+    for _ in range(2):
+        client.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert client.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 429
+    assert other.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 401
+
+    # signed-in users behind the same address get their own buckets
+    app.config['RATELIMIT_ENABLED'] = False
+    auth.login()
+    app.config['RATELIMIT_ENABLED'] = True
+    for _ in range(2):
+        assert client.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+    assert client.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 429
+    assert other.get('/api/auth/me', environ_base={'REMOTE_ADDR': '10.0.0.3'}).status_code == 401
+
+
+def test_trusted_proxy_forwarded_for():
+    from app import create_app
+    app = create_app({'TESTING': True, 'TRUSTED_PROXY_COUNT': 1, 'RATELIMIT_DEFAULT': '1/minute',
+                      'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'METRICS_ENABLED': False})
+    client = app.test_client()
+    proxy = {'REMOTE_ADDR': '10.0.0.1'}
+    assert client.get('/api/auth/me', environ_base=proxy, headers={'X-Forwarded-For': '1.1.1.1'}).status_code == 401
+    assert client.get('/api/auth/me', environ_base=proxy, headers={'X-Forwarded-For': '2.2.2.2'}).status_code == 401
+    assert client.get('/api/auth/me', environ_base=proxy, headers={'X-Forwarded-For': '1.1.1.1'}).status_code == 429
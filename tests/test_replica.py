@@ -0,0 +1,62 @@
+import pytest
+
+from app import create_app, db
+from app.models import Account, User
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test-key',
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+        'SQLALCHEMY_READ_REPLICA_URI': f'sqlite:///{tmp_path / "replica.db"}',
+        'READ_REPLICA_REFRESH_SECONDS': 3600,
+        'READ_YOUR_WRITES_SECONDS': 60,
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+        'AUTH_CACHE_STAMP': str(tmp_path / 'auth_cache.stamp'),
+    })
+    with app.app_context():
+        db.create_all()
+        for email in ('admin@test.com', 'other@test.com'):
+            user = User(email=email, first_name='Test', last_name='User', role='admin')
+            user.set_password('password123')
+            db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _names(client):
+    resp = client.get('/api/accounts')
+    assert resp.status_code == 200
+    return sorted(item['name'] for item in resp.get_json()['items'])
+
+
+def _login(app, email):
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': 'password123'})
+    return client
+
+
+def test_reads_use_replica_with_read_your_writes(replica_app):
+    writer = _login(replica_app, 'admin@test.com')
+    reader = _login(replica_app, 'other@test.com')
+    assert _names(writer) == []  # first routed read copies the primary into the replica
+
+    with replica_app.app_context():
+        db.session.add(Account(name='Unreplicated Co'))
+        db.session.commit()
+    assert _names(reader) == []  # served by the (stale) replica
+
+    assert writer.post('/api/accounts', json={'name': 'Mine Co'}).status_code == 201
+    # the writer reads from the primary for READ_YOUR_WRITES_SECONDS
+    assert _names(writer) == ['Mine Co', 'Unreplicated Co']
+    assert _names(reader) == []
+
+    assert replica_app.extensions['replica_refresher'].refresh()
+    assert _names(reader) == ['Mine Co', 'Unreplicated Co']
@@ -0,0 +1,98 @@
+from app import db
+from app.models import Account, Contact, Opportunity
+
+
+def _rollups(account_id):
+    acc = db.session.get(Account, account_id)
+    db.session.refresh(acc)
+    return acc.contact_count, acc.open_opportunity_count, acc.open_pipeline_value
+
+
+def test_rollups_follow_orm_writes(app):
+    with app.app_context():
+        a, b = Account(name='Rollup A'), Account(name='Rollup B')
+        db.session.add_all([a, b])
+        db.session.commit()
+        assert _rollups(a.id) == (0, 0, 0) and a.last_activity_at is None
+
+        contact = Contact(first_name='Ann', last_name='Lee', account_id=a.id)
+        deal = Opportunity(name='Deal', stage='Proposal', value=300, account_id=a.id)
+        db.session.add_all([contact, deal, Opportunity(name='Other', stage='Prospecting', value=50, account_id=a.id)])
+        db.session.commit()
+        assert _rollups(a.id) == (1, 2, 350)
+        assert db.session.get(Account, a.id).last_activity_at is not None
+
+        # objects expired by the commit: old values are read back before the flush
+        deal.value = 500
+        contact.account_id = b.id
+        db.session.commit()
+        assert _rollups(a.id) == (0, 2, 550) and _rollups(b.id) == (1, 0, 0)
+
+        deal.stage = 'Closed-Won'
+        db.session.commit()
+        assert _rollups(a.id) == (0, 1, 50)
+
+        db.session.delete(db.session.get(Opportunity, deal.id))
+        db.session.delete(Opportunity.query.filter_by(name='Other').one())
+        db.session.delete(contact)
+        db.session.commit()
+        assert _rollups(a.id) == (0, 0, 0) and _rollups(b.id) == (0, 0, 0)
+
+
+def test_pipeline_moves_refresh_rollups(app, client, auth):
+    with app.app_context():
+        acc = Account(name='Board Rollups')
+        db.session.add(acc)
+        db.session.flush()
+        deal = Opportunity(name='Deal', stage='Proposal', value=70, account_id=acc.id, owner_id=1)
+        db.session.add(deal)
+        db.session.commit()
+        acc_id, deal_id = acc.id, deal.id
+    auth.login()
+    resp = client.patch('/api/pipeline/moves', json=[{'id': deal_id, 'stage': 'Closed-Lost', 'position': 0}])
+    assert resp.status_code == 200
+    with app.app_context():
+        assert _rollups(acc_id) == (0, 0, 0)
+
+
+def test_repair_and_sort(app, client, auth, runner):
+    with app.app_context():
+        small, big = Account(name='Small'), Account(name='Big')
+        db.session.add_all([small, big])
+        db.session.flush()
+        db.session.add_all([Contact(first_name='C', last_name=str(i), account_id=big.id) for i in range(3)])
+        db.session.add(Opportunity(name='Deal', stage='Proposal', value=10, account_id=small.id))
+        db.session.commit()
+        small_id, big_id = small.id, big.id
+        # drift the counters behind the ORM's back
+        db.session.execute(Account.__table__.update().values(contact_count=99, open_pipeline_value=0))
+        db.session.commit()
+
+    result = runner.invoke(args=['repair-rollups', '--chunk-size', '1'])
+    assert 'Repaired rollups of 2 accounts' in result.output
+    with app.app_context():
+        assert _rollups(big_id) == (3, 0, 0) and _rollups(small_id) == (0, 1, 10)
+
+    auth.login()
+    items = client.get('/api/accounts?sort=contact_count').get_json()['items']
+    assert [a['name'] for a in items][:2] == ['Big', 'Small'] and items[0]['contact_count'] == 3
+    items = client.get('/api/accounts?min_open_pipeline_value=5').get_json()['items']
+    assert [a['name'] for a in items] == ['Small']
+
+
+def test_deal_without_stage_counts_as_open(app, client, auth):
+    from app.rollups import repair_rollups
+    with app.app_context():
+        acc = Account(name='No Stage')
+        db.session.add(acc)
+        db.session.flush()
+        deal = Opportunity(name='Deal', stage='Proposal', value=100, account_id=acc.id, owner_id=1)
+        db.session.add(deal)
+        db.session.commit()
+        acc_id, deal_id = acc.id, deal.id
+    auth.login()
+    assert client.put(f'/api/opportunities/{deal_id}', json={'stage': None}).status_code == 200
+    with app.app_context():
+        assert _rollups(acc_id) == (0, 1, 100)
+        assert repair_rollups(db.engine) == 0
+        assert _rollups(acc_id) == (0, 1, 100)
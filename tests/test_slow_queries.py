@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from app.slow_queries import fingerprint, normalize_sql, params_shape, read_log, top_queries
+
+
+@pytest.fixture
+def slow_log(app, tmp_path):
+    path = str(tmp_path / 'slow_queries.jsonl')
+    app.config.update(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=path)
+    app.extensions['slow_queries'].path = path
+    return path
+
+
+def test_normalized_statements_share_a_fingerprint():
+    a = normalize_sql("SELECT * FROM account\n  WHERE name = 'Acme' AND id IN (?, ?, ?) LIMIT 10")
+    b = normalize_sql("SELECT * FROM account WHERE name = 'O''Brien' AND id IN (?, ?) LIMIT 25")
+    assert a == b == 'SELECT * FROM account WHERE name = ? AND id IN (?, ...) LIMIT ?'
+    assert fingerprint(a) == fingerprint(b)
+    assert params_shape((1, 'x', None)) == ['int', 'str', 'NoneType']
+    assert params_shape([(1,), (2,)], executemany=True) == {'rows': 2, 'row': ['int']}
+
+
+def test_slow_statements_are_logged_with_plans(app, client, auth, slow_log):
+    auth.login()
+    assert client.get('/api/accounts').status_code == 200
+    app.extensions['slow_queries'].join()
+
+    records = list(read_log(slow_log))
+    listing = [r for r in records if r['endpoint'] == 'api.list_accounts' and 'FROM account' in r['sql']]
+    assert listing
+    record = listing[0]
+    assert record['plan'] and all(isinstance(line, str) for line in record['plan'])
+    assert 'duration_ms' in record and 'params' in record
+    # parameter values are never written
+    with open(slow_log, encoding='utf-8') as f:
+        assert 'admin@test.com' not in f.read()
+
+
+def test_top_command(app, slow_log):
+    lines = [
+        {'ts': '2026-01-01T00:00:00', 'fingerprint': 'aaa', 'sql': 'SELECT a', 'duration_ms': 300.0,
+         'endpoint': 'main.accounts', 'plan': ['SCAN account']},
+        {'ts': '2026-01-01T00:00:01', 'fingerprint': 'aaa', 'sql': 'SELECT a', 'duration_ms': 500.0,
+         'endpoint': 'api.list_accounts', 'plan': ['SCAN account']},
+        {'ts': '2026-01-01T00:00:02', 'fingerprint': 'bbb', 'sql': 'SELECT b', 'duration_ms': 700.0,
+         'endpoint': None, 'plan': None},
+    ]
+    with open(slow_log, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(line) + '\n' for line in lines))
+
+    top = top_queries(read_log(slow_log))
+    assert [(g['fingerprint'], g['count'], g['total'], g['max']) for g in top] == \
+        [('aaa', 2, 800.0, 500.0), ('bbb', 1, 700.0, 700.0)]
+    assert top[0]['endpoints'] == ['api.list_accounts', 'main.accounts']
+
+    result = app.test_cli_runner().invoke(args=['slow-queries', 'top', '--by', 'max', '--limit', '1'])
+    assert result.exit_code == 0, result.output
+    assert '[bbb] count=1' in result.output and '[aaa]' not in result.output
@@ -0,0 +1,43 @@
+from sqlalchemy import text
+
+from app import create_app, db
+from app.models import Account, User
+
+
+def _pragmas(app):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            return {name: conn.execute(text(f'PRAGMA {name}')).scalar()
+                    for name in ('journal_mode', 'synchronous', 'foreign_keys', 'busy_timeout', 'temp_store')}
+
+
+def test_production_profile_pragmas(app):
+    assert _pragmas(app) == {'journal_mode': 'wal', 'synchronous': 1, 'foreign_keys': 1,
+                             'busy_timeout': 5000, 'temp_store': 2}
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == 10
+
+
+def test_default_profile_leaves_sqlite_settings(tmp_path):
+    app = create_app({'TESTING': True, 'SQLITE_PROFILE': 'default', 'METRICS_DIR': str(tmp_path),
+                      'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "plain.db"}'})
+    pragmas = _pragmas(app)
+    assert pragmas['journal_mode'] == 'delete'
+    assert pragmas['foreign_keys'] == 0
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_deleting_owner_with_foreign_keys_on(client, auth, app):
+    with app.app_context():
+        rep = User(email='rep@test.com', first_name='Rep', last_name='One', role='user')
+        rep.set_password('password123')
+        db.session.add(rep)
+        db.session.flush()
+        db.session.add(Account(name='Owned Co', owner_id=rep.id))
+        db.session.commit()
+        rep_id = rep.id
+    auth.login()
+    resp = client.post(f'/users/{rep_id}/delete', headers={'X-Requested-With': 'XMLHttpRequest'})
+    assert resp.status_code == 200
+    with app.app_context():
+        assert Account.query.filter_by(name='Owned Co').one().owner_id is None
@@ -0,0 +1,143 @@
+import io
+import json
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import Token, User
+from app.tokens import get_usage_tracker, sweep_tokens
+
+
+def _make_token(app, legacy=False):
+    value = secrets.token_urlsafe(48)
+    with app.app_context():
+        admin = User.query.filter_by(email='admin@test.com').first()
+        token = Token(user_id=admin.id)
+        token.set_token(value)
+        if legacy:
+            token.token_hash = generate_password_hash(value)
+        db.session.add(token)
+        db.session.commit()
+        return value, token.id
+
+
+def test_legacy_pbkdf2_token_is_migrated_on_first_use(client, app):
+    value, token_id = _make_token(app, legacy=True)
+    resp = client.get('/api/auth/me', headers={'Authorization': f'Bearer {value}'})
+    assert resp.status_code == 200
+    assert resp.get_json()['email'] == 'admin@test.com'
+    with app.app_context():
+        token = db.session.get(Token, token_id)
+        assert not token.needs_rehash
+        assert token.check_token(value)
+        assert not token.check_token(value + 'x')
+
+
+def test_verified_tokens_are_cached_until_revoked(client, app):
+    value, token_id = _make_token(app)
+    headers = {'Authorization': f'Bearer {value}'}
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert not any('FROM token' in s for s in statements)
+
+    with app.test_request_context():
+        db.session.get(Token, token_id).revoke()
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': 'Bearer nope'}).status_code == 401
+
+
+def test_token_usage_is_written_in_one_batch(client, app):
+    value, token_id = _make_token(app)
+    headers = {'Authorization': f'Bearer {value}'}
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(3):
+            assert client.get('/api/auth/me', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert not any(s.startswith('UPDATE token') for s in statements)
+
+    with app.app_context():
+        assert get_usage_tracker().flush(db.engine) == 1
+        token = db.session.get(Token, token_id)
+        assert token.use_count == 3
+        assert token.last_used_at is not None
+
+
+def test_sweep_tokens_removes_revoked_and_expired(app, runner):
+    live, live_id = _make_token(app)
+    _, revoked_id = _make_token(app)
+    _, expired_id = _make_token(app)
+    with app.app_context():
+        db.session.get(Token, revoked_id).revoked = True
+        db.session.get(Token, expired_id).expires_at = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+
+        archive = io.StringIO()
+        assert sweep_tokens(chunk_size=1, archive=archive) == 2
+        records = [json.loads(line) for line in archive.getvalue().splitlines()]
+        assert sorted(r['id'] for r in records) == [revoked_id, expired_id]
+        assert all('token_hash' not in r for r in records)
+        assert [t.id for t in Token.query.all()] == [live_id]
+
+    result = runner.invoke(args=['sweep-tokens'])
+    assert 'Removed 0 tokens' in result.output
+
+
+def test_access_token_is_verified_without_queries(client, app):
+    value, token_id = _make_token(app)
+    resp = client.post('/api/auth/token', headers={'Authorization': f'Bearer {value}'})
+    assert resp.status_code == 200
+    access = resp.get_json()['access_token']
+    headers = {'Authorization': f'Bearer {access}'}
+    assert client.get('/api/auth/me', headers=headers).get_json()['email'] == 'admin@test.com'
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(3):
+            assert client.get('/api/auth/me', headers=headers).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert statements == []
+
+    # access tokens can't be exchanged for more access tokens
+    assert client.post('/api/auth/token', headers=headers).status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {access}x'}).status_code == 401
+
+    with app.test_request_context():
+        db.session.get(Token, token_id).revoke()
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+
+
+def test_access_token_rejected_after_role_change(client, app):
+    value, _ = _make_token(app)
+    access = client.post('/api/auth/token', headers={'Authorization': f'Bearer {value}'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {access}'}
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+    with app.test_request_context():
+        from app.auth import invalidate_user
+        admin = User.query.filter_by(email='admin@test.com').first()
+        admin.role = 'user'
+        db.session.commit()
+        invalidate_user(admin.id)
+    assert client.get('/api/auth/me', headers=headers).status_code == 401